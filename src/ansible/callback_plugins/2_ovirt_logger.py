@@ -23,12 +23,15 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+import functools
 import io
 import json
 import logging
 import os
 import pprint
 import re
+import resource
+import time
 
 
 from collections import Callable
@@ -81,8 +84,18 @@ DOCUMENTATION = '''
         env:
           - name: HE_ANSIBLE_LOG_FILTERED_TOKENS_VARS_VAR
         default: he_filtered_tokens_vars
+      profile file:
+        description: >
+          Machine-readable (JSON) per task profile: monotonic durations in
+          milliseconds, CPU time of the worker processes and the time spent
+          by this callback handling each event.
+          No profile is written if not set.
+        env:
+          - name: HE_ANSIBLE_PROFILE_PATH
+        default: None
 '''
 
+
 def _shorten_string(s, max):
     """
     Return a shortened version of s if it's too long: some prefix, then ...,
@@ -97,11 +110,40 @@ def _shorten_string(s, max):
         )
     )
 
+
+def _ms(seconds):
+    return int(round(seconds * 1000))
+
+
+def _children_cpu():
+    """
+    Return the CPU time (seconds) of the terminated children of this
+    process, ansible forks a worker per task.
+    """
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+def _profiled(f):
+    """
+    Account the time spent by the callback itself handling an event.
+    """
+    @functools.wraps(f)
+    def wrapper(self, *args, **kwargs):
+        start = time.monotonic()
+        try:
+            return f(self, *args, **kwargs)
+        finally:
+            self._account_overhead(f.__name__, time.monotonic() - start)
+    return wrapper
+
+
 class CallbackModule(CallbackBase):
     """
     ansible ovirt_logger callback plugin
     This plugin makes use of the following environment variables:
         HE_ANSIBLE_LOG_PATH   (mandatory): defaults to None
+        HE_ANSIBLE_PROFILE_PATH (optional): defaults to None
     """
 
     CALLBACK_VERSION = 2.0
@@ -393,10 +435,81 @@ class CallbackModule(CallbackBase):
         self._task_start_time = None
         self.errors = 0
 
+        self._profile_path = None
+        if logFileName:
+            self._profile_path = os.getenv('HE_ANSIBLE_PROFILE_PATH')
+        self._start_mono = time.monotonic()
+        self._start_epoch = time.time()
+        self._task_start_mono = None
+        self._task_start_epoch = None
+        self._task_start_cpu = None
+        self._profiled_tasks = []
+        self._overhead = {}
+
     def _get_task_duration(self):
         runtime = datetime.utcnow() - self._task_start_time
         return runtime.seconds
 
+    def _account_overhead(self, event, seconds):
+        entry = self._overhead.setdefault(
+            event,
+            {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0},
+        )
+        entry['count'] += 1
+        entry['total_ms'] += seconds * 1000
+        entry['max_ms'] = max(entry['max_ms'], seconds * 1000)
+
+    def _profile_task(self, result, status):
+        if self._task_start_mono is None:
+            return
+        cpu = _children_cpu()
+        self._profiled_tasks.append({
+            'task': result._task.get_name(),
+            'action': result._task.action,
+            'host': result._host.name,
+            'status': status,
+            'start_time': self._task_start_epoch,
+            'duration_ms': _ms(time.monotonic() - self._task_start_mono),
+            'children_cpu_ms': _ms(cpu - self._task_start_cpu),
+        })
+
+    def _write_profile(self, status):
+        if not self._profile_path:
+            return
+        overhead = {}
+        for event, entry in self._overhead.items():
+            overhead[event] = {
+                'count': entry['count'],
+                'total_ms': round(entry['total_ms'], 3),
+                'max_ms': round(entry['max_ms'], 3),
+            }
+        profile = {
+            'playbook': self.playbook._file_name,
+            'log': os.getenv('HE_ANSIBLE_LOG_PATH'),
+            'status': status,
+            'start_time': self._start_epoch,
+            'duration_ms': _ms(time.monotonic() - self._start_mono),
+            'maxrss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            # High-water mark over all the workers reaped so far, it is
+            # not attributable to a single task
+            'children_peak_rss_kb': resource.getrusage(
+                resource.RUSAGE_CHILDREN
+            ).ru_maxrss,
+            'tasks': self._profiled_tasks,
+            'callback_overhead': overhead,
+        }
+        try:
+            with io.open(self._profile_path, mode='w', encoding='utf8') as f:
+                f.write(u'{j}'.format(j=json.dumps(profile, indent=4)))
+        except (IOError, OSError) as e:
+            self.logger.warning(
+                u"Unable to write profile {p}: {e}".format(
+                    p=self._profile_path,
+                    e=e,
+                )
+            )
+
+    @_profiled
     def v2_playbook_on_start(self, playbook):
         self.playbook = playbook
         data = {
@@ -409,8 +522,12 @@ class CallbackModule(CallbackBase):
         )
         self.logger.debug(u"ansible start {v}".format(v=data))
 
+    @_profiled
     def v2_playbook_on_task_start(self, task, is_conditional):
         self._task_start_time = datetime.utcnow()
+        self._task_start_mono = time.monotonic()
+        self._task_start_epoch = time.time()
+        self._task_start_cpu = _children_cpu()
         self._update_vars_cache()
         data = {
             'status': "OK",
@@ -441,6 +558,7 @@ class CallbackModule(CallbackBase):
                 )
         return task_list
 
+    @_profiled
     def v2_playbook_on_stats(self, stats):
         end_time = datetime.utcnow()
         runtime = end_time - self.start_time
@@ -477,9 +595,12 @@ class CallbackModule(CallbackBase):
             v=self._pretty_logging(data)
         ))
         self.logger.info(summary)
+        self._write_profile(status)
 
+    @_profiled
     def v2_runner_on_ok(self, result, **kwargs):
         self._update_vars_cache()
+        self._profile_task(result, 'OK')
         data = {
             'status': "OK",
             'ansible_type': "task",
@@ -491,8 +612,10 @@ class CallbackModule(CallbackBase):
         self.logger.info(u"ansible ok {v}".format(v=data))
         self._finised_tasks.append(data)
 
+    @_profiled
     def v2_runner_on_skipped(self, result, **kwargs):
         self._update_vars_cache()
+        self._profile_task(result, 'SKIPPED')
         data = {
             'status': "SKIPPED",
             'ansible_type': "task",
@@ -502,6 +625,7 @@ class CallbackModule(CallbackBase):
         }
         self.logger.info(u"ansible skipped {v}".format(v=data))
 
+    @_profiled
     def v2_playbook_on_import_for_host(self, result, imported_file):
         self._update_vars_cache()
         data = {
@@ -513,6 +637,7 @@ class CallbackModule(CallbackBase):
         }
         self.logger.info(u"ansible import {v}".format(v=data))
 
+    @_profiled
     def v2_playbook_on_not_import_for_host(self, result, missing_file):
         self._update_vars_cache()
         data = {
@@ -524,8 +649,10 @@ class CallbackModule(CallbackBase):
         }
         self.logger.info(u"ansible import {v}".format(v=data))
 
+    @_profiled
     def v2_runner_on_failed(self, result, **kwargs):
         self._update_vars_cache()
+        self._profile_task(result, 'FAILED')
         data = {
             'status': "FAILED",
             'ansible_type': "task",
@@ -541,8 +668,10 @@ class CallbackModule(CallbackBase):
         )
         self._finised_tasks.append(data)
 
+    @_profiled
     def v2_runner_on_unreachable(self, result, **kwargs):
         self._update_vars_cache()
+        self._profile_task(result, 'UNREACHABLE')
         data = {
             'status': "UNREACHABLE",
             'ansible_type': "task",
@@ -555,8 +684,10 @@ class CallbackModule(CallbackBase):
         self.logger.error(u"ansible unreachable {v}".format(v=data))
         self._finised_tasks.append(data)
 
+    @_profiled
     def v2_runner_on_async_failed(self, result, **kwargs):
         self._update_vars_cache()
+        self._profile_task(result, 'FAILED')
         data = {
             'status': "FAILED",
             'ansible_type': "task",
@@ -570,6 +701,7 @@ class CallbackModule(CallbackBase):
         self.logger.error(u"ansible async {v}".format(v=data))
         self._finised_tasks.append(data)
 
+    @_profiled
     def v2_playbook_on_play_start(self, play):
         self.play = play
         self.varmgr = self.play.get_variable_manager()
@@ -580,6 +712,7 @@ class CallbackModule(CallbackBase):
         }
         self.logger.info(u"ansible play start {v}".format(v=data))
 
+    @_profiled
     def v2_on_any(self, *args, **kwargs):
         msg = u"ansible on_any args "
         for arg in args:
@@ -0,0 +1,222 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Throughput benchmark of AnsibleHelper.
+AnsibleHelper is run against the fake ansible-playbook, measuring for
+each scenario the latency from the writing of an event to its handling
+by _process_output, the CPU time spent per event in _process_output
+and the logger, the CPU time of the whole run and the peak of the
+Python memory allocated while running it.
+It is not installed, run it from the source tree with src in PYTHONPATH.
+
+    python -m ovirt_hosted_engine_setup.ansible_benchmark [--json]
+        [--events=<file> | --count=<n>] [--rate=<events/s>]
+        [--burst=<n>] [--stdout-bytes=<n>] [--stderr-bytes=<n>]
+        [--rc=<n>]
+
+Without any scenario option a default set of scenarios is run.
+"""
+
+
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from ovirt_hosted_engine_setup import ansible_utils
+from ovirt_hosted_engine_setup import fake_ansible_playbook
+
+
+SCENARIOS = (
+    ('sequential', ['--count=50']),
+    ('bursts', ['--count=200', '--rate=2000', '--burst=50']),
+    ('paced', ['--count=20', '--rate=20']),
+    ('noisy', [
+        '--count=20', '--stdout-bytes=1048576', '--stderr-bytes=65536',
+    ]),
+    ('failing', ['--count=20', '--rc=2']),
+)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+class _CountingHandler(logging.Handler):
+
+    def __init__(self):
+        super(_CountingHandler, self).__init__(level=logging.DEBUG)
+        self.setFormatter(logging.Formatter(
+            '%(asctime)s %(levelname)s %(name)s %(message)s'
+        ))
+        self.records = 0
+
+    def emit(self, record):
+        self.format(record)
+        self.records += 1
+
+
+class MeasuredHelper(ansible_utils.AnsibleHelper):
+    """AnsibleHelper recording the latency and the cost of each event."""
+
+    def __init__(self, **kwargs):
+        super(MeasuredHelper, self).__init__(**kwargs)
+        self.latencies = []
+        self.cpu = []
+
+    def _process_output(self, d):
+        received = time.time()
+        try:
+            sent = json.loads(d).get(fake_ansible_playbook.SENT)
+        except (ValueError, AttributeError):
+            sent = None
+        if sent is not None:
+            self.latencies.append(received - sent)
+        cpu = time.process_time()
+        super(MeasuredHelper, self)._process_output(d)
+        self.cpu.append(time.process_time() - cpu)
+
+
+def _run(playbook, workdir):
+    helper = MeasuredHelper(
+        custom_path=workdir,
+        extra_vars={},
+        ansible_playbook=playbook,
+    )
+    handler = _CountingHandler()
+    propagate = helper.logger.propagate
+    level = helper.logger.level
+    helper.logger.addHandler(handler)
+    helper.logger.propagate = False
+    helper.logger.setLevel(logging.DEBUG)
+    error = None
+    try:
+        helper.run()
+    except RuntimeError as e:
+        error = str(e)
+    finally:
+        helper.logger.removeHandler(handler)
+        helper.logger.propagate = propagate
+        helper.logger.setLevel(level)
+    return helper, handler.records, error
+
+
+def measure(name, options):
+    workdir = tempfile.mkdtemp(prefix='he-ansible-benchmark-')
+    try:
+        playbook = fake_ansible_playbook.write_wrapper(
+            os.path.join(workdir, 'ansible-playbook'),
+            options,
+        )
+        start = time.monotonic()
+        cpu = time.process_time()
+        helper, records, error = _run(playbook, workdir)
+        wall = time.monotonic() - start
+        cpu = time.process_time() - cpu
+
+        tracemalloc.start()
+        try:
+            _run(playbook, workdir)
+            unused, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    finally:
+        shutil.rmtree(workdir)
+    events = len(helper.cpu)
+    latencies = helper.latencies or [0.0]
+    return {
+        'scenario': name,
+        'options': list(options),
+        'events': events,
+        'log_records': records,
+        'error': error,
+        'wall_s': round(wall, 3),
+        'events_per_s': round(events / wall, 1) if wall else None,
+        'latency_median_ms': round(_percentile(latencies, 50) * 1000, 1),
+        'latency_p95_ms': round(_percentile(latencies, 95) * 1000, 1),
+        'latency_max_ms': round(max(latencies) * 1000, 1),
+        'process_output_us_per_event': round(
+            sum(helper.cpu) / max(events, 1) * 1e6, 1
+        ),
+        'cpu_us_per_event': round(cpu / max(events, 1) * 1e6, 1),
+        'peak_memory_kib': peak // 1024,
+    }
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m ovirt_hosted_engine_setup.ansible_benchmark',
+        description='Measure the event throughput of AnsibleHelper',
+    )
+    parser.add_argument('--json', action='store_true')
+    args, options = parser.parse_known_args(argv)
+    if options:
+        # Checked here, the fake would ignore them
+        fake_ansible_playbook.option_parser().parse_args(options)
+        scenarios = [('custom', options)]
+    else:
+        scenarios = SCENARIOS
+    results = [measure(name, o) for name, o in scenarios]
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+    print(
+        '{s:12} {e:>6} {ev:>8} {med:>9} {p95:>9} {po:>9} {cpu:>9} '
+        '{mem:>8}'.format(
+            s='scenario',
+            e='events',
+            ev='events/s',
+            med='lat ms',
+            p95='p95 ms',
+            po='us/event',
+            cpu='cpu us/ev',
+            mem='peak KiB',
+        )
+    )
+    for r in results:
+        print(
+            '{s:12} {e:6} {ev:8.1f} {med:9.1f} {p95:9.1f} {po:9.1f} '
+            '{cpu:9.1f} {mem:8}{error}'.format(
+                s=r['scenario'],
+                e=r['events'],
+                ev=r['events_per_s'] or 0.0,
+                med=r['latency_median_ms'],
+                p95=r['latency_p95_ms'],
+                po=r['process_output_us_per_event'],
+                cpu=r['cpu_us_per_event'],
+                mem=r['peak_memory_kib'],
+                error=' ({e})'.format(e=r['error']) if r['error'] else '',
+            )
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -33,6 +33,7 @@ import time
 from otopi import base
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import stage_timing
 
 
 def _(m):
@@ -75,8 +76,10 @@ class AnsibleHelper(base.Base):
         raise_on_error=True,
         tags=None,
         skip_tags='always',
+        ansible_playbook=ohostedcons.FileLocations.ANSIBLE_PLAYBOOK,
     ):
         super(AnsibleHelper, self).__init__()
+        self._ansible_playbook = ansible_playbook
         self._playbook_name = playbook_name
         self._module_path = custom_path if custom_path \
             else ohostedcons.FileLocations.HOSTED_ENGINE_ANSIBLE_PATH
@@ -130,11 +133,30 @@ class AnsibleHelper(base.Base):
 
         return ''
 
+    def _tag_name(self):
+        dname = os.path.splitext(self._playbook_name)[0]
+        if self._tags:
+            if isinstance(self._tags, list) or isinstance(self._tags, tuple):
+                tag_name = self._tags[0]
+            else:
+                tag_name = self._tags
+            dname = tag_name
+        return dname
+
     def run(self):
+        with stage_timing.timer().measure(
+            stage=None,
+            plugin=self._playbook_name,
+            method=self._tag_name(),
+            kind=stage_timing.KIND_ANSIBLE,
+        ) as timing:
+            return self._run(timing)
+
+    def _run(self, timing):
         out_fd, out_path = tempfile.mkstemp()
         vars_fd, vars_path = tempfile.mkstemp()
         ansible_playbook_cmd = [
-            '/bin/ansible-playbook',
+            self._ansible_playbook,
             '--module-path={mp}'.format(mp=self._module_path),
             '--inventory={i}'.format(i=self._inventory_source),
             '--extra-vars=@{vf}'.format(vf=vars_path),
@@ -165,21 +187,13 @@ class AnsibleHelper(base.Base):
             'ANSIBLE_STDOUT_CALLBACK'
         ] = ohostedcons.AnsibleCallback.CALLBACK_NAME
 
-        dname = os.path.splitext(self._playbook_name)[0]
-        if self._tags:
-            if isinstance(self._tags, list) or isinstance(self._tags, tuple):
-                tag_name = self._tags[0]
-            else:
-                tag_name = self._tags
-            dname = tag_name
-
         env[
             'HE_ANSIBLE_LOG_PATH'
         ] = os.path.join(
             ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_LOGDIR,
             "%s-ansible-%s-%s-%s.log" % (
                 ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP,
-                dname,
+                self._tag_name(),
                 time.strftime("%Y%m%d%H%M%S"),
                 ''.join(
                     [
@@ -192,6 +206,14 @@ class AnsibleHelper(base.Base):
             )
         )
 
+        env[
+            'HE_ANSIBLE_PROFILE_PATH'
+        ] = os.path.splitext(
+            env['HE_ANSIBLE_LOG_PATH']
+        )[0] + ohostedcons.AnsibleCallback.PROFILE_SUFFIX
+
+        timing['log'] = env['HE_ANSIBLE_LOG_PATH']
+
         self.logger.debug('ansible-playbook: cmd: %s' % ansible_playbook_cmd)
         self.logger.debug('ansible-playbook: out_path: %s' % out_path)
         self.logger.debug('ansible-playbook: vars_path: %s' % vars_path)
@@ -200,13 +222,17 @@ class AnsibleHelper(base.Base):
         rc = None
         with open(vars_path, 'w') as vars_fh:
             json.dump(self._extra_vars, vars_fh)
-        with open(out_path, 'r') as out_fh:
+        # stdout and stderr are read only once the playbook is over: keep
+        # them in files, a pipe would block it once full
+        with open(out_path, 'r') as out_fh, \
+                tempfile.TemporaryFile() as stdout_fh, \
+                tempfile.TemporaryFile() as stderr_fh:
             buffer = ''
             proc = subprocess.Popen(
                 ansible_playbook_cmd,
                 env=env,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
+                stdout=stdout_fh,
+                stderr=stderr_fh,
             )
             while True:
                 output = out_fh.readline()
@@ -228,10 +254,12 @@ class AnsibleHelper(base.Base):
                 if output:
                     self._process_output(output)
             self.logger.debug('ansible-playbook stdout:')
-            for ln in proc.stdout:
+            stdout_fh.seek(0)
+            for ln in stdout_fh:
                 self.logger.debug(ln)
             self.logger.debug('ansible-playbook stderr:')
-            for ln in proc.stderr:
+            stderr_fh.seek(0)
+            for ln in stderr_fh:
                 self.logger.error(ln)
             if rc != 0 and self._raise_on_error:
                 raise RuntimeError(_('Failed executing ansible-playbook'))
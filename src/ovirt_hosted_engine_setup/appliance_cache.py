@@ -0,0 +1,300 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Cache of decompressed appliances across deploy attempts.
+The compressed OVA is decompressed once, verifying its sha1sum on the
+way, into an uncompressed archive named after that digest; retries
+extract the appliance from it without paying the decompression again.
+The cache is bounded in size, the least recently used entries are
+evicted first. Entries are checked out as reflinks or hard links when
+the filesystem supports them, so that an eviction never removes an
+archive in use.
+Root deploys what the cache returns: the cache directory, its index and
+its entries are refused unless they are owned by the user running the
+setup and not writable by anybody else, and the digest of an entry is
+verified again before it is used.
+"""
+
+
+import errno
+import fcntl
+import gettext
+import gzip
+import hashlib
+import json
+import os
+import stat
+import tempfile
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+CHUNK_SIZE = 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+ENTRY_SUFFIX = '.ova'
+INDEX_FILE_NAME = 'index.json'
+FICLONE = 0x40049409
+
+
+def _check_owner(path, st, kind):
+    if (
+        st.st_uid != os.geteuid() or
+        st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        raise RuntimeError(
+            _('Refusing the appliance cache {kind} {path}: not owned by '
+              'uid {uid} or writable by others').format(
+                kind=kind,
+                path=path,
+                uid=os.geteuid(),
+            )
+        )
+
+
+def _file_sha1(path):
+    sha1 = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha1.update(chunk)
+    return sha1.hexdigest()
+
+
+class _HashingReader(object):
+
+    def __init__(self, f):
+        self._f = f
+        self.sha1 = hashlib.sha1()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.sha1.update(data)
+        return data
+
+
+def is_compressed(path):
+    with open(path, 'rb') as f:
+        return f.read(len(GZIP_MAGIC)) == GZIP_MAGIC
+
+
+def clone(src, dst):
+    """
+    Make dst share the data of src: reflink where supported, hard link
+    otherwise. Return the method used, None if none worked.
+    """
+    try:
+        with open(src, 'rb') as s, open(dst, 'wb') as d:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        return 'reflink'
+    except (IOError, OSError):
+        if os.path.exists(dst):
+            os.unlink(dst)
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        return None
+
+
+class ApplianceCache(object):
+
+    def __init__(self, cache_dir, max_size):
+        self._cache_dir = cache_dir
+        self._max_size = max_size
+        self._index_path = os.path.join(cache_dir, INDEX_FILE_NAME)
+
+    def _entry_path(self, digest):
+        return os.path.join(self._cache_dir, digest + ENTRY_SUFFIX)
+
+    def _check_dir(self, create=False):
+        """
+        Return False if the cache directory does not exist, raise
+        RuntimeError if it cannot be trusted.
+        """
+        try:
+            st = os.lstat(self._cache_dir)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+            if not create:
+                return False
+            parent = os.path.dirname(self._cache_dir)
+            if not os.path.isdir(parent):
+                os.makedirs(parent, 0o755)
+            os.mkdir(self._cache_dir, 0o700)
+            st = os.lstat(self._cache_dir)
+        if not stat.S_ISDIR(st.st_mode):
+            raise RuntimeError(
+                _('The appliance cache {path} is not a directory').format(
+                    path=self._cache_dir,
+                )
+            )
+        _check_owner(self._cache_dir, st, _('directory'))
+        return True
+
+    def _check_file(self, path):
+        st = os.lstat(path)
+        if not stat.S_ISREG(st.st_mode):
+            raise RuntimeError(
+                _('The appliance cache entry {path} is not a file').format(
+                    path=path,
+                )
+            )
+        _check_owner(path, st, _('file'))
+
+    def _load_index(self):
+        try:
+            self._check_file(self._index_path)
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {'sources': {}, 'entries': {}}
+        index.setdefault('sources', {})
+        index.setdefault('entries', {})
+        return index
+
+    def _save_index(self, index):
+        fd, tmp = tempfile.mkstemp(dir=self._cache_dir)
+        with os.fdopen(fd, 'w') as f:
+            json.dump(index, f, indent=4)
+        os.rename(tmp, self._index_path)
+
+    def _key(self, ova_path):
+        st = os.stat(ova_path)
+        return '{p}:{s}:{m}'.format(
+            p=os.path.realpath(ova_path),
+            s=st.st_size,
+            m=st.st_mtime,
+        )
+
+    def lookup(self, ova_path):
+        """
+        Return the cached archive of ova_path, None on a miss or if the
+        archive does not match the digest recorded when it was added.
+        """
+        if not self._check_dir():
+            return None
+        index = self._load_index()
+        digest = index['sources'].get(self._key(ova_path))
+        if digest is None:
+            return None
+        path = self._entry_path(digest)
+        if not os.path.exists(path):
+            return None
+        self._check_file(path)
+        if _file_sha1(path) != index['entries'].get(digest):
+            return None
+        # The modification time orders the entries for the eviction
+        os.utime(path, None)
+        return path
+
+    def add(self, ova_path, expected_sha1=None):
+        """
+        Decompress ova_path into the cache and return the new entry.
+        Raise RuntimeError if the digest does not match expected_sha1.
+        """
+        self._check_dir(create=True)
+        fd, tmp = tempfile.mkstemp(dir=self._cache_dir)
+        try:
+            entry_sha1 = hashlib.sha1()
+            with open(ova_path, 'rb') as f, os.fdopen(fd, 'wb') as out:
+                reader = _HashingReader(f)
+                with gzip.GzipFile(fileobj=reader, mode='rb') as src:
+                    for chunk in iter(lambda: src.read(CHUNK_SIZE), b''):
+                        entry_sha1.update(chunk)
+                        out.write(chunk)
+            digest = reader.sha1.hexdigest()
+            if (
+                expected_sha1 and
+                digest != expected_sha1.strip().lower()
+            ):
+                raise RuntimeError(
+                    _('The sha1sum of {ova} does not match').format(
+                        ova=ova_path,
+                    )
+                )
+            path = self._entry_path(digest)
+            os.rename(tmp, path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        index = self._load_index()
+        index['sources'][self._key(ova_path)] = digest
+        index['entries'][digest] = entry_sha1.hexdigest()
+        self._save_index(index)
+        self.evict(keep=path)
+        return path
+
+    def get(self, ova_path, expected_sha1=None):
+        return self.lookup(ova_path) or self.add(ova_path, expected_sha1)
+
+    def evict(self, keep=None):
+        """
+        Remove the least recently used entries until the cache fits its
+        maximum size; keep is never removed.
+        """
+        entries = []
+        for name in os.listdir(self._cache_dir):
+            if not name.endswith(ENTRY_SUFFIX):
+                continue
+            path = os.path.join(self._cache_dir, name)
+            st = os.stat(path)
+            entries.append((st.st_mtime, st.st_size, path))
+        total = sum(e[1] for e in entries)
+        removed = []
+        for mtime, size, path in sorted(entries):
+            if total <= self._max_size:
+                break
+            if path == keep:
+                continue
+            os.unlink(path)
+            total -= size
+            removed.append(path)
+        if removed:
+            index = self._load_index()
+            index['sources'] = dict(
+                (k, v) for k, v in index['sources'].items()
+                if self._entry_path(v) not in removed
+            )
+            index['entries'] = dict(
+                (k, v) for k, v in index['entries'].items()
+                if self._entry_path(k) not in removed
+            )
+            self._save_index(index)
+        return removed
+
+    def checkout(self, entry, dest_dir):
+        """
+        Return a private copy of entry, in a new directory under
+        dest_dir, sharing its data, or entry itself if the filesystem
+        cannot share it.
+        """
+        checkout_dir = tempfile.mkdtemp(dir=dest_dir, prefix='appliance-')
+        dst = os.path.join(checkout_dir, os.path.basename(entry))
+        if clone(entry, dst) is None:
+            os.rmdir(checkout_dir)
+            return entry
+        return dst
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,86 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import gzip
+import hashlib
+import os
+
+import pytest
+
+from . import appliance_cache
+
+
+def _ova(tmpdir, content=b'appliance disk'):
+    path = tmpdir.join('appliance.ova')
+    with gzip.open(str(path), 'wb') as f:
+        f.write(content)
+    return str(path), hashlib.sha1(path.read_binary()).hexdigest()
+
+
+def _cache(tmpdir):
+    return appliance_cache.ApplianceCache(
+        cache_dir=str(tmpdir.join('lib', 'appliance-cache')),
+        max_size=1024 * 1024,
+    )
+
+
+def test_add_lookup_checkout(tmpdir):
+    ova, sha1 = _ova(tmpdir)
+    cache = _cache(tmpdir)
+    assert cache.lookup(ova) is None
+    entry = cache.add(ova, expected_sha1=sha1)
+    assert os.path.basename(entry) == sha1 + appliance_cache.ENTRY_SUFFIX
+    assert os.stat(os.path.dirname(entry)).st_mode & 0o777 == 0o700
+    assert cache.lookup(ova) == entry
+    checkout = cache.checkout(entry, str(tmpdir))
+    with open(checkout, 'rb') as f:
+        assert f.read() == b'appliance disk'
+
+
+def test_sha1_mismatch(tmpdir):
+    ova, sha1 = _ova(tmpdir)
+    cache = _cache(tmpdir)
+    with pytest.raises(RuntimeError, match='does not match'):
+        cache.add(ova, expected_sha1='0' * 40)
+    assert cache.lookup(ova) is None
+
+
+def test_tampered_entry_is_not_used(tmpdir):
+    ova, sha1 = _ova(tmpdir)
+    cache = _cache(tmpdir)
+    entry = cache.add(ova)
+    with open(entry, 'wb') as f:
+        f.write(b'planted disk')
+    assert cache.lookup(ova) is None
+
+
+def test_untrusted_cache_is_refused(tmpdir):
+    ova, sha1 = _ova(tmpdir)
+    cache = _cache(tmpdir)
+    entry = cache.add(ova)
+    os.chmod(entry, 0o666)
+    with pytest.raises(RuntimeError, match='Refusing'):
+        cache.lookup(ova)
+    os.chmod(entry, 0o600)
+    os.chmod(os.path.dirname(entry), 0o777)
+    with pytest.raises(RuntimeError, match='Refusing'):
+        cache.lookup(ova)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,237 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Catalog of the installed engine appliances.
+The descriptors are parsed once, the OVA files are validated and their
+sha1sum can be verified in the background; the results are kept in an
+index next to the descriptors and reused while neither the descriptor
+nor the OVA change.
+"""
+
+
+import configparser
+import glob
+import hashlib
+import json
+import os
+
+
+INDEX_FILE_NAME = 'appliances-index.json'
+INDEX_VERSION = 1
+KEYS = ('description', 'version', 'path', 'sha1sum')
+CHUNK_SIZE = 1024 * 1024
+
+_FAKE_SECTION = 'appliance'
+
+
+def file_hash(filename, chunk_size=CHUNK_SIZE):
+    h = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def parse_descriptor(path):
+    """
+    Return the appliance described by path, None if any of the required
+    keys is missing. The descriptors have no section header.
+    """
+    config = configparser.ConfigParser()
+    config.optionxform = str
+    with open(path) as stream:
+        config.read_string(
+            u'[{s}]\n{c}'.format(s=_FAKE_SECTION, c=stream.read()),
+            source=path,
+        )
+    if not all(config.has_option(_FAKE_SECTION, k) for k in KEYS):
+        return None
+    return dict((k, config.get(_FAKE_SECTION, k)) for k in KEYS)
+
+
+def _stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime]
+
+
+class ApplianceCatalog(object):
+
+    def __init__(self, desc_dir, pattern, index_name=INDEX_FILE_NAME):
+        self._desc_dir = desc_dir
+        self._pattern = pattern
+        self._index_path = os.path.join(desc_dir, index_name)
+        self._entries = []
+        self._errors = []
+        self._dirty = False
+
+    def _load_index(self):
+        try:
+            with open(self._index_path) as f:
+                index = json.load(f)
+        except (IOError, OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        return index.get('descriptors', {})
+
+    def _describe(self, conf, cached):
+        conf_stat = _stat(conf)
+        if cached and cached.get('conf_stat') == conf_stat:
+            entry = cached
+        else:
+            appliance = parse_descriptor(conf)
+            if appliance is None:
+                return None
+            self._dirty = True
+            entry = {
+                'conf': conf,
+                'conf_stat': conf_stat,
+                'appliance': appliance,
+            }
+        ova_stat = _stat(entry['appliance']['path'])
+        if 'ova_stat' not in entry or entry['ova_stat'] != ova_stat:
+            self._dirty = True
+            entry['ova_stat'] = ova_stat
+            entry['sha1_verified'] = None
+        entry['valid'] = ova_stat is not None and ova_stat[0] > 0
+        return entry
+
+    def load(self):
+        """
+        Parse the descriptors not already indexed and validate the
+        appliance paths.
+        """
+        cached = self._load_index()
+        self._entries = []
+        self._errors = []
+        for conf in sorted(
+            glob.glob(os.path.join(self._desc_dir, self._pattern))
+        ):
+            try:
+                entry = self._describe(conf, cached.get(conf))
+            except (IOError, OSError, configparser.Error) as e:
+                self._errors.append((conf, str(e)))
+                continue
+            if entry is None:
+                self._errors.append((conf, 'missing keys'))
+            elif not entry['valid']:
+                self._errors.append(
+                    (conf, 'invalid path {p}'.format(
+                        p=entry['appliance']['path'],
+                    ))
+                )
+                self._entries.append(entry)
+            else:
+                self._entries.append(entry)
+        if len(self._entries) != len(cached):
+            self._dirty = True
+        return self
+
+    def errors(self):
+        """Return the (descriptor, reason) of the discarded descriptors."""
+        return list(self._errors)
+
+    def appliances(self):
+        """Return the valid appliances, in descriptor order."""
+        appliances = []
+        for entry in self._entries:
+            if entry['valid'] and entry['sha1_verified'] is not False:
+                app = dict(entry['appliance'])
+                app['index'] = str(len(appliances) + 1)
+                appliances.append(app)
+        return appliances
+
+    def rejected(self):
+        """Return the entries whose sha1sum is known not to match."""
+        return [
+            entry for entry in self._entries
+            if entry['valid'] and entry['sha1_verified'] is False
+        ]
+
+    def _work_item(self, entry):
+        return 'ohosted.work.appliance.sha1.{p}'.format(
+            p=entry['appliance']['path'],
+        )
+
+    def verify(self, sched):
+        """
+        Schedule the sha1sum verification of the valid appliances not
+        verified yet, they all run in parallel.
+        """
+        pending = []
+        for entry in self._entries:
+            if not entry['valid'] or entry['sha1_verified'] is not None:
+                continue
+            output = self._work_item(entry)
+            if not sched.scheduled(output):
+                sched.add(
+                    name=output,
+                    func=lambda inputs, p=entry['appliance']['path']: (
+                        file_hash(p)
+                    ),
+                    provides=(output,),
+                )
+            pending.append(entry)
+        return pending
+
+    def wait_verified(self, sched, timeout=None):
+        """
+        Collect the results of verify(), return the entries whose
+        sha1sum does not match their descriptor.
+        """
+        mismatches = []
+        for entry in self.verify(sched):
+            try:
+                sha1 = sched.result(self._work_item(entry), timeout)
+            except (IOError, OSError):
+                sha1 = None
+            entry['sha1_verified'] = (
+                sha1 == entry['appliance']['sha1sum'].strip().lower()
+            )
+            self._dirty = True
+            if not entry['sha1_verified']:
+                mismatches.append(entry)
+        return mismatches
+
+    def save(self):
+        """Persist the index, if anything changed."""
+        if not self._dirty:
+            return
+        tmp = '{p}.tmp'.format(p=self._index_path)
+        with open(tmp, 'w') as f:
+            json.dump(
+                {
+                    'version': INDEX_VERSION,
+                    'descriptors': dict(
+                        (entry['conf'], entry) for entry in self._entries
+                    ),
+                },
+                f,
+                indent=4,
+            )
+        os.rename(tmp, self._index_path)
+        self._dirty = False
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
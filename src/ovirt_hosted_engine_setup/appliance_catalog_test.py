@@ -0,0 +1,91 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import hashlib
+
+from . import appliance_catalog
+from . import scheduler
+
+
+def _appliance(tmpdir, name, content, sha1=None):
+    ova = tmpdir.join('{n}.ova'.format(n=name))
+    ova.write(content)
+    tmpdir.join('{n}.conf'.format(n=name)).write(
+        'description=The {n} appliance\n'
+        'version={n}-1\n'
+        'path={p}\n'
+        'sha1sum={s}\n'.format(
+            n=name,
+            p=ova,
+            s=sha1 or hashlib.sha1(content.encode()).hexdigest(),
+        )
+    )
+    return ova
+
+
+def _catalog(tmpdir):
+    return appliance_catalog.ApplianceCatalog(
+        desc_dir=str(tmpdir),
+        pattern='*.conf',
+    ).load()
+
+
+def test_load_discards_invalid_descriptors(tmpdir):
+    _appliance(tmpdir, 'good', 'disk')
+    _appliance(tmpdir, 'empty', '')
+    tmpdir.join('partial.conf').write('description=No path\n')
+    catalog = _catalog(tmpdir)
+    assert [a['version'] for a in catalog.appliances()] == ['good-1']
+    assert catalog.appliances()[0]['index'] == '1'
+    assert sorted(
+        reason.split()[0] for conf, reason in catalog.errors()
+    ) == ['invalid', 'missing']
+
+
+def test_verify_and_reuse_the_index(tmpdir):
+    _appliance(tmpdir, 'good', 'disk')
+    _appliance(tmpdir, 'corrupt', 'disk', sha1='0' * 40)
+    catalog = _catalog(tmpdir)
+    sched = scheduler.Scheduler()
+    mismatches = catalog.wait_verified(sched, timeout=5)
+    assert [e['appliance']['version'] for e in mismatches] == [
+        'corrupt-1'
+    ]
+    assert [a['version'] for a in catalog.appliances()] == ['good-1']
+    catalog.save()
+
+    reloaded = _catalog(tmpdir)
+    assert reloaded.verify(sched) == []
+    assert [a['version'] for a in reloaded.appliances()] == ['good-1']
+    assert [e['appliance']['version'] for e in reloaded.rejected()] == [
+        'corrupt-1'
+    ]
+
+
+def test_changed_ova_is_verified_again(tmpdir):
+    ova = _appliance(tmpdir, 'good', 'disk')
+    catalog = _catalog(tmpdir)
+    assert catalog.wait_verified(scheduler.Scheduler(), timeout=5) == []
+    catalog.save()
+    ova.write('other disk')
+    reloaded = _catalog(tmpdir)
+    assert len(reloaded.verify(scheduler.Scheduler())) == 1
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,88 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Streaming inspection of engine-backup archives.
+Both the backup and its nested ./files archive are read sequentially,
+only ENGINE_FQDN is parsed from the engine configuration files, and the
+reading stops as soon as the engine configuration directory has been
+read.
+"""
+
+
+import re
+import tarfile
+
+
+FILES_MEMBER = './files'
+CONF_DIR = 'etc/ovirt-engine/engine.conf.d/'
+_CONF_RE = re.compile('^' + re.escape(CONF_DIR) + '.*conf$')
+_FQDN_RE = re.compile('^ENGINE_FQDN=(?P<fqdn>\\S*).*')
+
+
+def _normalize(name):
+    return name[2:] if name.startswith('./') else name
+
+
+def _parse_fqdn(content):
+    fqdn = None
+    for line in content.splitlines():
+        # This is only a partial parsing, the full implementation is in
+        # the engine pythonlib.
+        match = _FQDN_RE.match(line)
+        if match:
+            fqdn = match.group('fqdn')
+    return fqdn
+
+
+def _scan_files(fileobj):
+    """
+    Return ENGINE_FQDN from the engine configuration files, later files
+    overriding earlier ones as the engine does, stopping at the first
+    member following the configuration directory.
+    """
+    fqdns = {}
+    with tarfile.open(fileobj=fileobj, mode='r|*') as files:
+        in_conf_dir = False
+        for member in files:
+            name = _normalize(member.name)
+            if name.startswith(CONF_DIR) or name == CONF_DIR.rstrip('/'):
+                in_conf_dir = True
+                if member.isfile() and _CONF_RE.search(name):
+                    fqdn = _parse_fqdn(
+                        files.extractfile(member).read().decode('utf-8')
+                    )
+                    if fqdn is not None:
+                        fqdns[name] = fqdn
+            elif in_conf_dir:
+                break
+    return fqdns[max(fqdns)] if fqdns else None
+
+
+def engine_fqdn(path):
+    """Return ENGINE_FQDN from the backup in path, None if not found."""
+    with tarfile.open(path, mode='r|*') as backup:
+        for member in backup:
+            if member.name == FILES_MEMBER:
+                return _scan_files(backup.extractfile(member))
+    return None
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,77 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import io
+import os
+import tarfile
+
+from . import backup_inspector
+
+
+def _add(tar, name, content):
+    info = tarfile.TarInfo(name)
+    info.size = len(content)
+    tar.addfile(info, io.BytesIO(content))
+
+
+def _make_backup(path):
+    files = io.BytesIO()
+    with tarfile.open(fileobj=files, mode='w:gz') as tar:
+        _add(tar, 'etc/ovirt-engine/engine.conf', b'ENGINE_FQDN=wrong\n')
+        _add(
+            tar,
+            'etc/ovirt-engine/engine.conf.d/20-setup.conf',
+            b'ENGINE_FQDN=old.example.com\nENGINE_PROXY_ENABLED=false\n',
+        )
+        _add(
+            tar,
+            'etc/ovirt-engine/engine.conf.d/10-setup.conf',
+            b'ENGINE_FQDN=older.example.com\n',
+        )
+        _add(
+            tar,
+            'etc/ovirt-engine/engine.conf.d/25-setup-database.conf',
+            b'ENGINE_DB_PASSWORD=secret\n',
+        )
+        _add(
+            tar,
+            'etc/ovirt-engine/engine.conf.d/30-setup.conf',
+            b'# ENGINE_FQDN=commented\nENGINE_FQDN=engine.example.com\n',
+        )
+        _add(tar, 'etc/pki/ovirt-engine/cert.conf', b'ENGINE_FQDN=pki\n')
+    with tarfile.open(path, mode='w:gz') as tar:
+        _add(tar, './version', b'1.0\n')
+        _add(tar, './files', files.getvalue())
+        _add(tar, './db/engine_backup.db', b'\0' * 4096)
+
+
+def test_engine_fqdn(tmpdir):
+    path = os.path.join(str(tmpdir), 'backup.tar.gz')
+    _make_backup(path)
+    assert backup_inspector.engine_fqdn(path) == 'engine.example.com'
+
+
+def test_engine_fqdn_not_found(tmpdir):
+    path = os.path.join(str(tmpdir), 'backup.tar.gz')
+    with tarfile.open(path, mode='w:gz') as tar:
+        _add(tar, './version', b'1.0\n')
+    assert backup_inspector.engine_fqdn(path) is None
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
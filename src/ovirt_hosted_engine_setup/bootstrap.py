@@ -0,0 +1,58 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Preparation of the local VM bootstrap.
+The initial clean up of the host and the preparation of the appliance
+(sha1sum verification, decompression into the appliance cache) do not
+depend on each other: they run concurrently and the bootstrap waits for
+both.
+"""
+
+
+from ovirt_hosted_engine_setup import scheduler
+
+
+INITIAL_CLEAN = 'ohosted.work.local_vm.initial_clean'
+APPLIANCE = 'ohosted.work.local_vm.appliance'
+
+
+def prepare(clean_up, prepare_appliance):
+    """
+    Run clean_up() and prepare_appliance() concurrently and return the
+    result of prepare_appliance() once both ended. A failure is raised
+    only after both ended, no work is left running in the background.
+    """
+    sched = scheduler.Scheduler(max_workers=2)
+    sched.add(
+        name='initial_clean_up',
+        func=lambda inputs: clean_up(),
+        provides=(INITIAL_CLEAN,),
+    )
+    sched.add(
+        name='prepare_appliance',
+        func=lambda inputs: prepare_appliance(),
+        provides=(APPLIANCE,),
+    )
+    sched.wait()
+    return sched.result(APPLIANCE)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,60 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import threading
+import time
+
+import pytest
+
+from . import bootstrap
+
+
+def test_clean_up_and_appliance_overlap():
+    # Each side only completes if the other one is running meanwhile
+    barrier = threading.Barrier(2, timeout=5)
+
+    def clean_up():
+        barrier.wait()
+
+    def prepare_appliance():
+        barrier.wait()
+        return '/var/tmp/appliance.ova'
+
+    assert bootstrap.prepare(
+        clean_up,
+        prepare_appliance,
+    ) == '/var/tmp/appliance.ova'
+
+
+def test_failure_waits_for_both():
+    done = []
+
+    def clean_up():
+        raise RuntimeError('clean up failed')
+
+    def prepare_appliance():
+        time.sleep(0.1)
+        done.append(True)
+
+    with pytest.raises(RuntimeError, match='clean up failed'):
+        bootstrap.prepare(clean_up, prepare_appliance)
+    assert done == [True]
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
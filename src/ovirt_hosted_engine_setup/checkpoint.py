@@ -0,0 +1,176 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Checkpoints of the completed deploy phases.
+Each phase is recorded, in order, with the fingerprint of its inputs and
+its outputs; a resumed deploy replays the outputs of a phase while its
+fingerprint matches and runs again the first phase that does not match
+and all the following ones. Secrets are neither stored nor fingerprinted.
+"""
+
+
+import errno
+import hashlib
+import json
+import os
+import tempfile
+
+
+VERSION = 1
+PHASE_BOOTSTRAP_LOCAL_VM = 'bootstrap_local_vm'
+PHASE_CREATE_STORAGE_DOMAIN = 'create_storage_domain'
+PHASE_CREATE_TARGET_VM = 'create_target_vm'
+_SECRET_WORDS = ('password', 'passwd', 'secret')
+
+
+def _is_secret(key):
+    key = str(key).lower()
+    return any(w in key for w in _SECRET_WORDS)
+
+
+def scrub(value):
+    """Return a copy of value without the keys naming secrets."""
+    if isinstance(value, dict):
+        return dict(
+            (k, scrub(v)) for k, v in value.items() if not _is_secret(k)
+        )
+    if isinstance(value, (list, tuple)):
+        return [scrub(v) for v in value]
+    return value
+
+
+def fingerprint(inputs, exclude=()):
+    """Return the fingerprint of the inputs of a phase."""
+    return hashlib.sha1(
+        json.dumps(
+            scrub(
+                dict(
+                    (k, v) for k, v in inputs.items() if k not in exclude
+                )
+            ),
+            sort_keys=True,
+            default=str,
+        ).encode('utf-8')
+    ).hexdigest()
+
+
+class CheckpointStore(object):
+
+    def __init__(self, path):
+        self._path = path
+        self._phases = []
+
+    def load(self):
+        try:
+            with open(self._path) as f:
+                state = json.load(f)
+        except (IOError, OSError, ValueError):
+            state = {}
+        if state.get('version') == VERSION:
+            self._phases = state.get('phases', [])
+        else:
+            self._phases = []
+        return self
+
+    def _save(self):
+        directory = os.path.dirname(self._path)
+        if not os.path.isdir(directory):
+            os.makedirs(directory, 0o700)
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        try:
+            with os.fdopen(fd, 'w') as f:
+                json.dump(
+                    {'version': VERSION, 'phases': self._phases},
+                    f,
+                    indent=4,
+                    default=str,
+                )
+                f.flush()
+                os.fsync(f.fileno())
+            os.rename(tmp, self._path)
+        except Exception:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+
+    def _index(self, phase):
+        for i, entry in enumerate(self._phases):
+            if entry['phase'] == phase:
+                return i
+        return None
+
+    def phases(self):
+        """Return the names of the recorded phases, in order."""
+        return [entry['phase'] for entry in self._phases]
+
+    def replay(self, phase, digest, valid=None):
+        """
+        Return the outputs recorded for phase if they were produced from
+        inputs with the same fingerprint and valid(outputs) accepts them.
+        Otherwise phase and the following ones are invalidated and None
+        is returned.
+        """
+        i = self._index(phase)
+        if i is None:
+            return None
+        entry = self._phases[i]
+        if (
+            entry['fingerprint'] == digest and
+            (valid is None or valid(entry['outputs']))
+        ):
+            return entry['outputs']
+        self.invalidate(phase)
+        return None
+
+    def record(self, phase, digest, outputs):
+        """
+        Record phase as completed, invalidating the phases recorded after
+        it since they were based on its previous outputs.
+        """
+        i = self._index(phase)
+        if i is not None:
+            del self._phases[i:]
+        self._phases.append(
+            {
+                'phase': phase,
+                'fingerprint': digest,
+                'outputs': scrub(outputs),
+            }
+        )
+        self._save()
+
+    def invalidate(self, phase):
+        """Drop phase and the phases recorded after it."""
+        i = self._index(phase)
+        if i is not None:
+            del self._phases[i:]
+            self._save()
+
+    def clear(self):
+        self._phases = []
+        try:
+            os.unlink(self._path)
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
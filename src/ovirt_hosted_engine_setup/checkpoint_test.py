@@ -0,0 +1,68 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+import json
+import os
+
+from . import checkpoint
+
+
+def test_fingerprint_ignores_secrets_and_excluded_keys():
+    inputs = {'he_fqdn': 'engine.example.com', 'he_vm_uuid': 'a'}
+    digest = checkpoint.fingerprint(inputs, exclude=('he_vm_uuid',))
+    assert digest == checkpoint.fingerprint(
+        dict(inputs, he_admin_password='x', he_vm_uuid='b'),
+        exclude=('he_vm_uuid',),
+    )
+    assert digest != checkpoint.fingerprint(
+        dict(inputs, he_fqdn='other.example.com'),
+        exclude=('he_vm_uuid',),
+    )
+
+
+def test_replay_and_invalidate(tmpdir):
+    path = os.path.join(str(tmpdir), 'state', 'checkpoints.json')
+    store = checkpoint.CheckpointStore(path).load()
+    store.record('first', 'f1', {'dir': '/tmp/x', 'password': 'secret'})
+    store.record('second', 'f2', {'sd': {'iscsi_password': 'secret'}})
+    with open(path) as f:
+        assert 'secret' not in f.read()
+
+    store = checkpoint.CheckpointStore(path).load()
+    assert store.replay('first', 'f1') == {'dir': '/tmp/x'}
+    assert store.replay('second', 'f2') == {'sd': {}}
+
+    # A phase recorded again invalidates the following ones
+    store.record('first', 'f1', {'dir': '/tmp/y'})
+    assert store.phases() == ['first']
+
+    # So does a mismatching fingerprint or invalid outputs
+    store.record('second', 'f2', {})
+    assert store.replay('first', 'f1', valid=lambda o: False) is None
+    assert checkpoint.CheckpointStore(path).load().phases() == []
+
+    store.clear()
+    assert not os.path.exists(path)
+    with open(path, 'w') as f:
+        json.dump({'version': 0, 'phases': [{'phase': 'first'}]}, f)
+    assert checkpoint.CheckpointStore(path).load().phases() == []
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,902 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+hosted-engine command line.
+Every command runs in this single process: the configuration is read
+once and the vdsm and HA client libraries are imported only by the
+commands using them.
+"""
+
+
+import argparse
+import collections
+import getpass
+import gettext
+import json
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+
+from ovirt_hosted_engine_setup import constants as ohostedcons
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+RC_NOT_DEPLOYED = 1
+RC_NOT_CORRECTLY_DEPLOYED = 2
+LOCAL_VM_NAME = 'HostedEngineLocal'
+CONSOLE_TICKET_TTL = '120'
+SHUTDOWN_DELAY = '120'
+WAIT_MAINTENANCE_TIMEOUT = 120
+HA_CLIENT_MODULE = 'ovirt_hosted_engine_ha.lib.util'
+
+_CONF_RE = re.compile('^(?P<key>[A-Za-z_][A-Za-z0-9_]*)=(?P<value>.*)$')
+
+USAGE = """\
+Usage: {prog} [--help] <command> [<command-args>]
+    --help
+        show this help message.
+
+    The available commands are:
+        --deploy [options]
+            run ovirt-hosted-engine deployment.
+        --deploy --preflight --config-append=<file> [--json]
+            check the settings of an answer file against this host.
+        --vm-start
+            start VM on this host
+        --vm-start-paused.
+            start VM on this host with qemu paused.
+        --vm-shutdown
+            gracefully shutdown the VM on this host.
+        --vm-poweroff
+            forcefully poweroff the VM on this host.
+        --vm-status [--json]
+            VM status according to the HA agent. If --json is given, the
+            output will be in machine-readable (JSON) format.
+        --fleet-status [<host>...] [--hosts-file=<file>] [--json]
+            Collect concurrently the status of several hosts over ssh and
+            merge it into one view per cluster.
+        --add-console-password [--password=<password>]
+            Create a temporary password for vnc/spice connection. If
+            --password is given, the password will be set to the value
+            provided. Otherwise, if it is set, the environment variable
+            OVIRT_HOSTED_ENGINE_CONSOLE_PASSWORD will be used. As a last
+            resort, the password will be read interactively.
+        --config-append=<file>
+            Load extra configuration files or answer file.
+        --check-deployed
+            Check whether the hosted engine has been deployed already.
+        --check-liveliness
+            Checks liveliness page of engine.
+        --connect-storage
+            Connect the hosted engine storage domain.
+        --disconnect-storage
+            Disconnect the hosted engine storage domain.
+        --console
+            Open the configured serial console.
+        --set-maintenance --mode=<mode> [--wait[=<seconds>]]
+            Set maintenance status to the specified mode (global/local/none).
+            With --wait, wait until the HA agent reports it.
+        --set-shared-config <key> <value> [--type=<type>]
+            Set specified key to the specified value. If the key is duplicated
+            in several files a type must be provided.
+        --set-shared-config --from-file=<file>
+            Set all the keys of a JSON file in a single session.
+        --get-shared-config <key> [--type=<type>]
+            Get specified key's value. If the key is duplicated in several
+            files a type must be provided.
+        --get-shared-config <key>...|--all [--type=<type>] [--json]
+            Get several or all the keys in a single session.
+        --reinitialize-lockspace
+            Make sure all hosted engine agents are down and reinitialize the
+            sanlock lockspaces.
+        --clean-metadata
+            Remove the metadata for the current host's agent from the global
+            status database. This makes all other hosts forget about this
+            host.
+        --profile-report [<path>...] [--top=<n>] [--json|--csv]
+            Aggregate the ansible task profiles of one or more deployments
+            and report the slowest tasks.
+
+"""
+
+COMMANDS = collections.OrderedDict()
+
+
+def command(option, usage):
+    """Register the decorated function as the handler of option."""
+    def decorator(f):
+        COMMANDS[option] = (f, usage)
+        return f
+    return decorator
+
+
+def load_config(path):
+    """
+    Return the values of the hosted-engine configuration file, None if
+    it cannot be read.
+    """
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+    except (IOError, OSError):
+        return None
+    config = {}
+    for line in lines:
+        match = _CONF_RE.match(line)
+        if match:
+            config[match.group('key')] = match.group('value').strip('"\'')
+    return config
+
+
+def _option_value(args, index, name):
+    prefix = '--{name}='.format(name=name)
+    if len(args) > index and args[index].startswith(prefix):
+        return args[index][len(prefix):]
+    return None
+
+
+class Cli(object):
+
+    def __init__(self, prog, config):
+        self.prog = prog
+        self.config = config
+        values = config or {}
+        self.vmid = values.get('vmid') or None
+        self.vm_conf = values.get('conf')
+
+    def not_deployed(self):
+        print(_('You must run deploy first'))
+        return RC_NOT_DEPLOYED
+
+    def vm_conf_available(self):
+        if self.vm_conf and os.access(self.vm_conf, os.R_OK):
+            return True
+        print(
+            _(
+                'The hosted engine configuration has not been retrieved '
+                'from shared storage. Please ensure that ovirt-ha-agent is '
+                'running and the storage server is reachable.'
+            )
+        )
+        return False
+
+    def vm_status(self):
+        """Return the engine VM status on this host, '' if not here."""
+        from ovirt_hosted_engine_setup import vdsm_helper
+        try:
+            return vdsm_helper.getVmStatus(self.vmid)
+        except vdsm_helper.ServerError as e:
+            sys.stderr.write(str(e) + '\n')
+            return ''
+
+    def usage(self, text=USAGE):
+        sys.stdout.write(text.format(prog=self.prog))
+
+    def dispatch(self, args):
+        option = args[0]
+        if option == '--help':
+            if len(args) == 1:
+                self.usage()
+                return 0
+            option = args[1]
+            args = [option, '--help']
+        if option not in COMMANDS:
+            sys.stderr.write(
+                _("Invalid option '{option}'\n").format(option=option)
+            )
+            self.usage()
+            return 1
+        func, usage = COMMANDS[option]
+        if args[1:2] == ['--help']:
+            self.usage(usage)
+            return 0
+        return func(self, args[1:])
+
+
+@command(
+    '--deploy',
+    usage="""\
+Usage: {prog} --deploy [args]
+    Run ovirt-hosted-engine deployment.
+
+    --config-append=<file>
+        Load extra configuration files.
+    --generate-answer=<file>
+        Generate answer file.
+    --restore-from-file=<file>
+        Restore an engine backup file during the deployment.
+    --4
+        Force IPv4 on dual stack env.
+    --6
+        Force IPv6 on dual stack env.
+    --ansible-extra-vars=DATA
+        Pass '--extra-vars=DATA' to all ansible calls.
+        DATA can be anything that ansible can accept - var=value,
+        @file, JSON/YAML.
+        Please note: Using this option is supported only
+        with specific values as documented elsewhere.
+        Passing arbitrary values might conflict with existing
+        variables.
+    --resume
+        Resume a failed deployment, skipping the phases already
+        completed with the same configuration.
+    --preflight
+        Do not deploy: check concurrently the settings of the answer
+        files given with --config-append against this host and report
+        a pass/fail matrix with timings. The exit code is 1 if any
+        check failed.
+
+""",
+)
+def cmd_deploy(cli, args):
+    if '--preflight' in args:
+        from ovirt_hosted_engine_setup import preflight
+        return preflight.main([a for a in args if a != '--preflight'])
+    script = ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_SCRIPT
+    os.execv(script, [script] + args)
+
+
+def _start_vm(cli, vmconf, restart_statuses):
+    from ovirt_hosted_engine_setup import vdsm_helper
+    status = cli.vm_status()
+    if any(s in status for s in restart_statuses):
+        print(
+            _('VM exists and is {status}, cleaning up and restarting').format(
+                status=status,
+            )
+        )
+        vdsm_helper.destroy(argparse.Namespace(vmid=cli.vmid))
+    elif status:
+        print(
+            _('VM exists and its status is {status}').format(status=status)
+        )
+        return 1
+    if vdsm_helper.create(argparse.Namespace(filename=vmconf)) != 0:
+        print(_('VM failed to launch'))
+        return 1
+    print(_('VM in WaitForLaunch'))
+    return 0
+
+
+@command(
+    '--vm-start',
+    usage="""\
+Usage: {prog} --vm-start
+    Start the engine VM on this host.
+    Available only after deployment has completed.
+
+    --vm-conf=<file>
+        Load an alternative vm.conf file as a recovery action.
+""",
+)
+def cmd_vm_start(cli, args):
+    # TODO: Check first the sanlock status, and if allows:
+    if not cli.vmid:
+        return cli.not_deployed()
+    if not cli.vm_conf_available():
+        return 1
+    return _start_vm(
+        cli,
+        _option_value(args, 0, 'vm-conf') or cli.vm_conf,
+        ('Down', 'Paused'),
+    )
+
+
+@command(
+    '--vm-start-paused',
+    usage="""\
+Usage: {prog} --vm-start-paused
+    Start the engine VM in paused state on this host.
+    Available only after deployment has completed.
+""",
+)
+def cmd_vm_start_paused(cli, args):
+    # TODO: Check first the sanlock status, and if allows:
+    if not cli.vmid:
+        return cli.not_deployed()
+    if not cli.vm_conf_available():
+        return 1
+    fd, temp_conf = tempfile.mkstemp()
+    try:
+        with os.fdopen(fd, 'w') as f, open(cli.vm_conf) as src:
+            f.write(src.read())
+            f.write('launchPaused=true\n')
+        return _start_vm(cli, temp_conf, ('Down',))
+    finally:
+        os.unlink(temp_conf)
+
+
+@command(
+    '--vm-shutdown',
+    usage="""\
+Usage: {prog} --vm-shutdown
+    Gracefully shut down the engine VM on this host.
+    Available only after deployment has completed.
+""",
+)
+def cmd_vm_shutdown(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_setup import vdsm_helper
+    return vdsm_helper.shutdown(
+        argparse.Namespace(
+            vmid=cli.vmid,
+            delay=SHUTDOWN_DELAY,
+            message='VM is shutting down!',
+        )
+    )
+
+
+@command(
+    '--vm-poweroff',
+    usage="""\
+Usage: {prog} --vm-poweroff
+    Forcefully power off the engine VM on this host.
+    Available only after deployment has completed.
+""",
+)
+def cmd_vm_poweroff(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_setup import vdsm_helper
+    return vdsm_helper.destroy(argparse.Namespace(vmid=cli.vmid))
+
+
+@command(
+    '--vm-status',
+    usage="""\
+Usage: {prog} --vm-status [--json]
+    Report the status of the engine VM according to the HA agent.
+    Available only after deployment has completed.
+
+    If --json is given, the output will be in machine-readable (JSON) format.
+""",
+)
+def cmd_vm_status(cli, args):
+    if not cli.vmid:
+        with open(os.devnull, 'w') as devnull:
+            try:
+                local_vm = subprocess.call(
+                    ('virsh', '-r', 'domstate', LOCAL_VM_NAME),
+                    stdout=devnull,
+                    stderr=devnull,
+                ) == 0
+            except OSError:
+                local_vm = False
+        if local_vm:
+            print(
+                _(
+                    "It seems like a previous attempt to deploy "
+                    "hosted-engine failed or it's still in progress. "
+                    "Please clean it up before trying again"
+                )
+            )
+            return RC_NOT_CORRECTLY_DEPLOYED
+        return cli.not_deployed()
+    if not cli.vm_conf_available():
+        return 1
+    from ovirt_hosted_engine_setup import vm_status
+    status_checker = vm_status.VmStatus(with_json=args[:1] == ['--json'])
+    return 0 if status_checker.print_status() else 1
+
+
+@command(
+    '--fleet-status',
+    usage="""\
+Usage: {prog} --fleet-status [<host>...] [--hosts-file=<file>]
+        [--concurrency=<n>] [--timeout=<seconds>] [--json]
+    Collect the status of several hosted-engine hosts, possibly of
+    several clusters, and merge it into one view per cluster listing
+    every host once. The hosts are queried concurrently over ssh, so
+    the collection takes about the time of the slowest host.
+
+    --hosts-file=<file>
+            Query the hosts listed in <file>, one per line.
+    --concurrency=<n>
+            Query at most <n> hosts at a time (default 16).
+    --timeout=<seconds>
+            Give up on a host after <seconds> (default 15).
+    --json  Output in machine-readable (JSON) format.
+
+    Hosts whose data is not live are flagged as stale, hosts which did
+    not answer as unreachable. The exit code is 1 if any host did not
+    answer.
+""",
+)
+def cmd_fleet_status(cli, args):
+    from ovirt_hosted_engine_setup import fleet_status
+    return fleet_status.main(args)
+
+
+@command(
+    '--add-console-password',
+    usage="""\
+Usage: {prog} --add-console-password [--password=<password>]
+    Create a temporary password for vnc/spice connection.
+
+    If --password is given, the password will be set to the value provided.
+    Otherwise, if it is set, the environment variable
+    OVIRT_HOSTED_ENGINE_CONSOLE_PASSWORD will be used. As a last resort, the
+    password will be read interactively.
+    Available only after deployment has completed.
+""",
+)
+def cmd_add_console_password(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    password = _option_value(args, 0, 'password')
+    if password is None:
+        password = os.environ.get('OVIRT_HOSTED_ENGINE_CONSOLE_PASSWORD')
+    if not password:
+        if not sys.stdin.isatty():
+            sys.stderr.write(_('Standard input is not a terminal\n'))
+            return 1
+        password = getpass.getpass(_('Enter password: '))
+    from ovirt_hosted_engine_setup import vdsm_helper
+    return vdsm_helper.setVmTicket(
+        argparse.Namespace(
+            vmid=cli.vmid,
+            password=password,
+            ttl=CONSOLE_TICKET_TTL,
+        )
+    )
+
+
+@command(
+    '--check-liveliness',
+    usage="""\
+Usage: {prog} --check-liveliness
+    Report status of the engine services by checking the liveliness page.
+""",
+)
+def cmd_check_liveliness(cli, args):
+    if cli.config is None:
+        sys.stderr.write(_('Error reading the configuration file\n'))
+        return 2
+    if 'fqdn' not in cli.config:
+        sys.stderr.write(
+            _(
+                'Incomplete configuration, missing FQDN '
+                'of the hosted engine VM\n'
+            )
+        )
+        return 2
+    from ovirt_hosted_engine_setup import check_liveliness
+    live_checker = check_liveliness.LivelinessChecker()
+    if not live_checker.isEngineUp(cli.config['fqdn']):
+        print(_('Hosted Engine is not up!'))
+        return 1
+    print(_('Hosted Engine is up!'))
+    return 0
+
+
+@command(
+    '--check-deployed',
+    usage="""\
+Usage: {prog} --check-deployed
+    Report whether the engine has been deployed.
+""",
+)
+def cmd_check_deployed(cli, args):
+    if cli.vmid:
+        print(_('The hosted engine has been deployed'))
+        return 0
+    print(_('The hosted engine has not been deployed'))
+    return 1
+
+
+@command(
+    '--connect-storage',
+    usage="""\
+Usage: {prog} --connect-storage
+    Connect the storage domain.
+""",
+)
+def cmd_connect_storage(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_ha.client import client
+    client.HAClient().connect_storage_server(
+        timeout=ohostedcons.Const.STORAGE_SERVER_TIMEOUT,
+    )
+    return 0
+
+
+@command(
+    '--disconnect-storage',
+    usage="""\
+Usage: {prog} --disconnect-storage
+    Disconnect the storage domain.
+""",
+)
+def cmd_disconnect_storage(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_ha.client import client
+    client.HAClient().disconnect_storage_server(
+        timeout=ohostedcons.Const.STORAGE_SERVER_TIMEOUT,
+    )
+    return 0
+
+
+@command(
+    '--console',
+    usage="""\
+Usage: {prog} --console
+    Open the configured serial console.
+""",
+)
+def cmd_console(cli, args):
+    status = cli.vm_status()
+    if not status:
+        print(_('The engine VM is not on this host'))
+        return 0
+    if 'Up' in status:
+        print(_('The engine VM is running on this host'))
+    else:
+        print(
+            _(
+                'The engine VM is on this host but its status is {status}\n'
+                'Trying anyway to connect to its console:\n'
+            ).format(status=status)
+        )
+    console_dir = ohostedcons.FileLocations.OVIRT_VMCONSOLE_CONSOLE_DIR
+    try:
+        xml = subprocess.check_output(
+            ('virsh', '-r', 'dumpxml', cli.vmid),
+        ).decode('utf-8', 'replace')
+    except (OSError, subprocess.CalledProcessError):
+        xml = ''
+    sys.stdout.flush()
+    if console_dir not in xml:
+        os.execv(
+            '/usr/bin/virsh',
+            [
+                '/usr/bin/virsh',
+                '-c',
+                'qemu:///system?authfile={auth}'.format(
+                    auth=ohostedcons.FileLocations.VIRSH_AUTH,
+                ),
+                'console',
+                ohostedcons.Const.HOSTED_ENGINE_VM_NAME,
+            ]
+        )
+    print(_('Escape character is ^]'))
+    sys.stdout.flush()
+    os.execv(
+        '/usr/bin/socat',
+        [
+            '/usr/bin/socat',
+            'UNIX-CONNECT:{d}/{vmid}.sock'.format(
+                d=console_dir,
+                vmid=cli.vmid,
+            ),
+            'STDIO,raw,echo=0,escape=29',
+        ]
+    )
+
+
+@command(
+    '--set-maintenance',
+    usage="""\
+Usage: {prog} --set-maintenance --mode=<mode> [--wait[=<seconds>]]
+    Set maintenance status to the specified mode. Valid values are:
+    'global', 'local', and 'none'.
+    Available only after deployment has completed.
+
+    --wait[=<seconds>]
+        Wait until the HA agent reports the new mode, at most <seconds>
+        (default 120).
+""",
+)
+def cmd_set_maintenance(cli, args):
+    mode = _option_value(args, 0, 'mode')
+    wait = None
+    if args[1:2] == ['--wait']:
+        wait = WAIT_MAINTENANCE_TIMEOUT
+    elif _option_value(args, 1, 'wait') is not None:
+        try:
+            wait = int(_option_value(args, 1, 'wait'))
+        except ValueError:
+            print(_('Invalid value for --wait'))
+            return 1
+    if mode is None:
+        print(_('You must specify a maintenance mode with --mode'))
+        return 1
+    if mode not in ('global', 'local', 'none'):
+        print(_("Invalid value '{mode}' for --mode").format(mode=mode))
+        return 1
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_setup import set_maintenance
+    maintenance = set_maintenance.Maintenance()
+    if not maintenance.set_mode(mode):
+        return 1
+    if wait is not None and not maintenance.wait(mode, wait):
+        return 1
+    return 0
+
+
+def _shared_config_session():
+    from ovirt_hosted_engine_setup import shared_config
+    return shared_config.SharedConfigSession()
+
+
+def _set_shared_config_from_file(cli, path):
+    from ovirt_hosted_engine_setup import shared_config
+    try:
+        if path == '-':
+            content = sys.stdin.read()
+        else:
+            with open(path) as f:
+                content = f.read()
+        items = shared_config.parse_items(content)
+    except (IOError, OSError, ValueError) as e:
+        sys.stderr.write(
+            _('Cannot read {path}: {e}\n').format(path=path, e=e)
+        )
+        return 1
+    if not cli.vmid:
+        return cli.not_deployed()
+    try:
+        for key, value, config_type in _shared_config_session().set_many(
+            items
+        ):
+            print(
+                _('{key} set to {value}, type : {config_type}').format(
+                    key=key,
+                    value=value,
+                    config_type=config_type,
+                )
+            )
+    except socket.error:
+        sys.stderr.write(
+            _('Cannot connect to the HA daemon, please check the logs.\n')
+        )
+        return 1
+    except RuntimeError as e:
+        sys.stderr.write(
+            _('Nothing has been set:\n{e}\n').format(e=e)
+        )
+        return 1
+    return 0
+
+
+@command(
+    '--set-shared-config',
+    usage="""\
+Usage: {prog} --set-shared-config <key> <value> [--type=<type>]
+       {prog} --set-shared-config --from-file=<file>
+    Set shared storage configuration.
+    Valid types are: he_local, he_shared, ha, broker.
+    Available only after deployment has completed.
+
+    --from-file=<file>
+        Set all the keys of a JSON file ('-' for the standard input): an
+        object mapping keys to values, or a list of objects with key,
+        value and optionally type. All the keys are validated before
+        setting any of them.
+
+    New values for he_shared (hosted-engine.conf source on the shared storage)
+    will be used by all hosts (re)deployed after the configuration change.
+    Currently running hosts will still use the old values.
+    New values for he_local will be set in the local instance of
+    he configuration file on the local host.
+""",
+)
+def cmd_set_shared_config(cli, args):
+    path = _option_value(args, 0, 'from-file')
+    if path is not None:
+        return _set_shared_config_from_file(cli, path)
+    key = args[0] if len(args) > 0 else ''
+    value = args[1] if len(args) > 1 else ''
+    config_type = _option_value(args, 2, 'type') or ''
+    if not key:
+        print(_('You must specify a key to set'))
+        return 1
+    if not value:
+        print(_('You must specify a new value to set'))
+        return 1
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_setup import set_shared_config
+    return 0 if set_shared_config.SetSharedConfig().set_shared_config(
+        key,
+        value,
+        config_type,
+    ) else 1
+
+
+@command(
+    '--get-shared-config',
+    usage="""\
+Usage: {prog} --get-shared-config <key>... [--type=<type>] [--json]
+       {prog} --get-shared-config --all [--type=<type>] [--json]
+    Get shared storage configuration.
+    Valid types are: he_local, he_shared, ha, broker.
+    Available only after deployment has completed.
+
+    --all   Get all the keys, of the given type if any.
+    --json  Output in machine-readable (JSON) format, grouped by type.
+""",
+)
+def cmd_get_shared_config(cli, args):
+    options = [a for a in args if a.startswith('--')]
+    keys = [a for a in args if not a.startswith('--')]
+    if '--all' in options or '--json' in options or len(keys) > 1:
+        return _get_shared_configs(cli, keys, options)
+    key = args[0] if len(args) > 0 else ''
+    config_type = _option_value(args, 1, 'type') or ''
+    if not key:
+        print(_('You must specify a key to get'))
+        return 1
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_setup import get_shared_config
+    value_and_type = get_shared_config.GetSharedConfig().get_shared_config(
+        key,
+        config_type,
+    )
+    if not value_and_type:
+        return 1
+    print(_('\n{key} : {value}, type : {config_type}\n').format(
+        key=key,
+        value=value_and_type[0],
+        config_type=value_and_type[1]
+    ))
+    return 0
+
+
+def _get_shared_configs(cli, keys, options):
+    config_type = None
+    for option in options:
+        if option.startswith('--type='):
+            config_type = option[len('--type='):] or None
+        elif option not in ('--all', '--json'):
+            print(_("Invalid option '{option}'").format(option=option))
+            return 1
+    get_all = '--all' in options
+    if get_all == bool(keys):
+        print(_('You must specify either the keys to get or --all'))
+        return 1
+    if not cli.vmid:
+        return cli.not_deployed()
+    try:
+        values = _shared_config_session().get_many(
+            keys=None if get_all else keys,
+            config_type=config_type,
+        )
+    except socket.error:
+        sys.stderr.write(
+            _('Cannot connect to the HA daemon, please check the logs.\n')
+        )
+        return 1
+    except RuntimeError as e:
+        sys.stderr.write(str(e) + '\n')
+        return 1
+    if '--json' in options:
+        print(json.dumps(values, indent=4, sort_keys=True))
+        return 0
+    for c_type in sorted(values):
+        for key in sorted(values[c_type]):
+            print(_('{key} : {value}, type : {config_type}').format(
+                key=key,
+                value=values[c_type][key],
+                config_type=c_type,
+            ))
+    return 0
+
+
+@command(
+    '--reinitialize-lockspace',
+    usage="""\
+Usage: {prog} --reinitialize-lockspace [--force]
+    Reinitialize the sanlock lockspace file. This WIPES all locks.
+    Available only in properly deployed cluster in global maintenance mode
+    with all HA agents shut down.
+
+    --force  This option overrides the safety checks. Use at your own
+             risk DANGEROUS.
+""",
+)
+def cmd_reinitialize_lockspace(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    from ovirt_hosted_engine_ha.client import client
+    client.HAClient().reset_lockspace(args[:1] == ['--force'])
+    return 0
+
+
+@command(
+    '--clean-metadata',
+    usage="""\
+Usage: {prog} --clean_metadata [--force-cleanup] [--host-id=<id>]
+    Remove host's metadata from the global status database.
+    Available only in properly deployed cluster with properly stopped
+    agent.
+
+    --force-cleanup  This option overrides the safety checks. Use at your own
+                     risk DANGEROUS.
+
+    --host-id=<id>  Specify an explicit host id to clean
+""",
+)
+def cmd_clean_metadata(cli, args):
+    if not cli.vmid:
+        return cli.not_deployed()
+    if not cli.vm_conf_available():
+        return 1
+    agent = ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_HA_AGENT
+    os.execv(agent, [agent, '--cleanup'] + args)
+
+
+@command(
+    '--profile-report',
+    usage="""\
+Usage: {prog} --profile-report [<path>...] [--top=<n>] [--json|--csv]
+    Aggregate the ansible task profiles written by previous deployments
+    and report the slowest tasks.
+
+    <path>  A profile file or a directory containing profile files,
+            defaults to the hosted-engine setup log directory. Logs
+            collected from several hosts can be passed together.
+    --top=<n>
+            Report only the <n> slowest tasks (default 20, 0 for all).
+    --json  Output in machine-readable (JSON) format.
+    --csv   Output in CSV format.
+""",
+)
+def cmd_profile_report(cli, args):
+    from ovirt_hosted_engine_setup import profile_report
+    return profile_report.main(args)
+
+
+def main(argv):
+    """argv[0] is the name the command has been invoked with."""
+    cli = Cli(
+        prog=argv[0],
+        config=load_config(
+            ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_CONF
+        ),
+    )
+    if len(argv) < 2:
+        cli.usage()
+        return 1
+    try:
+        return cli.dispatch(argv[1:])
+    finally:
+        if HA_CLIENT_MODULE in sys.modules:
+            # force module de-import to close the globally
+            # shared json rpc client in the right order
+            del sys.modules[HA_CLIENT_MODULE]
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
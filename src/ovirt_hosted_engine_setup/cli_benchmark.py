@@ -0,0 +1,245 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Start-up latency benchmark of the hosted-engine commands.
+Every command is run several times with --help, measuring the start of
+the interpreter, the configuration loading and the dispatching. With
+--live the read-only commands are run for real, including the import of
+the vdsm and HA client libraries and the calls to the services. With
+--simulate the commands talking to the HA broker and VDSM are run
+against the simulator, also reporting the connections, the requests and
+the injected failures per run; see the simulator module for the options
+shaping the simulated cluster.
+It is not installed, run it from the source tree with src in PYTHONPATH.
+
+    python -m ovirt_hosted_engine_setup.cli_benchmark [--runs=N] [--live]
+        [--simulate [<simulator options>]] [--json] [<command>...]
+
+Commands are named without the leading dashes, e.g. vm-status.
+"""
+
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from ovirt_hosted_engine_setup import cli
+from ovirt_hosted_engine_setup import simulator
+
+
+LIVE_COMMANDS = (
+    ('--check-deployed',),
+    ('--vm-status',),
+    ('--vm-status', '--json'),
+    ('--check-liveliness',),
+)
+
+SIMULATED_COMMANDS = (
+    ('--check-deployed',),
+    ('--vm-status',),
+    ('--vm-status', '--json'),
+    ('--get-shared-config', '--all'),
+    ('--set-maintenance', '--mode=global', '--wait=30'),
+    ('--set-maintenance', '--mode=none', '--wait=30'),
+    ('--set-maintenance', '--mode=local'),
+    ('--set-maintenance', '--mode=none'),
+    ('--connect-storage',),
+    ('--reinitialize-lockspace', '--force'),
+)
+
+
+def _percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def measure(args, runs, executable=None, server=None):
+    """
+    Return the wall times in ms of runs executions of the command, run
+    against the simulator server if given.
+    """
+    if server is None:
+        runner = [cli.__name__, 'hosted-engine']
+    else:
+        runner = [
+            simulator.__name__,
+            'run',
+            '--socket={s}'.format(s=server.server_address),
+            '--',
+        ]
+        server.reset_stats()
+    cmd = [executable or sys.executable, '-m'] + runner + list(args)
+    times = []
+    rc = None
+    failed = 0
+    for i in range(runs):
+        start = time.monotonic()
+        rc = subprocess.call(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append((time.monotonic() - start) * 1000)
+        if rc != 0:
+            failed += 1
+    result = {
+        'command': ' '.join(args),
+        'rc': rc,
+        'runs': runs,
+        'failed_runs': failed,
+        'min_ms': round(min(times), 1),
+        'median_ms': round(_percentile(times, 50), 1),
+        'p95_ms': round(_percentile(times, 95), 1),
+    }
+    if server is not None:
+        stats = server.stats()
+        result.update({
+            'connections_per_run': round(
+                sum(stats['connections'].values()) / float(runs), 1
+            ),
+            'requests_per_run': round(
+                sum(stats['requests'].values()) / float(runs), 1
+            ),
+            'injected_failures': sum(stats['failures'].values()),
+            'requests': stats['requests'],
+        })
+    return result
+
+
+def start_simulator(args):
+    """Return a simulator server, serving in a thread."""
+    path = os.path.join(
+        tempfile.mkdtemp(prefix='he-simulator-'),
+        'simulator.socket',
+    )
+    server = simulator.Server(
+        path,
+        simulator.Cluster(
+            hosts=args.hosts,
+            engine_host=args.engine_host,
+            agent_delay=args.agent_delay,
+        ),
+        broker_latency=args.broker_latency / 1000.0,
+        vdsm_latency=args.vdsm_latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        broker_failure_rate=args.broker_failure_rate,
+        vdsm_failure_rate=args.vdsm_failure_rate,
+        seed=args.seed,
+    )
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+
+def stop_simulator(server):
+    server.shutdown()
+    server.server_close()
+    os.unlink(server.server_address)
+    os.rmdir(os.path.dirname(server.server_address))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m ovirt_hosted_engine_setup.cli_benchmark',
+        description='Measure the start-up latency of hosted-engine commands',
+    )
+    parser.add_argument(
+        'commands',
+        nargs='*',
+        default=[c.lstrip('-') for c in cli.COMMANDS],
+    )
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--live', action='store_true')
+    parser.add_argument('--simulate', action='store_true')
+    parser.add_argument('--json', action='store_true')
+    simulator.add_cluster_arguments(parser)
+    args = parser.parse_args(argv)
+    if args.simulate and not 1 <= args.hosts <= simulator.MAX_HOSTS:
+        parser.error(
+            'the number of hosts must be between 1 and {m}'.format(
+                m=simulator.MAX_HOSTS,
+            )
+        )
+
+    server = None
+    if args.simulate:
+        benchmarks = list(SIMULATED_COMMANDS)
+        server = start_simulator(args)
+    else:
+        benchmarks = [
+            ('--{c}'.format(c=c.lstrip('-')), '--help')
+            for c in args.commands
+        ]
+        if args.live:
+            benchmarks += list(LIVE_COMMANDS)
+    try:
+        results = [
+            measure(b, max(args.runs, 1), server=server) for b in benchmarks
+        ]
+    finally:
+        if server is not None:
+            stop_simulator(server)
+    if args.json:
+        print(json.dumps(results, indent=4))
+        return 0
+    header = '{c:44} {m:>9} {med:>9} {p:>9} {rc:>3}'.format(
+        c='command',
+        m='min ms',
+        med='median ms',
+        p='p95 ms',
+        rc='rc',
+    )
+    if server is not None:
+        header += ' {conn:>9} {req:>9} {fail:>9}'.format(
+            conn='conn/run',
+            req='req/run',
+            fail='injected',
+        )
+    print(header)
+    for r in results:
+        line = '{c:44} {m:9.1f} {med:9.1f} {p:9.1f} {rc:3}'.format(
+            c=r['command'],
+            m=r['min_ms'],
+            med=r['median_ms'],
+            p=r['p95_ms'],
+            rc=r['rc'],
+        )
+        if server is not None:
+            line += ' {conn:9.1f} {req:9.1f} {fail:9}'.format(
+                conn=r['connections_per_run'],
+                req=r['requests_per_run'],
+                fail=r['injected_failures'],
+            )
+        print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -162,6 +162,23 @@ class FileLocations(object):
         config.SYSCONFDIR,
         '%s.conf' % OVIRT_HOSTED_ENGINE_SETUP,
     )
+    OVIRT_HOSTED_ENGINE_SETUP_SCRIPT = os.path.join(
+        config.DATADIR,
+        OVIRT_HOSTED_ENGINE_SETUP,
+        'scripts',
+        OVIRT_HOSTED_ENGINE_SETUP,
+    )
+    OVIRT_HOSTED_ENGINE_HA_AGENT = os.path.join(
+        config.DATADIR,
+        OVIRT_HOSTED_ENGINE_HA,
+        'ovirt-ha-agent',
+    )
+    VIRSH_AUTH = os.path.join(
+        SYSCONFDIR,
+        OVIRT_HOSTED_ENGINE,
+        'virsh_auth.conf',
+    )
+    OVIRT_VMCONSOLE_CONSOLE_DIR = '/var/run/ovirt-vmconsole-console'
 
     ENGINE_VM_TEMPLATE = os.path.join(
         config.DATADIR,
@@ -213,6 +230,10 @@ class FileLocations(object):
         OVIRT_HOSTED_ENGINE_SETUP,
         'answers'
     )
+    OVIRT_HOSTED_ENGINE_SETUP_CHECKPOINTS = os.path.join(
+        OVIRT_HOSTED_ENGINE_LB_DIR,
+        'deploy-checkpoints.json'
+    )
     HOSTED_ENGINE_IPTABLES_TEMPLATE = os.path.join(
         config.DATADIR,
         OVIRT_HOSTED_ENGINE_SETUP,
@@ -339,6 +360,10 @@ class FileLocations(object):
 
     LOCAL_VM_DIR_PATH = '/var/tmp'
     LOCAL_VM_DIR_PREFIX = 'localvm'
+    APPLIANCE_CACHE_DIR = os.path.join(
+        OVIRT_HOSTED_ENGINE_LB_DIR,
+        'appliance-cache',
+    )
 
     HOSTED_ENGINE_ANSIBLE_PATH = os.path.join(
         config.DATADIR,
@@ -347,6 +372,7 @@ class FileLocations(object):
     )
 
     HE_AP_TRIGGER_ROLE = 'trigger_role.yml'
+    ANSIBLE_PLAYBOOK = '/bin/ansible-playbook'
 
 
 @util.export
@@ -451,6 +477,12 @@ class CoreEnv(object):
     NODE_SETUP = 'OVEHOSTED_CORE/nodeSetup'
     MISC_REACHED = 'OVEHOSTED_CORE/miscReached'
     ANSIBLE_USER_EXTRA_VARS = 'OVEHOSTED_CORE/ansibleUserExtraVars'
+    STAGE_TIMELINE = 'OVEHOSTED_CORE/stageTimeline'
+    STAGE_TIMING_TOP = 'OVEHOSTED_CORE/stageTimingTop'
+    APPLIANCE_CACHE_SIZE_GB = 'OVEHOSTED_CORE/applianceCacheSizeGB'
+    APPLIANCE_CHECKOUT = 'OVEHOSTED_CORE/applianceCheckout'
+    RESUME = 'OVEHOSTED_CORE/resume'
+    HOST_CAPABILITIES = 'OVEHOSTED_CORE/hostCapabilities'
 
 
 @util.export
@@ -776,6 +808,18 @@ class StorageEnv(object):
     def DISCARD_SUPPORT(self):
         return 'OVEHOSTED_STORAGE/discardSupport'
 
+    @ohostedattrs(
+        answerfile=True,
+    )
+    def ISCSI_LOGIN_QUORUM(self):
+        return 'OVEHOSTED_STORAGE/iSCSILoginQuorum'
+
+    @ohostedattrs(
+        answerfile=True,
+    )
+    def ISCSI_LOGIN_TIMEOUT(self):
+        return 'OVEHOSTED_STORAGE/iSCSILoginTimeout'
+
     ISCSI_PASSWORD = 'OVEHOSTED_STORAGE/iSCSIPortalPassword'
     ISCSI_DISCOVER_PASSWORD = 'OVEHOSTED_STORAGE/iSCSIDiscoverPassword'
 
@@ -1231,6 +1275,7 @@ class Defaults(object):
     DEFAULT_EMULATED_MACHINE = 'pc'
     DEFAULT_RHEL_EMULATED_MACHINE = 'pc-i440fx-rhel7.3.0'
     DEFAULT_ISCSI_PORT = 3260
+    DEFAULT_ISCSI_LOGIN_TIMEOUT = 30
     DEFAULT_ENGINE_SETUP_TIMEOUT = 1800
     DEFAULT_ENGINE_API_TIMEOUT = 30
     DEFAULT_ENGINE_API_RETRY_ATTEMPTS = 5
@@ -1239,6 +1284,8 @@ class Defaults(object):
     DEFAULT_ADMIN_USERNAME = 'admin@internal'
     ANSIBLE_RECOMMENDED_APPLIANCE_VCPUS = 4  # based on appliance definition
     ANSIBLE_RECOMMENDED_APPLIANCE_MEM_SIZE_MB = 16384  # based on appliance def
+    DEFAULT_STAGE_TIMING_TOP = 10
+    DEFAULT_APPLIANCE_CACHE_SIZE_GB = 0
 
 
 @util.export
@@ -1273,6 +1320,8 @@ class AnsibleCallback(object):
     OTOPI_CALLBACK_OF = 'OTOPI_CALLBACK_OF'
     CALLBACK_NAME = '1_otopi_json'
     LOGGER_CALLBACK_NAME = '2_ovirt_logger'
+    PROFILE_SUFFIX = '.profile.json'
+    PROFILE_GLOB = 'ovirt-hosted-engine-setup-ansible-*.profile.json'
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,180 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Stand-in for ansible-playbook, replaying callback events.
+It accepts the ansible-playbook command line of AnsibleHelper and writes
+to the OTOPI_CALLBACK_OF file, as the otopi callback plugin would, a
+recorded event stream (one JSON event per line, e.g. a copy of that
+file from a real run) or a synthetic one, at a given rate and burst
+size, then writes stdout and stderr noise and exits with the given code.
+Each event carries its sending time, for measuring the latency.
+It is a test tool and is not installed.
+
+write_wrapper() creates an executable to be passed to AnsibleHelper as
+ansible_playbook, bound to a set of options:
+
+    --events=<file> | --count=<n>  recorded stream or synthetic events
+    --rate=<events/s>              0 for as fast as possible
+    --burst=<n>                    events written at once
+    --stdout-bytes=<n> --stderr-bytes=<n>
+    --rc=<n>                       exit code
+"""
+
+
+import argparse
+import json
+import os
+import stat
+import sys
+import time
+
+from ovirt_hosted_engine_setup import constants as ohostedcons
+
+
+SENT = 'fake_ansible_playbook/sent'
+
+
+def synthetic_events(count):
+    """Return count events, mostly debug ones, ending with a result."""
+    events = []
+    for n in range(max(count - 1, 0)):
+        events.append({
+            ohostedcons.AnsibleCallback.TYPE: (
+                ohostedcons.AnsibleCallback.INFO if n % 10 == 0
+                else ohostedcons.AnsibleCallback.DEBUG
+            ),
+            ohostedcons.AnsibleCallback.BODY: (
+                'TASK [ovirt.ovirt.hosted_engine_setup : Task {n}]'.format(
+                    n=n,
+                ) if n % 10 == 0 else {
+                    'changed': False,
+                    'task': n,
+                    'ansible_facts': dict(
+                        ('fact_{i}'.format(i=i), i * n) for i in range(10)
+                    ),
+                }
+            ),
+        })
+    events.append({
+        ohostedcons.AnsibleCallback.TYPE: ohostedcons.AnsibleCallback.RESULT,
+        ohostedcons.AnsibleCallback.BODY: {
+            'otopi_fake_ansible_playbook': {'events': count},
+        },
+    })
+    return events
+
+
+def load_events(path):
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _noise(stream, size):
+    line = b'fake ansible-playbook output ' + b'x' * 50 + b'\n'
+    while size > 0:
+        stream.write(line[:size])
+        size -= len(line)
+    stream.flush()
+
+
+def replay(out, events, rate=0.0, burst=1, clock=time.monotonic,
+           sleep=time.sleep):
+    """Write events to out, burst at a time, rate per second overall."""
+    burst = max(burst, 1)
+    start = clock()
+    for first in range(0, len(events), burst):
+        if rate > 0:
+            delay = start + first / rate - clock()
+            if delay > 0:
+                sleep(delay)
+        for event in events[first:first + burst]:
+            event = dict(event)
+            event[SENT] = time.time()
+            out.write(json.dumps(event, ensure_ascii=False) + '\n')
+        out.flush()
+
+
+def option_parser():
+    parser = argparse.ArgumentParser(
+        prog='ansible-playbook',
+        description='Replay ansible callback events',
+    )
+    parser.add_argument('--events')
+    parser.add_argument('--count', type=int, default=100)
+    parser.add_argument('--rate', type=float, default=0.0)
+    parser.add_argument('--burst', type=int, default=1)
+    parser.add_argument('--stdout-bytes', type=int, default=0)
+    parser.add_argument('--stderr-bytes', type=int, default=0)
+    parser.add_argument('--rc', type=int, default=0)
+    return parser
+
+
+def main(argv):
+    # The ansible-playbook options of AnsibleHelper are ignored
+    args, unused = option_parser().parse_known_args(argv)
+    events = (
+        load_events(args.events) if args.events
+        else synthetic_events(args.count)
+    )
+    path = os.environ.get(ohostedcons.AnsibleCallback.OTOPI_CALLBACK_OF)
+    if not path:
+        sys.stderr.write(
+            'Unable to find {ek}\n'.format(
+                ek=ohostedcons.AnsibleCallback.OTOPI_CALLBACK_OF,
+            )
+        )
+        return 1
+    with open(path, 'w') as out:
+        replay(out, events, args.rate, args.burst)
+    _noise(sys.stdout.buffer, args.stdout_bytes)
+    _noise(sys.stderr.buffer, args.stderr_bytes)
+    return args.rc
+
+
+def write_wrapper(path, options=()):
+    """
+    Write at path an executable running the fake with options, to be
+    used as the ansible_playbook of AnsibleHelper.
+    """
+    with open(path, 'w') as f:
+        f.write(
+            '#!{python}\n'
+            'import sys\n'
+            'sys.path.insert(0, {lib!r})\n'
+            'from ovirt_hosted_engine_setup import fake_ansible_playbook\n'
+            'sys.exit(fake_ansible_playbook.main({options!r} + '
+            'sys.argv[1:]))\n'.format(
+                python=sys.executable,
+                lib=os.path.dirname(
+                    os.path.dirname(os.path.abspath(__file__))
+                ),
+                options=list(options),
+            )
+        )
+    os.chmod(path, os.stat(path).st_mode | stat.S_IXUSR)
+    return path
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,316 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+HA status of many hosted-engine hosts.
+The machine-readable status of every host is collected concurrently
+over ssh, with a bound on the concurrent queries and a timeout per host,
+so the collection takes about the time of the slowest host. Every host
+reports the whole cluster it belongs to: the reports are merged into one
+view per cluster, with each host listed once.
+"""
+
+
+import argparse
+import collections
+import gettext
+import json
+import subprocess
+import sys
+import time
+
+from ovirt_hosted_engine_setup import scheduler
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+DEFAULT_CONCURRENCY = 16
+DEFAULT_TIMEOUT = 15
+STATUS_COMMAND = ('hosted-engine', '--vm-status', '--json')
+GLOBAL_MAINTENANCE = 'global_maintenance'
+
+
+def load_hosts(path):
+    """Return the hosts listed in path, one per line, # for comments."""
+    hosts = []
+    with open(path) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if line and line not in hosts:
+                hosts.append(line)
+    return hosts
+
+
+def ssh_command(host, timeout):
+    return [
+        'ssh',
+        '-o', 'BatchMode=yes',
+        '-o', 'ConnectTimeout={t}'.format(t=timeout),
+        host,
+    ] + list(STATUS_COMMAND)
+
+
+def query_host(host, timeout):
+    """Return the status reported by host, raise RuntimeError on error."""
+    try:
+        output = subprocess.check_output(
+            ssh_command(host, timeout),
+            stderr=subprocess.PIPE,
+            timeout=timeout,
+        )
+    except subprocess.TimeoutExpired:
+        raise RuntimeError(_('Timed out'))
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(
+            e.stderr.decode('utf-8', 'replace').strip() or
+            _('Failed with rc={rc}').format(rc=e.returncode)
+        )
+    except OSError as e:
+        raise RuntimeError(str(e))
+    try:
+        return json.loads(output.decode('utf-8', 'replace'))
+    except ValueError:
+        raise RuntimeError(_('Invalid status reported'))
+
+
+def collect(hosts, query=query_host, concurrency=DEFAULT_CONCURRENCY,
+            timeout=DEFAULT_TIMEOUT):
+    """
+    Query all hosts concurrently, return {host: (status, error, ms)}
+    where exactly one of status and error is None.
+    """
+    # A host given twice is queried once
+    hosts = list(collections.OrderedDict.fromkeys(hosts))
+    sched = scheduler.Scheduler(max_workers=concurrency)
+
+    def _query(host):
+        start = time.monotonic()
+        try:
+            return query(host, timeout), None, _elapsed_ms(start)
+        except RuntimeError as e:
+            return None, str(e), _elapsed_ms(start)
+
+    for host in hosts:
+        sched.add(
+            name='status-{host}'.format(host=host),
+            func=lambda inputs, host=host: _query(host),
+            provides=(host,),
+        )
+    return dict((host, sched.result(host)) for host in hosts)
+
+
+def _elapsed_ms(start):
+    return round((time.monotonic() - start) * 1000, 1)
+
+
+def _host_entries(status):
+    return [
+        v for k, v in status.items()
+        if k != GLOBAL_MAINTENANCE and isinstance(v, dict)
+    ]
+
+
+def _better(entry, other):
+    """Prefer live data, then the most recent report."""
+    return (
+        bool(entry.get('live-data')),
+        entry.get('host-ts', 0),
+    ) > (
+        bool(other.get('live-data')),
+        other.get('host-ts', 0),
+    )
+
+
+def merge(results):
+    """
+    Merge the reports of collect() into a list of clusters. Reports
+    sharing a host belong to the same cluster, each host is listed once
+    with the freshest entry reported for it and flagged:
+        stale: the data is not live according to every reporter
+        reachable: the host itself answered, None if not queried
+    """
+    reports = [
+        (host, status) for host, (status, error, ms) in sorted(
+            results.items()
+        )
+        if status is not None
+    ]
+    # Group the reports mentioning the same hosts
+    clusters = []
+    for reporter, status in reports:
+        names = set(e.get('hostname') for e in _host_entries(status))
+        names.add(reporter)
+        joined = [c for c in clusters if c['names'] & names]
+        cluster = {'names': names, 'reports': [(reporter, status)]}
+        for other in joined:
+            clusters.remove(other)
+            cluster['names'] |= other['names']
+            cluster['reports'] += other['reports']
+        clusters.append(cluster)
+
+    view = []
+    for cluster in clusters:
+        hosts = {}
+        maintenance = set()
+        for reporter, status in cluster['reports']:
+            maintenance.add(bool(status.get(GLOBAL_MAINTENANCE, False)))
+            for entry in _host_entries(status):
+                name = entry.get('hostname')
+                if name not in hosts or _better(entry, hosts[name]):
+                    hosts[name] = entry
+        merged = []
+        for name in sorted(hosts):
+            entry = dict(hosts[name])
+            entry['stale'] = not entry.get('live-data', False)
+            entry['reachable'] = (
+                results[name][0] is not None if name in results else None
+            )
+            merged.append(entry)
+        view.append({
+            'reporters': sorted(r for r, s in cluster['reports']),
+            GLOBAL_MAINTENANCE: True in maintenance,
+            # The reporters did not agree
+            'maintenance_inconsistent': len(maintenance) > 1,
+            'engine_vm_host': next(
+                (
+                    e['hostname'] for e in merged
+                    if not e['stale'] and
+                    isinstance(e.get('engine-status'), dict) and
+                    e['engine-status'].get('vm') == 'up'
+                ),
+                None
+            ),
+            'hosts': merged,
+        })
+    view.sort(key=lambda c: c['reporters'])
+    return view
+
+
+def print_view(view, results):
+    for n, cluster in enumerate(view, 1):
+        print(
+            _(
+                '\n--== Cluster {n} (reported by {reporters}) ==--'
+            ).format(n=n, reporters=', '.join(cluster['reporters']))
+        )
+        if cluster[GLOBAL_MAINTENANCE]:
+            print(_('!! Cluster is in GLOBAL MAINTENANCE mode !!'))
+        if cluster['maintenance_inconsistent']:
+            print(_('!! Hosts disagree on the global maintenance mode !!'))
+        print(_('Engine VM running on: {host}').format(
+            host=cluster['engine_vm_host'] or _('none'),
+        ))
+        for e in cluster['hosts']:
+            flags = []
+            if e['stale']:
+                flags.append(_('stale'))
+            if e['reachable'] is False:
+                flags.append(_('unreachable'))
+            if e.get('maintenance'):
+                flags.append(_('local maintenance'))
+            print(
+                '  {id:>3} {host:40} {score:>5} {flags}'.format(
+                    id=e.get('host-id', '?'),
+                    host=e.get('hostname'),
+                    score=e.get('score', '?'),
+                    flags=', '.join(flags),
+                )
+            )
+    failed = sorted(h for h, r in results.items() if r[0] is None)
+    if failed:
+        print(_('\nHosts not answering:'))
+        for host in failed:
+            print('  {host}: {error}'.format(
+                host=host,
+                error=results[host][1],
+            ))
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='hosted-engine --fleet-status',
+        description=_(
+            'Collect concurrently the HA status of several hosted-engine '
+            'hosts and merge it into one view per cluster'
+        ),
+    )
+    parser.add_argument('hosts', nargs='*', help=_('hosts to query'))
+    parser.add_argument(
+        '--hosts-file',
+        help=_('file listing the hosts to query, one per line'),
+    )
+    parser.add_argument(
+        '--concurrency',
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=_('maximum number of concurrent queries'),
+    )
+    parser.add_argument(
+        '--timeout',
+        type=int,
+        default=DEFAULT_TIMEOUT,
+        help=_('timeout of each query in seconds'),
+    )
+    parser.add_argument('--json', action='store_true')
+    args = parser.parse_args(argv)
+
+    hosts = list(args.hosts)
+    if args.hosts_file:
+        try:
+            hosts += [h for h in load_hosts(args.hosts_file) if h not in hosts]
+        except (IOError, OSError) as e:
+            sys.stderr.write(str(e) + '\n')
+            return 1
+    if not hosts:
+        sys.stderr.write(_('No host to query\n'))
+        return 1
+
+    start = time.monotonic()
+    results = collect(
+        hosts,
+        concurrency=max(args.concurrency, 1),
+        timeout=args.timeout,
+    )
+    view = merge(results)
+    if args.json:
+        print(json.dumps(
+            {
+                'clusters': view,
+                'queries': dict(
+                    (host, {'error': error, 'ms': ms})
+                    for host, (status, error, ms) in results.items()
+                ),
+                'ms': _elapsed_ms(start),
+            },
+            indent=4,
+            sort_keys=True,
+        ))
+    else:
+        print_view(view, results)
+    return 0 if all(r[0] is not None for r in results.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,96 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import threading
+import time
+
+from . import fleet_status
+
+
+def _entry(host_id, hostname, live=True, ts=100, vm='down'):
+    return {
+        'host-id': host_id,
+        'hostname': hostname,
+        'live-data': live,
+        'host-ts': ts,
+        'engine-status': {'vm': vm},
+    }
+
+
+def test_merge_deduplicates_and_flags():
+    a = _entry(1, 'a', vm='up')
+    b_stale = _entry(2, 'b', live=False, ts=90)
+    b_live = _entry(2, 'b', ts=95)
+    results = {
+        'a': ({'1': a, '2': b_stale, 'global_maintenance': False},
+              None, 1.0),
+        'b': ({'1': a, '2': b_live, 'global_maintenance': True},
+              None, 1.0),
+        'c': (None, 'Timed out', 15000.0),
+        'x': ({'1': _entry(1, 'x')}, None, 1.0),
+    }
+    view = fleet_status.merge(results)
+    assert [c['reporters'] for c in view] == [['a', 'b'], ['x']]
+    cluster = view[0]
+    assert [h['hostname'] for h in cluster['hosts']] == ['a', 'b']
+    assert cluster['hosts'][1]['host-ts'] == 95
+    assert not cluster['hosts'][1]['stale']
+    assert cluster['global_maintenance']
+    assert cluster['maintenance_inconsistent']
+    assert cluster['engine_vm_host'] == 'a'
+
+
+def test_collect_is_concurrent_and_bounded():
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def query(host, timeout):
+        with lock:
+            running.append(host)
+            peak.append(len(running))
+        time.sleep(0.1)
+        with lock:
+            running.remove(host)
+        if host == 'bad':
+            raise RuntimeError('unreachable')
+        return {}
+
+    hosts = ['h%d' % i for i in range(7)] + ['bad']
+    start = time.monotonic()
+    results = fleet_status.collect(hosts, query=query, concurrency=4)
+    assert time.monotonic() - start < 0.5
+    assert max(peak) <= 4
+    assert results['bad'][:2] == (None, 'unreachable')
+    assert results['h0'][:2] == ({}, None)
+
+
+
+def test_collect_queries_duplicates_once():
+    queried = []
+
+    def query(host, timeout):
+        queried.append(host)
+        return {}
+
+    results = fleet_status.collect(['a', 'b', 'a'], query=query)
+    assert sorted(queried) == ['a', 'b']
+    assert list(results) == ['a', 'b']
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
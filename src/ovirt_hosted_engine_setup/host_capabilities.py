@@ -0,0 +1,248 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Host capabilities.
+CPU topology, NUMA nodes, hugepages, memory and free disk space are read
+once from /proc and /sys and kept in a snapshot which supplies the
+limits and the recommended sizing of the engine VM: when the host has
+several NUMA nodes the VM is sized, if possible, to fit in one of them.
+"""
+
+
+import glob
+import os
+
+
+def _read(path, default=None):
+    try:
+        with open(path) as f:
+            return f.read().strip()
+    except (IOError, OSError):
+        return default
+
+
+def _meminfo_mb(path, prefix=''):
+    """Return {field: MB} from a meminfo file, optionally per node."""
+    values = {}
+    for line in (_read(path, '') or '').splitlines():
+        fields = line[len(prefix):].split()
+        if len(fields) >= 2 and fields[0].endswith(':'):
+            try:
+                values[fields[0][:-1]] = int(fields[1]) // 1024
+            except ValueError:
+                pass
+    return values
+
+
+def _cpu_list(value):
+    """Return the CPUs of a kernel cpu list, e.g. 0-3,8."""
+    cpus = []
+    for item in (value or '').split(','):
+        if '-' in item:
+            first, last = item.split('-', 1)
+            cpus.extend(range(int(first), int(last) + 1))
+        elif item:
+            cpus.append(int(item))
+    return cpus
+
+
+class NumaNode(object):
+
+    def __init__(self, node_id, cpus, mem_total_mb, mem_available_mb):
+        self.node_id = node_id
+        self.cpus = cpus
+        self.mem_total_mb = mem_total_mb
+        self.mem_available_mb = mem_available_mb
+
+    def __repr__(self):
+        return '<NumaNode {id} cpus={cpus} mem={mem}/{total}MB>'.format(
+            id=self.node_id,
+            cpus=len(self.cpus),
+            mem=self.mem_available_mb,
+            total=self.mem_total_mb,
+        )
+
+
+class HostCapabilities(object):
+
+    def __init__(self, cpus, sockets, threads_per_core, numa_nodes,
+                 mem_total_mb, mem_available_mb, hugepages, disk_free_mb):
+        self.cpus = cpus
+        self.sockets = sockets
+        self.threads_per_core = threads_per_core
+        self.numa_nodes = numa_nodes
+        self.mem_total_mb = mem_total_mb
+        # Free plus buffers and page cache, which can be reclaimed
+        self.mem_available_mb = mem_available_mb
+        # {page size kB: (total, free)}
+        self.hugepages = hugepages
+        # {path: MB}
+        self.disk_free_mb = disk_free_mb
+
+    def __repr__(self):
+        return (
+            '<HostCapabilities cpus={cpus} sockets={sockets} '
+            'threads_per_core={threads} mem={mem}/{total}MB '
+            'numa={numa} hugepages={hugepages} disk_free={disk}>'
+        ).format(
+            cpus=self.cpus,
+            sockets=self.sockets,
+            threads=self.threads_per_core,
+            mem=self.mem_available_mb,
+            total=self.mem_total_mb,
+            numa=self.numa_nodes,
+            hugepages=self.hugepages,
+            disk=self.disk_free_mb,
+        )
+
+    def max_memory_mb(self, reserved_mb=0):
+        return self.mem_available_mb - reserved_mb
+
+    def _largest_node(self):
+        if len(self.numa_nodes) < 2:
+            return None
+        return max(
+            self.numa_nodes,
+            key=lambda n: (n.mem_available_mb, len(n.cpus)),
+        )
+
+    def recommended_vcpus(self, wanted, minimum=1):
+        """
+        Return wanted, limited to the CPUs of the host and, unless that
+        goes below minimum, to the CPUs of its largest NUMA node.
+        """
+        vcpus = min(int(wanted), self.cpus)
+        node = self._largest_node()
+        if node is not None and len(node.cpus) >= minimum:
+            vcpus = min(vcpus, len(node.cpus))
+        return vcpus
+
+    def recommended_memory_mb(self, wanted, minimum=0, reserved_mb=0):
+        """
+        Return wanted, limited to the available memory and, unless that
+        goes below minimum, to the available memory of the largest NUMA
+        node.
+        """
+        mem = min(int(wanted), self.max_memory_mb(reserved_mb))
+        node = self._largest_node()
+        if node is not None and node.mem_available_mb >= minimum:
+            mem = min(mem, node.mem_available_mb)
+        return mem
+
+    def fits_numa_node(self, vcpus, mem_mb):
+        """Return True if a VM of that size does not span NUMA nodes."""
+        if len(self.numa_nodes) < 2:
+            return True
+        return any(
+            len(n.cpus) >= int(vcpus) and n.mem_available_mb >= int(mem_mb)
+            for n in self.numa_nodes
+        )
+
+
+def _numa_nodes(root):
+    nodes = []
+    for path in sorted(
+        glob.glob(os.path.join(root, 'sys/devices/system/node/node[0-9]*')),
+        key=lambda p: int(os.path.basename(p)[4:]),
+    ):
+        node_id = int(os.path.basename(path)[4:])
+        meminfo = _meminfo_mb(
+            os.path.join(path, 'meminfo'),
+            prefix='Node {id} '.format(id=node_id),
+        )
+        nodes.append(
+            NumaNode(
+                node_id=node_id,
+                cpus=_cpu_list(_read(os.path.join(path, 'cpulist'))),
+                mem_total_mb=meminfo.get('MemTotal', 0),
+                mem_available_mb=(
+                    meminfo.get('MemFree', 0) + meminfo.get('FilePages', 0)
+                ),
+            )
+        )
+    return nodes
+
+
+def _hugepages(root):
+    hugepages = {}
+    for path in glob.glob(
+        os.path.join(root, 'sys/kernel/mm/hugepages/hugepages-*kB')
+    ):
+        size = int(os.path.basename(path)[len('hugepages-'):-len('kB')])
+        hugepages[size] = (
+            int(_read(os.path.join(path, 'nr_hugepages'), '0')),
+            int(_read(os.path.join(path, 'free_hugepages'), '0')),
+        )
+    return hugepages
+
+
+def _disk_free_mb(paths):
+    free = {}
+    for path in paths:
+        try:
+            st = os.statvfs(path)
+        except OSError:
+            continue
+        free[path] = st.f_bavail * st.f_frsize // 1024 // 1024
+    return free
+
+
+def probe(paths=(), root='/'):
+    """
+    Return the capabilities of the host, with the free disk space of
+    paths.
+    """
+    meminfo = _meminfo_mb(os.path.join(root, 'proc/meminfo'))
+    cpus = _cpu_list(
+        _read(os.path.join(root, 'sys/devices/system/cpu/online'))
+    )
+    packages = set()
+    threads_per_core = 1
+    for cpu in cpus:
+        topology = os.path.join(
+            root,
+            'sys/devices/system/cpu/cpu{n}/topology'.format(n=cpu),
+        )
+        packages.add(_read(os.path.join(topology, 'physical_package_id')))
+        threads_per_core = max(
+            threads_per_core,
+            len(_cpu_list(
+                _read(os.path.join(topology, 'thread_siblings_list'))
+            )),
+        )
+    packages.discard(None)
+    return HostCapabilities(
+        cpus=len(cpus) or os.cpu_count() or 1,
+        sockets=len(packages) or 1,
+        threads_per_core=threads_per_core,
+        numa_nodes=_numa_nodes(root),
+        mem_total_mb=meminfo.get('MemTotal', 0),
+        mem_available_mb=(
+            meminfo.get('MemFree', 0) +
+            meminfo.get('Buffers', 0) +
+            meminfo.get('Cached', 0)
+        ),
+        hugepages=_hugepages(root),
+        disk_free_mb=_disk_free_mb(paths),
+    )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,91 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import os
+
+from . import host_capabilities
+
+
+def _write(root, path, content):
+    path = os.path.join(str(root), path)
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'w') as f:
+        f.write(content)
+
+
+def test_probe_two_numa_nodes(tmpdir):
+    _write(tmpdir, 'proc/meminfo', (
+        'MemTotal:       65536000 kB\n'
+        'MemFree:        40960000 kB\n'
+        'Buffers:         1024000 kB\n'
+        'Cached:         10240000 kB\n'
+    ))
+    _write(tmpdir, 'sys/devices/system/cpu/online', '0-7\n')
+    for cpu in range(8):
+        topology = 'sys/devices/system/cpu/cpu{n}/topology/'.format(n=cpu)
+        _write(tmpdir, topology + 'physical_package_id', str(cpu // 4))
+        _write(
+            tmpdir,
+            topology + 'thread_siblings_list',
+            '{a},{b}'.format(a=cpu - cpu % 2, b=cpu - cpu % 2 + 1),
+        )
+    for node, free_kb in ((0, 8192000), (1, 30720000)):
+        path = 'sys/devices/system/node/node{n}/'.format(n=node)
+        _write(tmpdir, path + 'cpulist', '{a}-{b}'.format(
+            a=node * 4,
+            b=node * 4 + 3,
+        ))
+        _write(tmpdir, path + 'meminfo', (
+            'Node {n} MemTotal:       32768000 kB\n'
+            'Node {n} MemFree:        {free} kB\n'
+            'Node {n} FilePages:      1024000 kB\n'
+        ).format(n=node, free=free_kb))
+    _write(
+        tmpdir,
+        'sys/kernel/mm/hugepages/hugepages-2048kB/nr_hugepages',
+        '16',
+    )
+    _write(
+        tmpdir,
+        'sys/kernel/mm/hugepages/hugepages-2048kB/free_hugepages',
+        '8',
+    )
+
+    caps = host_capabilities.probe(root=str(tmpdir))
+    assert caps.cpus == 8
+    assert caps.sockets == 2
+    assert caps.threads_per_core == 2
+    assert caps.mem_available_mb == 40000 + 1000 + 10000
+    assert caps.hugepages == {2048: (16, 8)}
+    assert [n.mem_available_mb for n in caps.numa_nodes] == [9000, 31000]
+
+    assert caps.recommended_vcpus(6, minimum=2) == 4
+    assert caps.recommended_vcpus(16, minimum=6) == 8
+    assert caps.recommended_memory_mb(40000, minimum=4096) == 31000
+    assert caps.recommended_memory_mb(
+        40000,
+        minimum=32000,
+        reserved_mb=350,
+    ) == 40000
+    assert caps.fits_numa_node(4, 16384)
+    assert not caps.fits_numa_node(4, 32768)
+    assert not caps.fits_numa_node(6, 1024)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,335 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Snapshot of the host network.
+The links, the IPv4 and IPv6 addresses and the routes are dumped over a
+single rtnetlink socket, without running any command, and the snapshot
+is kept for the whole deploy: invalidate() it once the network has been
+changed.
+"""
+
+
+import os
+import socket
+import struct
+import threading
+
+
+NETLINK_ROUTE = 0
+NLM_F_REQUEST = 0x001
+NLM_F_DUMP = 0x300
+NLMSG_ERROR = 2
+NLMSG_DONE = 3
+RTM_NEWLINK = 16
+RTM_GETLINK = 18
+RTM_NEWADDR = 20
+RTM_GETADDR = 22
+RTM_NEWROUTE = 24
+RTM_GETROUTE = 26
+
+IFLA_IFNAME = 3
+IFA_ADDRESS = 1
+IFA_LOCAL = 2
+IFA_FLAGS = 8
+IFA_F_SECONDARY = 0x01
+IFA_F_DEPRECATED = 0x20
+IFA_F_TENTATIVE = 0x40
+RTA_DST = 1
+RTA_OIF = 4
+RTA_GATEWAY = 5
+RTA_PRIORITY = 6
+RTA_TABLE = 15
+RT_TABLE_MAIN = 254
+RT_SCOPE_UNIVERSE = 0
+
+_NLMSGHDR = struct.Struct('=LHHLL')
+_RTATTR = struct.Struct('=HH')
+_IFINFOMSG = struct.Struct('=BxHiII')
+_IFADDRMSG = struct.Struct('=BBBBI')
+_RTMSG = struct.Struct('=BBBBBBBBI')
+
+
+def _align(length):
+    return (length + 3) & ~3
+
+
+def _attributes(data, offset):
+    attrs = {}
+    while offset + _RTATTR.size <= len(data):
+        length, attr_type = _RTATTR.unpack_from(data, offset)
+        if length < _RTATTR.size:
+            break
+        attrs[attr_type] = data[offset + _RTATTR.size:offset + length]
+        offset += _align(length)
+    return attrs
+
+
+def _string(value):
+    return value.split(b'\0', 1)[0].decode('utf-8', 'replace')
+
+
+def _u32(value):
+    return struct.unpack('=I', value[:4])[0]
+
+
+class Address(object):
+
+    def __init__(self, ifname, family, address, prefixlen, scope, flags):
+        self.ifname = ifname
+        self.family = family
+        self.address = address
+        self.prefixlen = prefixlen
+        self.scope = scope
+        self.flags = flags
+
+    @property
+    def cidr(self):
+        return '{a}/{pl}'.format(a=self.address, pl=self.prefixlen)
+
+    def __repr__(self):
+        return '<Address {ifname} {cidr}>'.format(
+            ifname=self.ifname,
+            cidr=self.cidr,
+        )
+
+
+class Route(object):
+
+    def __init__(self, family, dst, dst_len, gateway, ifname, table,
+                 priority):
+        self.family = family
+        self.dst = dst
+        self.dst_len = dst_len
+        self.gateway = gateway
+        self.ifname = ifname
+        self.table = table
+        self.priority = priority
+
+    @property
+    def default(self):
+        return self.dst_len == 0
+
+
+class Snapshot(object):
+
+    def __init__(self, links, addresses, routes):
+        # {index: name}
+        self.links = links
+        self.addresses = addresses
+        self.routes = routes
+
+    def link_names(self):
+        return [name for index, name in sorted(self.links.items())]
+
+    def has_link(self, name):
+        return name in self.link_names()
+
+    def get_addresses(self, ifname=None, family=None, global_only=True):
+        """
+        Return the addresses, IPv4 first, then in the order the kernel
+        reports them with the secondary, tentative or deprecated ones
+        last.
+        """
+        return sorted(
+            (
+                a for a in self.addresses
+                if (ifname is None or a.ifname == ifname) and
+                (family is None or a.family == family) and
+                (not global_only or a.scope == RT_SCOPE_UNIVERSE)
+            ),
+            key=lambda a: (
+                a.family != socket.AF_INET,
+                bool(
+                    a.flags & (
+                        IFA_F_SECONDARY | IFA_F_TENTATIVE | IFA_F_DEPRECATED
+                    )
+                ),
+            ),
+        )
+
+    def default_gateway(self, family=socket.AF_INET):
+        """Return the gateway of the preferred default route, or None."""
+        routes = sorted(
+            (
+                r for r in self.routes
+                if r.family == family and r.default and r.gateway and
+                r.table == RT_TABLE_MAIN
+            ),
+            key=lambda r: r.priority,
+        )
+        return routes[0].gateway if routes else None
+
+
+class _Netlink(object):
+
+    def __init__(self):
+        self._sock = socket.socket(
+            socket.AF_NETLINK,
+            socket.SOCK_RAW,
+            NETLINK_ROUTE,
+        )
+        self._sock.bind((0, 0))
+        self._seq = 0
+
+    def close(self):
+        self._sock.close()
+
+    def dump(self, msg_type, payload):
+        """Yield (type, message) for all the replies to a dump request."""
+        self._seq += 1
+        self._sock.send(
+            _NLMSGHDR.pack(
+                _NLMSGHDR.size + len(payload),
+                msg_type,
+                NLM_F_REQUEST | NLM_F_DUMP,
+                self._seq,
+                0,
+            ) + payload
+        )
+        while True:
+            data = self._sock.recv(65536)
+            offset = 0
+            while offset + _NLMSGHDR.size <= len(data):
+                length, reply_type, flags, seq, pid = _NLMSGHDR.unpack_from(
+                    data,
+                    offset,
+                )
+                if length < _NLMSGHDR.size:
+                    return
+                message = data[offset + _NLMSGHDR.size:offset + length]
+                offset += _align(length)
+                if seq != self._seq:
+                    continue
+                if reply_type == NLMSG_DONE:
+                    return
+                if reply_type == NLMSG_ERROR:
+                    error = -struct.unpack_from('=i', message)[0]
+                    if error:
+                        raise OSError(error, os.strerror(error))
+                    return
+                yield reply_type, message
+
+
+def _dump(nl):
+    links = {}
+    for msg_type, msg in nl.dump(RTM_GETLINK, _IFINFOMSG.pack(
+        socket.AF_UNSPEC, 0, 0, 0, 0,
+    )):
+        if msg_type != RTM_NEWLINK:
+            continue
+        family, if_type, index, flags, change = _IFINFOMSG.unpack_from(msg)
+        attrs = _attributes(msg, _IFINFOMSG.size)
+        links[index] = _string(attrs.get(IFLA_IFNAME, b''))
+
+    addresses = []
+    for msg_type, msg in nl.dump(RTM_GETADDR, _IFADDRMSG.pack(
+        socket.AF_UNSPEC, 0, 0, 0, 0,
+    )):
+        if msg_type != RTM_NEWADDR:
+            continue
+        family, prefixlen, flags, scope, index = _IFADDRMSG.unpack_from(msg)
+        attrs = _attributes(msg, _IFADDRMSG.size)
+        # IFA_ADDRESS is the peer one on point to point links
+        raw = attrs.get(IFA_LOCAL, attrs.get(IFA_ADDRESS))
+        if raw is None or family not in (socket.AF_INET, socket.AF_INET6):
+            continue
+        if IFA_FLAGS in attrs:
+            flags = _u32(attrs[IFA_FLAGS])
+        addresses.append(
+            Address(
+                ifname=links.get(index),
+                family=family,
+                address=socket.inet_ntop(family, raw),
+                prefixlen=prefixlen,
+                scope=scope,
+                flags=flags,
+            )
+        )
+
+    routes = []
+    for msg_type, msg in nl.dump(RTM_GETROUTE, _RTMSG.pack(
+        socket.AF_UNSPEC, 0, 0, 0, 0, 0, 0, 0, 0,
+    )):
+        if msg_type != RTM_NEWROUTE:
+            continue
+        fields = _RTMSG.unpack_from(msg)
+        family, dst_len, table = fields[0], fields[1], fields[4]
+        if family not in (socket.AF_INET, socket.AF_INET6):
+            continue
+        attrs = _attributes(msg, _RTMSG.size)
+        routes.append(
+            Route(
+                family=family,
+                dst=(
+                    socket.inet_ntop(family, attrs[RTA_DST])
+                    if RTA_DST in attrs else None
+                ),
+                dst_len=dst_len,
+                gateway=(
+                    socket.inet_ntop(family, attrs[RTA_GATEWAY])
+                    if RTA_GATEWAY in attrs else None
+                ),
+                ifname=(
+                    links.get(_u32(attrs[RTA_OIF]))
+                    if RTA_OIF in attrs else None
+                ),
+                table=(
+                    _u32(attrs[RTA_TABLE]) if RTA_TABLE in attrs else table
+                ),
+                priority=(
+                    _u32(attrs[RTA_PRIORITY])
+                    if RTA_PRIORITY in attrs else 0
+                ),
+            )
+        )
+    return Snapshot(links=links, addresses=addresses, routes=routes)
+
+
+def read():
+    """Return a new snapshot of the host network."""
+    nl = _Netlink()
+    try:
+        return _dump(nl)
+    finally:
+        nl.close()
+
+
+_lock = threading.Lock()
+_snapshot = None
+
+
+def snapshot():
+    """Return the snapshot shared by the whole deploy."""
+    global _snapshot
+    with _lock:
+        if _snapshot is None:
+            _snapshot = read()
+        return _snapshot
+
+
+def invalidate():
+    """Drop the shared snapshot, the next one will be read again."""
+    global _snapshot
+    with _lock:
+        _snapshot = None
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
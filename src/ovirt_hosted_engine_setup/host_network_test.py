@@ -0,0 +1,79 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import socket
+import struct
+
+from . import host_network as hn
+
+
+def _attr(attr_type, value):
+    data = struct.pack('=HH', 4 + len(value), attr_type) + value
+    return data + b'\0' * (hn._align(len(data)) - len(data))
+
+
+class FakeNetlink(object):
+
+    def __init__(self, replies):
+        self.replies = replies
+
+    def dump(self, msg_type, payload):
+        return iter(self.replies[msg_type])
+
+
+def test_dump():
+    v4 = socket.AF_INET
+    v6 = socket.AF_INET6
+    nl = FakeNetlink({
+        hn.RTM_GETLINK: [
+            (hn.RTM_NEWLINK, hn._IFINFOMSG.pack(0, 1, 2, 0, 0) +
+             _attr(hn.IFLA_IFNAME, b'ovirtmgmt\0')),
+        ],
+        hn.RTM_GETADDR: [
+            (hn.RTM_NEWADDR, hn._IFADDRMSG.pack(
+                v4, 24, hn.IFA_F_SECONDARY, 0, 2
+            ) + _attr(hn.IFA_LOCAL, socket.inet_pton(v4, '192.0.2.9'))),
+            (hn.RTM_NEWADDR, hn._IFADDRMSG.pack(v6, 64, 0, 0, 2) +
+             _attr(hn.IFA_ADDRESS, socket.inet_pton(v6, 'fd00::2'))),
+            (hn.RTM_NEWADDR, hn._IFADDRMSG.pack(v4, 24, 0, 0, 2) +
+             _attr(hn.IFA_LOCAL, socket.inet_pton(v4, '192.0.2.2'))),
+        ],
+        hn.RTM_GETROUTE: [
+            (hn.RTM_NEWROUTE, hn._RTMSG.pack(
+                v4, 0, 0, 0, hn.RT_TABLE_MAIN, 0, 0, 1, 0
+            ) + _attr(hn.RTA_GATEWAY, socket.inet_pton(v4, '192.0.2.254')) +
+             _attr(hn.RTA_PRIORITY, struct.pack('=I', 100))),
+            (hn.RTM_NEWROUTE, hn._RTMSG.pack(
+                v4, 0, 0, 0, hn.RT_TABLE_MAIN, 0, 0, 1, 0
+            ) + _attr(hn.RTA_GATEWAY, socket.inet_pton(v4, '192.0.2.1')) +
+             _attr(hn.RTA_OIF, struct.pack('=I', 2))),
+        ],
+    })
+    snapshot = hn._dump(nl)
+    assert snapshot.link_names() == ['ovirtmgmt']
+    assert [a.cidr for a in snapshot.get_addresses('ovirtmgmt')] == [
+        '192.0.2.2/24',
+        '192.0.2.9/24',
+        'fd00::2/64',
+    ]
+    assert snapshot.default_gateway() == '192.0.2.1'
+    assert snapshot.default_gateway(v6) is None
+    assert snapshot.routes[1].ifname == 'ovirtmgmt'
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,202 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Concurrent iSCSI login.
+All the portals of the chosen target portal group are logged in at the
+same time, each within the same timeout, and the caller can go ahead
+with a quorum of paths up instead of requiring all of them. The paths
+that are not used are logged out and their nodes deleted; the sessions
+of the others are then found already established when VDSM logs in on
+behalf of the engine.
+"""
+
+
+import gettext
+import threading
+import time
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+DEFAULT_TIMEOUT = 30
+# iscsiadm exit code when the session already exists
+ISCSI_ERR_SESS_EXISTS = 15
+
+PENDING = 'pending'
+UP = 'up'
+FAILED = 'failed'
+TIMEOUT = 'timeout'
+
+
+class Path(object):
+
+    def __init__(self, address, port, tpgt=None):
+        self.address = address
+        self.port = str(port)
+        self.tpgt = tpgt
+        self.state = PENDING
+        self.logged_in = False
+        self.ms = None
+        self.error = None
+
+    @property
+    def portal(self):
+        address = self.address
+        if ':' in address and not address.startswith('['):
+            address = '[{a}]'.format(a=address)
+        portal = '{a}:{p}'.format(a=address, p=self.port)
+        if self.tpgt is not None:
+            portal += ',{t}'.format(t=self.tpgt)
+        return portal
+
+    def __repr__(self):
+        return '<Path {portal} {state}>'.format(
+            portal=self.portal,
+            state=self.state,
+        )
+
+
+def paths(addresses, ports, tpgt=None):
+    """
+    Return the paths of comma separated addresses and ports, a single
+    port applying to all the addresses.
+    """
+    addresses = [a.strip() for a in addresses.split(',') if a.strip()]
+    ports = [p.strip() for p in str(ports).split(',') if p.strip()]
+    if len(ports) == 1:
+        ports = ports * len(addresses)
+    if len(ports) != len(addresses):
+        raise RuntimeError(
+            _('Mismatching iSCSI portal addresses and ports')
+        )
+    return [Path(a, p, tpgt) for a, p in zip(addresses, ports)]
+
+
+def _node(iscsiadm, target, path):
+    return [iscsiadm, '-m', 'node', '-T', target, '-p', path.portal]
+
+
+def login_commands(iscsiadm, target, path, timeout=DEFAULT_TIMEOUT):
+    """
+    Return the iscsiadm commands logging in to target through path
+    within about timeout seconds, trying once.
+    The node is not logged in automatically at boot, as VDSM does.
+    CHAP is not supported: iscsiadm only takes the secret on its
+    command line, where any local user can read it.
+    """
+    node = _node(iscsiadm, target, path)
+    return [
+        node + ['-o', 'new'],
+        node + ['-o', 'update', '-n', 'node.startup', '-v', 'manual'],
+        node + [
+            '-o', 'update',
+            '-n', 'node.conn[0].timeo.login_timeout',
+            '-v', str(timeout),
+        ],
+        node + [
+            '-o', 'update',
+            '-n', 'node.session.initial_login_retry_max',
+            '-v', '1',
+        ],
+        node + ['--login'],
+    ]
+
+
+def logout_commands(iscsiadm, target, path):
+    """
+    Return the iscsiadm commands logging out of target through path,
+    if logged in, and deleting its node.
+    """
+    node = _node(iscsiadm, target, path)
+    commands = [node + ['-o', 'delete']]
+    if path.logged_in:
+        commands.insert(0, node + ['--logout'])
+    return commands
+
+
+def login_all(paths, login, timeout=DEFAULT_TIMEOUT, clock=time.monotonic):
+    """
+    Run login(path) for all paths concurrently and return them once
+    none is pending any more. A path not up within timeout seconds is
+    marked as timed out; all the logins are waited for anyway, so
+    logged_in tells whether a path has to be logged out, even if timed
+    out.
+    """
+    done = threading.Condition()
+
+    def _run(path):
+        start = clock()
+        try:
+            login(path)
+            state, error = UP, None
+        except Exception as e:
+            state, error = FAILED, str(e)
+        with done:
+            path.logged_in = state == UP
+            if path.state == PENDING:
+                path.state = state
+                path.error = error
+                path.ms = int((clock() - start) * 1000)
+            done.notify()
+
+    start = clock()
+    threads = []
+    for path in paths:
+        thread = threading.Thread(
+            target=_run,
+            args=(path,),
+            name='iscsi-login-{p}'.format(p=path.portal),
+        )
+        thread.daemon = True
+        thread.start()
+        threads.append(thread)
+
+    end = start + timeout
+    with done:
+        while [p for p in paths if p.state == PENDING]:
+            remaining = end - clock()
+            if remaining <= 0:
+                for path in paths:
+                    if path.state == PENDING:
+                        path.state = TIMEOUT
+                        path.ms = int((clock() - start) * 1000)
+                break
+            done.wait(remaining)
+    for thread in threads:
+        thread.join()
+    return list(paths)
+
+
+def report(paths):
+    return '\n'.join(
+        '{portal}\t{state}\t{ms}{error}'.format(
+            portal=p.portal,
+            state=p.state,
+            ms='{ms} ms'.format(ms=p.ms) if p.ms is not None else '',
+            error=' ({e})'.format(e=p.error) if p.error else '',
+        )
+        for p in paths
+    )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,68 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import threading
+
+from . import iscsi_login
+
+
+def test_paths_and_commands():
+    paths = iscsi_login.paths('10.0.0.1,fd00::1', '3260', tpgt='1')
+    assert [p.portal for p in paths] == [
+        '10.0.0.1:3260,1',
+        '[fd00::1]:3260,1',
+    ]
+    target = 'iqn.2020-01.com.example:he'
+    commands = iscsi_login.login_commands('iscsiadm', target, paths[0], 10)
+    assert len(commands) == 5
+    assert commands[1][-4:] == ['-n', 'node.startup', '-v', 'manual']
+    assert commands[2][-2:] == ['-v', '10']
+    assert commands[-1][-1] == '--login'
+    commands = iscsi_login.logout_commands('iscsiadm', target, paths[0])
+    assert [c[-2:] for c in commands] == [['-o', 'delete']]
+    paths[0].logged_in = True
+    commands = iscsi_login.logout_commands('iscsiadm', target, paths[0])
+    assert [c[-1] for c in commands] == ['--logout', 'delete']
+
+
+def test_login_all():
+    release = threading.Event()
+
+    def _login(path):
+        if path.address == 'slow':
+            release.wait(5)
+        elif path.address == 'bad':
+            raise RuntimeError('no route')
+
+    paths = iscsi_login.paths('a,bad,slow,b', 3260)
+    timer = threading.Timer(0.4, release.set)
+    timer.start()
+    iscsi_login.login_all(paths, _login, timeout=0.2)
+    # The timed out login was waited for
+    assert release.is_set()
+    assert [p.state for p in paths] == [
+        iscsi_login.UP,
+        iscsi_login.FAILED,
+        iscsi_login.TIMEOUT,
+        iscsi_login.UP,
+    ]
+    assert [p.logged_in for p in paths] == [True, False, True, True]
+    assert 'no route' in iscsi_login.report(paths)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
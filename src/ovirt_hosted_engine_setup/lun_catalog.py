@@ -0,0 +1,180 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Catalog of the LUNs discovered on a block storage target.
+LUNs are indexed by id and status, so that an answer can be resolved
+by id without scanning the list and the prompt can show one page or
+the result of a search at a time. LUNs too small
+for the engine VM disk, the OVF_STORE disks and the free space the
+engine requires are kept out of the selection.
+"""
+
+
+import gettext
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+PAGE_SIZE = 20
+_GIB = pow(2, 30)
+
+
+class Lun(object):
+
+    def __init__(self, lun_id, size, vendor_id, product_id, status, paths,
+                 discard_max_size):
+        self.id = lun_id
+        self.size = size
+        self.vendor_id = vendor_id
+        self.product_id = product_id
+        self.status = status
+        self.paths = paths
+        self.discard_max_size = discard_max_size
+
+    @classmethod
+    def from_storage(cls, entry):
+        """Build a Lun from an ovirt_host_storages entry."""
+        lu = entry['logical_units'][0]
+        return cls(
+            lun_id=entry['id'],
+            size=int(lu['size']),
+            vendor_id=lu['vendor_id'],
+            product_id=lu['product_id'],
+            status=lu['status'],
+            paths=lu['paths'],
+            discard_max_size=int(lu['discard_max_size']),
+        )
+
+    @property
+    def capacity_gib(self):
+        return self.size / _GIB
+
+    def matches(self, text):
+        text = text.lower()
+        return any(
+            text in str(value).lower()
+            for value in (
+                self.id, self.vendor_id, self.product_id, self.status,
+            )
+        )
+
+    def __repr__(self):
+        return '<Lun {id} {size}GiB {vendor} {product} {status}>'.format(
+            id=self.id,
+            size=self.capacity_gib,
+            vendor=self.vendor_id,
+            product=self.product_id,
+            status=self.status,
+        )
+
+
+class LunCatalog(object):
+
+    def __init__(self, luns, min_size_gib=0):
+        self.min_size_gib = min_size_gib
+        self._by_id = {}
+        self._by_status = {}
+        self.too_small = 0
+        selectable = []
+        for lun in luns:
+            self._by_id[lun.id] = lun
+            if lun.capacity_gib < min_size_gib:
+                self.too_small += 1
+                continue
+            self._by_status.setdefault(lun.status, []).append(lun)
+            selectable.append(lun)
+        self.luns = sorted(selectable, key=lambda lun: lun.id)
+
+    @classmethod
+    def from_storages(cls, storages, min_size_gib=0):
+        return cls(
+            (Lun.from_storage(entry) for entry in storages),
+            min_size_gib=min_size_gib,
+        )
+
+    def __len__(self):
+        return len(self.luns)
+
+    def get(self, lun_id):
+        """Return the LUN lun_id, None if unknown or too small."""
+        lun = self._by_id.get(lun_id)
+        if lun is None or lun.capacity_gib < self.min_size_gib:
+            return None
+        return lun
+
+    def with_status(self, status):
+        return list(self._by_status.get(status, ()))
+
+    def search(self, text):
+        """
+        Return the LUNs whose id, vendor, product or status contain
+        text, ignoring case; an exact status is looked up in its index
+        and a vendor/product pair separated by a slash matches exactly.
+        """
+        text = text.strip()
+        if not text:
+            return list(self.luns)
+        if text in self._by_status:
+            return self.with_status(text)
+        if '/' in text:
+            vendor_id, product_id = text.split('/', 1)
+            model = [
+                lun for lun in self.luns
+                if (lun.vendor_id, lun.product_id) == (vendor_id, product_id)
+            ]
+            if model:
+                return model
+        return [lun for lun in self.luns if lun.matches(text)]
+
+
+def page(luns, number, size=PAGE_SIZE):
+    """
+    Return (first index, luns, pages) of the 0 based page number of
+    luns, clamped to the existing pages.
+    """
+    pages = max(1, (len(luns) + size - 1) // size)
+    number = min(max(number, 0), pages - 1)
+    first = number * size
+    return first, luns[first:first + size], pages
+
+
+def format_luns(first, luns):
+    lun_list = ''
+    for index, lun in enumerate(luns, first + 1):
+        lun_list += _(
+            '\t[{i}]\t{id}\t{capacityGiB}GiB\t{vendorID}\t{productID}\n'
+            '\t\tstatus: {status}, paths: {ap} active'
+        ).format(
+            i=index,
+            id=lun.id,
+            capacityGiB=lun.capacity_gib,
+            vendorID=lun.vendor_id,
+            productID=lun.product_id,
+            status=lun.status,
+            ap=lun.paths,
+        )
+        lun_list += '\n\n'
+    return lun_list
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,68 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+from . import lun_catalog
+
+
+def _storage(lun_id, size_gib, vendor='LIO-ORG', status='free'):
+    return {
+        'id': lun_id,
+        'logical_units': [{
+            'size': str(size_gib * pow(2, 30)),
+            'vendor_id': vendor,
+            'product_id': 'disk',
+            'status': status,
+            'paths': 1,
+            'discard_max_size': '0',
+        }],
+    }
+
+
+def _catalog():
+    return lun_catalog.LunCatalog.from_storages(
+        [
+            _storage('36001405c', 100),
+            _storage('36001405a', 20),
+            _storage('36001405b', 60, vendor='NETAPP', status='used'),
+        ] + [
+            _storage('36001406{n:03d}'.format(n=n), 40)
+            for n in range(50)
+        ],
+        min_size_gib=32,
+    )
+
+
+def test_filter_and_lookup():
+    catalog = _catalog()
+    assert len(catalog) == 52
+    assert catalog.too_small == 1
+    assert catalog.get('36001405a') is None
+    assert catalog.get('36001405b').vendor_id == 'NETAPP'
+    assert catalog.luns[0].id == '36001405b'
+
+
+def test_search_and_page():
+    catalog = _catalog()
+    assert [lun.id for lun in catalog.search('used')] == ['36001405b']
+    assert [lun.id for lun in catalog.search('netapp')] == ['36001405b']
+    assert len(catalog.search('LIO-ORG/disk')) == 51
+    first, luns, pages = lun_catalog.page(catalog.luns, 5)
+    assert (first, len(luns), pages) == (40, 12, 3)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
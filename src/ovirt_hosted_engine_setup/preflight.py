@@ -0,0 +1,426 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Pre-flight checks of a deployment.
+The settings of one or more answer files are validated against this
+host, all the checks running concurrently, without deploying anything:
+    hosted-engine --deploy --preflight --config-append=<answer file>
+"""
+
+
+import argparse
+import configparser
+import gettext
+import json
+import socket
+import subprocess
+import sys
+import time
+
+from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_capabilities
+from ovirt_hosted_engine_setup import host_network
+from ovirt_hosted_engine_setup import resolver
+from ovirt_hosted_engine_setup import scheduler
+from ovirt_hosted_engine_setup import validation
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+PASS = 'PASS'
+FAIL = 'FAIL'
+SKIP = 'SKIP'
+COMMAND_TIMEOUT = 5
+CONNECT_TIMEOUT = 3
+STORAGE_PORTS = {
+    ohostedcons.DomainTypes.NFS: 2049,
+    ohostedcons.DomainTypes.NFS3: 2049,
+    ohostedcons.DomainTypes.NFS4: 2049,
+    ohostedcons.DomainTypes.GLUSTERFS: 24007,
+}
+CAPABILITIES = 'preflight.host_capabilities'
+NETWORK = 'preflight.host_network'
+
+
+class Failed(Exception):
+    pass
+
+
+class Skipped(Exception):
+    pass
+
+
+def _value(raw):
+    """Decode an otopi typed value, e.g. int:4 or bool:True."""
+    value_type, sep, value = raw.partition(':')
+    if not sep:
+        return raw
+    if value_type == 'none':
+        return None
+    if value_type == 'bool':
+        return value.strip().lower() in ('true', '1', 'yes')
+    if value_type == 'int':
+        return int(value)
+    if value_type == 'multi-str':
+        return value.splitlines()
+    return value
+
+
+def load_answers(paths):
+    """Return the environment of the answer files, the last one wins."""
+    env = {}
+    for path in paths:
+        config = configparser.ConfigParser(interpolation=None)
+        config.optionxform = str
+        if not config.read(path):
+            raise RuntimeError(
+                _('Cannot read answer file {path}').format(path=path)
+            )
+        for section in config.sections():
+            if section.startswith('environment:'):
+                for key, raw in config.items(section):
+                    env[key] = _value(raw)
+    return env
+
+
+def _run(cmd):
+    try:
+        return subprocess.call(
+            cmd,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            timeout=COMMAND_TIMEOUT,
+        ) == 0
+    except subprocess.TimeoutExpired:
+        return False
+    except OSError as e:
+        raise Failed(str(e))
+
+
+def _connect(address, port):
+    address = address.strip('[]')
+    try:
+        socket.create_connection((address, int(port)), CONNECT_TIMEOUT).close()
+    except (socket.error, ValueError) as e:
+        raise Failed(
+            _('Cannot connect to {address}:{port}: {error}').format(
+                address=address,
+                port=port,
+                error=e,
+            )
+        )
+    return '{address}:{port}'.format(address=address, port=port)
+
+
+def _required(env, key):
+    value = env.get(key)
+    if value in (None, ''):
+        raise Skipped(_('{key} not set').format(key=key))
+    return value
+
+
+def check_cpu(env, inputs):
+    caps = inputs[CAPABILITIES]
+    vcpus = _required(env, ohostedcons.VMEnv.VCPUS)
+    message = validation.check_vcpus(vcpus, caps.cpus)
+    if message:
+        raise Failed(message)
+    if int(vcpus) < ohostedcons.Defaults.DEFAULT_VM_VCPUS:
+        raise Failed(_('Minimum requirements for CPUs not met'))
+    return _('{vcpus} of {cpus} CPUs').format(vcpus=vcpus, cpus=caps.cpus)
+
+
+def check_memory(env, inputs):
+    caps = inputs[CAPABILITIES]
+    mem_size_mb = _required(env, ohostedcons.VMEnv.MEM_SIZE_MB)
+    maxmem = caps.max_memory_mb(ohostedcons.Const.HOST_RESERVED_MEMORY_MB)
+    message = validation.check_memory_size(
+        mem_size_mb,
+        ohostedcons.Defaults.MINIMAL_MEM_SIZE_MB,
+        maxmem,
+    )
+    if message:
+        raise Failed(message)
+    return _('{mem} of {maxmem} MB available').format(
+        mem=mem_size_mb,
+        maxmem=maxmem,
+    )
+
+
+def check_bridge(env, inputs):
+    network = inputs[NETWORK]
+    bridge = env.get(
+        ohostedcons.NetworkEnv.BRIDGE_NAME,
+        ohostedcons.Defaults.DEFAULT_BRIDGE_NAME,
+    )
+    if network.has_link(bridge):
+        return _('Bridge {bridge} already created').format(bridge=bridge)
+    nic = _required(env, ohostedcons.NetworkEnv.BRIDGE_IF)
+    if not network.has_link(nic):
+        raise Failed(_('No network interface {nic}').format(nic=nic))
+    if not network.get_addresses(ifname=nic):
+        raise Failed(_('{nic} has no address').format(nic=nic))
+    return nic
+
+
+def check_gateway(env, inputs):
+    gateway = env.get(ohostedcons.NetworkEnv.GATEWAY)
+    if not gateway:
+        gateway = inputs[NETWORK].default_gateway(
+            socket.AF_INET6
+            if env.get(ohostedcons.NetworkEnv.FORCE_IPV6)
+            else socket.AF_INET
+        )
+    if not gateway:
+        raise Failed(_('No gateway set and no default route'))
+    if not _run(validation.ping_command('ping', gateway)):
+        raise Failed(
+            _('Gateway {gateway} is not pingable').format(gateway=gateway)
+        )
+    return gateway
+
+
+def check_network_test(env, inputs):
+    network_test = env.get(ohostedcons.NetworkEnv.NETWORK_TEST) or 'dns'
+    if network_test == 'none':
+        raise Skipped(_('Disabled'))
+    if network_test == 'ping':
+        return check_gateway(env, inputs)
+    if network_test == 'dns':
+        if not _run(validation.dns_command('dig')):
+            raise Failed(_('DNS query failed'))
+        return network_test
+    if network_test == 'tcp':
+        address = _required(
+            env,
+            ohostedcons.NetworkEnv.NETWORK_TEST_TCP_ADDRESS,
+        )
+        port = _required(env, ohostedcons.NetworkEnv.NETWORK_TEST_TCP_PORT)
+        return _connect(address, port)
+    raise Failed(
+        _('Invalid network test {test}').format(test=network_test)
+    )
+
+
+def _local_addresses(network):
+    return set(a.address for a in network.get_addresses(global_only=False))
+
+
+def check_engine_fqdn(env, inputs):
+    fqdn = env.get(
+        ohostedcons.NetworkEnv.OVIRT_HOSTED_ENGINE_FQDN
+    ) or _required(env, ohostedcons.CloudInit.INSTANCE_HOSTNAME)
+    addresses = resolver.default().addresses(fqdn)
+    if not addresses:
+        raise Failed(_('{fqdn} does not resolve').format(fqdn=fqdn))
+    if addresses & _local_addresses(inputs[NETWORK]):
+        raise Failed(
+            _('{fqdn} resolves to an address of this host').format(
+                fqdn=fqdn,
+            )
+        )
+    return '{fqdn} {addresses}'.format(
+        fqdn=fqdn,
+        addresses=','.join(sorted(addresses)),
+    )
+
+
+def check_host_fqdn(env, inputs):
+    fqdn = env.get(ohostedcons.NetworkEnv.HOST_NAME) or socket.getfqdn()
+    addresses = resolver.default().addresses(fqdn)
+    if not addresses:
+        raise Failed(_('{fqdn} does not resolve').format(fqdn=fqdn))
+    local = addresses & _local_addresses(inputs[NETWORK])
+    if not [a for a in local if not a.startswith('127.') and a != '::1']:
+        raise Failed(
+            _('{fqdn} does not resolve to an address of this host').format(
+                fqdn=fqdn,
+            )
+        )
+    return fqdn
+
+
+def check_storage(env, inputs):
+    domain_type = _required(env, ohostedcons.StorageEnv.DOMAIN_TYPE)
+    if domain_type in STORAGE_PORTS:
+        connection = _required(
+            env,
+            ohostedcons.StorageEnv.STORAGE_DOMAIN_CONNECTION,
+        )
+        try:
+            address, path = validation.parse_connection_path(connection)
+        except ValueError as e:
+            raise Failed(str(e))
+        return _connect(address, STORAGE_PORTS[domain_type])
+    if domain_type == ohostedcons.DomainTypes.ISCSI:
+        portal = _required(env, ohostedcons.StorageEnv.ISCSI_IP_ADDR)
+        port = env.get(ohostedcons.StorageEnv.ISCSI_PORT) or 3260
+        return _connect(portal.split(',')[0], port)
+    if domain_type == ohostedcons.DomainTypes.POSIXFS:
+        return _required(env, ohostedcons.StorageEnv.STORAGE_DOMAIN_CONNECTION)
+    if domain_type == ohostedcons.DomainTypes.FC:
+        raise Skipped(_('Nothing to check before the LUN selection'))
+    raise Failed(
+        _('Invalid storage domain type {t}').format(t=domain_type)
+    )
+
+
+CHECKS = (
+    ('cpu', check_cpu, (CAPABILITIES,)),
+    ('memory', check_memory, (CAPABILITIES,)),
+    ('bridge', check_bridge, (NETWORK,)),
+    ('gateway', check_gateway, (NETWORK,)),
+    ('network_test', check_network_test, (NETWORK,)),
+    ('engine_fqdn', check_engine_fqdn, (NETWORK,)),
+    ('host_fqdn', check_host_fqdn, (NETWORK,)),
+    ('storage', check_storage, ()),
+)
+
+
+def run(env, checks=CHECKS):
+    """Run all the checks concurrently, return their results in order."""
+    sched = scheduler.Scheduler(max_workers=len(checks) + 2)
+    sched.add(
+        name='host_capabilities',
+        func=lambda inputs: host_capabilities.probe(),
+        provides=(CAPABILITIES,),
+    )
+    sched.add(
+        name='host_network',
+        func=lambda inputs: host_network.snapshot(),
+        provides=(NETWORK,),
+    )
+
+    def _check(name, func, inputs):
+        start = time.monotonic()
+        try:
+            status, detail = PASS, func(env, inputs)
+        except Failed as e:
+            status, detail = FAIL, str(e)
+        except Skipped as e:
+            status, detail = SKIP, str(e)
+        except Exception as e:
+            status, detail = FAIL, '{t}: {e}'.format(t=type(e).__name__, e=e)
+        return {
+            'check': name,
+            'status': status,
+            'detail': detail,
+            'ms': round((time.monotonic() - start) * 1000, 1),
+        }
+
+    for name, func, requires in checks:
+        sched.add(
+            name='preflight-{name}'.format(name=name),
+            func=lambda inputs, name=name, func=func: _check(
+                name,
+                func,
+                inputs,
+            ),
+            requires=requires,
+            provides=(name,),
+        )
+    results = []
+    for name, func, requires in checks:
+        try:
+            results.append(sched.result(name))
+        except Exception as e:
+            # A probe it requires failed
+            results.append({
+                'check': name,
+                'status': FAIL,
+                'detail': str(e),
+                'ms': 0.0,
+            })
+    return results
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='hosted-engine --deploy --preflight',
+        description=_(
+            'Validate the settings of a deployment against this host, '
+            'without deploying'
+        ),
+    )
+    parser.add_argument(
+        '--config-append',
+        action='append',
+        default=[],
+        required=True,
+        help=_('answer file to validate, can be repeated'),
+    )
+    parser.add_argument('--4', dest='ipv4', action='store_true')
+    parser.add_argument('--6', dest='ipv6', action='store_true')
+    parser.add_argument('--json', action='store_true')
+    args, unused = parser.parse_known_args(argv)
+
+    try:
+        env = load_answers(args.config_append)
+    except (RuntimeError, configparser.Error) as e:
+        sys.stderr.write('{e}\n'.format(e=e))
+        return 1
+    if args.ipv4:
+        env[ohostedcons.NetworkEnv.FORCE_IPV4] = True
+    if args.ipv6:
+        env[ohostedcons.NetworkEnv.FORCE_IPV6] = True
+
+    start = time.monotonic()
+    results = run(env)
+    failed = [r for r in results if r['status'] == FAIL]
+    if args.json:
+        print(json.dumps(
+            {
+                'passed': not failed,
+                'ms': round((time.monotonic() - start) * 1000, 1),
+                'checks': results,
+            },
+            indent=4,
+        ))
+    else:
+        print('{c:14} {s:6} {ms:>8}  {d}'.format(
+            c=_('check'),
+            s=_('result'),
+            ms=_('ms'),
+            d=_('detail'),
+        ))
+        for r in results:
+            print('{c:14} {s:6} {ms:8.1f}  {d}'.format(
+                c=r['check'],
+                s=r['status'],
+                ms=r['ms'],
+                d=r['detail'],
+            ))
+        print(
+            _('\nPre-flight checks {result} in {ms:.1f} ms').format(
+                result=_('failed') if failed else _('passed'),
+                ms=(time.monotonic() - start) * 1000,
+            )
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,196 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Aggregate the ansible task profiles of hosted-engine deployments"""
+
+
+import argparse
+import csv
+import gettext
+import glob
+import json
+import os
+import sys
+
+from ovirt_hosted_engine_setup import constants as ohostedcons
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+def _expand(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                sorted(
+                    glob.glob(
+                        os.path.join(
+                            path,
+                            ohostedcons.AnsibleCallback.PROFILE_GLOB,
+                        )
+                    )
+                )
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def load_profiles(paths):
+    """
+    Load the profiles written by the ovirt_logger callback.
+    Directories are expanded to the profiles they contain, unreadable
+    files are reported and skipped.
+    """
+    profiles = []
+    for path in _expand(paths):
+        try:
+            with open(path) as f:
+                profile = json.load(f)
+        except (IOError, OSError, ValueError) as e:
+            sys.stderr.write(
+                _('Skipping {path}: {e}\n').format(path=path, e=e)
+            )
+            continue
+        profile['path'] = path
+        profiles.append(profile)
+    return profiles
+
+
+def aggregate(profiles):
+    """
+    Group the task entries of all the profiles by task name, slowest first.
+    """
+    tasks = {}
+    for profile in profiles:
+        for entry in profile.get('tasks', []):
+            task = tasks.setdefault(
+                entry['task'],
+                {
+                    'task': entry['task'],
+                    'count': 0,
+                    'failures': 0,
+                    'total_ms': 0,
+                    'max_ms': 0,
+                    'max_path': None,
+                    'children_cpu_ms': 0,
+                },
+            )
+            task['count'] += 1
+            if entry['status'] in ('FAILED', 'UNREACHABLE'):
+                task['failures'] += 1
+            task['total_ms'] += entry['duration_ms']
+            task['children_cpu_ms'] += entry.get('children_cpu_ms', 0)
+            if entry['duration_ms'] >= task['max_ms']:
+                task['max_ms'] = entry['duration_ms']
+                task['max_path'] = profile['path']
+    for task in tasks.values():
+        task['mean_ms'] = task['total_ms'] // task['count']
+    return sorted(
+        tasks.values(),
+        key=lambda t: t['total_ms'],
+        reverse=True,
+    )
+
+
+_COLUMNS = (
+    'total_ms',
+    'count',
+    'mean_ms',
+    'max_ms',
+    'failures',
+    'children_cpu_ms',
+    'task',
+)
+
+
+def print_report(tasks, out=sys.stdout):
+    out.write(
+        '{:>10} {:>6} {:>9} {:>9} {:>6} {:>10}  {}\n'.format(
+            _('Total ms'),
+            _('Runs'),
+            _('Mean ms'),
+            _('Max ms'),
+            _('Failed'),
+            _('CPU ms'),
+            _('Task'),
+        )
+    )
+    for t in tasks:
+        out.write(
+            '{:>10} {:>6} {:>9} {:>9} {:>6} {:>10}  {}\n'.format(
+                *[t[c] for c in _COLUMNS]
+            )
+        )
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='hosted-engine --profile-report',
+        description=_(
+            'Aggregate the ansible task profiles of one or more '
+            'hosted-engine deployments and report the slowest tasks'
+        ),
+    )
+    parser.add_argument(
+        'paths',
+        nargs='*',
+        default=[ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_LOGDIR],
+        help=_('profile files or directories containing them'),
+    )
+    parser.add_argument(
+        '--top',
+        type=int,
+        default=20,
+        help=_('number of tasks to report, 0 for all'),
+    )
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument('--json', action='store_true')
+    output.add_argument('--csv', action='store_true')
+    args = parser.parse_args(argv)
+
+    profiles = load_profiles(args.paths)
+    if not profiles:
+        sys.stderr.write(_('No profile found\n'))
+        return 1
+    tasks = aggregate(profiles)
+    if args.top > 0:
+        tasks = tasks[:args.top]
+    if args.json:
+        print(json.dumps(tasks, indent=4))
+    elif args.csv:
+        writer = csv.DictWriter(sys.stdout, fieldnames=_COLUMNS + (
+            'max_path',
+        ))
+        writer.writeheader()
+        writer.writerows(tasks)
+    else:
+        print(_('{n} profiles analyzed').format(n=len(profiles)))
+        print_report(tasks)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,84 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import io
+import json
+
+import pytest
+
+# constants needs otopi and the generated config module
+pytest.importorskip('ovirt_hosted_engine_setup.constants')
+
+from . import profile_report  # noqa: E402
+
+
+def _task(name, duration, status='OK', cpu=0):
+    return {
+        'task': name,
+        'status': status,
+        'duration_ms': duration,
+        'children_cpu_ms': cpu,
+    }
+
+
+def _write(tmpdir, name, tasks):
+    path = tmpdir.join(name)
+    path.write(json.dumps({'tasks': tasks}))
+    return str(path)
+
+
+def test_aggregate_slowest_first(tmpdir):
+    first = _write(tmpdir, 'first.profile.json', [
+        _task('wait for the host', 3000, cpu=10),
+        _task('gather facts', 500),
+    ])
+    second = _write(tmpdir, 'second.profile.json', [
+        _task('wait for the host', 5000, status='FAILED', cpu=20),
+    ])
+    broken = tmpdir.join('broken.profile.json')
+    broken.write('{')
+    profiles = profile_report.load_profiles([first, second, str(broken)])
+    assert [p['path'] for p in profiles] == [first, second]
+    tasks = profile_report.aggregate(profiles)
+    assert [t['task'] for t in tasks] == ['wait for the host', 'gather facts']
+    slowest = tasks[0]
+    assert slowest['count'] == 2
+    assert slowest['failures'] == 1
+    assert slowest['total_ms'] == 8000
+    assert slowest['mean_ms'] == 4000
+    assert slowest['max_ms'] == 5000
+    assert slowest['max_path'] == second
+    assert slowest['children_cpu_ms'] == 30
+
+
+def test_print_report():
+    out = io.StringIO()
+    profile_report.print_report(
+        profile_report.aggregate([
+            {'path': 'p', 'tasks': [_task('gather facts', 500)]},
+        ]),
+        out=out,
+    )
+    header, row = out.getvalue().splitlines()
+    assert header.split()[0] == 'Total'
+    assert row.split() == ['500', '1', '500', '500', '0', '0', 'gather',
+                           'facts']
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,156 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Cached name resolution.
+Forward and reverse lookups are cached for a while, failed ones for a
+shorter time, and several lookups can run concurrently under a single
+deadline: a missing PTR record costs one resolver timeout in total
+instead of one per address.
+"""
+
+
+import socket
+import threading
+import time
+
+
+TTL = 300
+NEGATIVE_TTL = 30
+DEFAULT_DEADLINE = 10
+
+
+class Resolver(object):
+
+    def __init__(self, ttl=TTL, negative_ttl=NEGATIVE_TTL,
+                 clock=time.monotonic):
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._cache = {}
+
+    def _cached(self, key, lookup):
+        now = self._clock()
+        with self._lock:
+            entry = self._cache.get(key)
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = lookup()
+        with self._lock:
+            self._cache[key] = (
+                now + (self._ttl if value else self._negative_ttl),
+                value,
+            )
+        return value
+
+    def reverse(self, address):
+        """
+        Return the fully qualified name of address, as socket.getfqdn,
+        or None if it has no PTR record.
+        """
+        def _lookup():
+            try:
+                name, aliases, addresses = socket.gethostbyaddr(address)
+            except (socket.error, UnicodeError):
+                return None
+            return next((n for n in [name] + aliases if '.' in n), name)
+        return self._cached(('reverse', address), _lookup)
+
+    def addresses(self, name):
+        """Return the set of the addresses name resolves to."""
+        def _lookup():
+            try:
+                return set(
+                    sockaddr[0]
+                    for __, __, __, __, sockaddr in socket.getaddrinfo(
+                        name,
+                        None,
+                    )
+                )
+            except (socket.error, UnicodeError):
+                return set()
+        return set(self._cached(('addresses', name), _lookup))
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+
+    def first_match(self, candidates, lookup, predicate,
+                    deadline=DEFAULT_DEADLINE):
+        """
+        Run lookup(candidate) for all candidates concurrently and return
+        the first candidate, in order, whose result satisfies predicate,
+        as soon as it and all the previous ones are known. Return None if
+        none matches or the deadline expires first; in the latter case
+        the first match known by then is returned. Lookups still running
+        go on in the background and fill the cache.
+        """
+        candidates = list(candidates)
+        results = {}
+        done = threading.Condition()
+
+        def _run(index, candidate):
+            try:
+                matched = bool(predicate(lookup(candidate)))
+            except Exception:
+                matched = False
+            with done:
+                results[index] = matched
+                done.notify()
+
+        for index, candidate in enumerate(candidates):
+            thread = threading.Thread(
+                target=_run,
+                args=(index, candidate),
+                name='resolve-{c}'.format(c=candidate),
+            )
+            thread.daemon = True
+            thread.start()
+
+        end = self._clock() + deadline
+        with done:
+            while True:
+                for index in range(len(candidates)):
+                    if index not in results:
+                        break
+                    if results[index]:
+                        return candidates[index]
+                else:
+                    return None
+                remaining = end - self._clock()
+                if remaining <= 0:
+                    break
+                done.wait(remaining)
+            for index in sorted(results):
+                if results[index]:
+                    return candidates[index]
+        return None
+
+
+_resolver = Resolver()
+
+
+def default():
+    """Return the process wide resolver."""
+    return _resolver
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
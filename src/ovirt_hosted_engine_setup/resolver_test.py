@@ -0,0 +1,83 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import threading
+import time
+
+from . import resolver
+
+
+class FakeClock(object):
+
+    def __init__(self):
+        self.now = 0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_ttl():
+    clock = FakeClock()
+    r = resolver.Resolver(ttl=10, negative_ttl=1, clock=clock)
+    calls = []
+
+    def lookup(value):
+        calls.append(value)
+        return value
+
+    assert r._cached('a', lambda: lookup('x')) == 'x'
+    assert r._cached('a', lambda: lookup('y')) == 'x'
+    assert r._cached('b', lambda: lookup(None)) is None
+    clock.now = 2
+    assert r._cached('b', lambda: lookup('z')) == 'z'
+    assert r._cached('a', lambda: lookup('y')) == 'x'
+    clock.now = 11
+    assert r._cached('a', lambda: lookup('y')) == 'y'
+    assert calls == ['x', None, 'z', 'y']
+
+
+def test_first_match_in_order_without_waiting_for_the_slow_ones():
+    release = threading.Event()
+    delays = {'slow': None, 'eth0': 0.05, 'eth1': 0, 'eth2': 0}
+
+    def lookup(iface):
+        if delays[iface] is None:
+            release.wait(5)
+        else:
+            time.sleep(delays[iface])
+        return iface
+
+    r = resolver.Resolver()
+    start = time.monotonic()
+    assert r.first_match(
+        ['eth0', 'eth1', 'eth2', 'slow'],
+        lookup,
+        lambda name: name in ('eth0', 'eth2'),
+    ) == 'eth0'
+    assert r.first_match(
+        ['slow', 'eth1', 'eth2'],
+        lookup,
+        lambda name: name == 'eth2',
+        deadline=0.2,
+    ) == 'eth2'
+    assert time.monotonic() - start < 1
+    assert r.first_match(['eth1'], lookup, lambda name: False) is None
+    release.set()
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,225 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Dependency aware scheduler for setup work items.
+Each work item declares the outputs it requires and the ones it
+provides; it is started, in a background thread, as soon as all its
+requirements are available, so independent items run in parallel and
+the overall time is bounded by the critical path.
+"""
+
+
+import gettext
+import sys
+import threading
+
+from ovirt_hosted_engine_setup import stage_timing
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+class _WorkItem(object):
+
+    def __init__(self, name, func, requires, provides, stage):
+        self.name = name
+        self.func = func
+        self.requires = tuple(requires)
+        self.provides = tuple(provides)
+        self.stage = stage
+        self.state = PENDING
+        self.exc_info = None
+
+
+class Scheduler(object):
+    """
+    func is called with a dict holding the values of the required
+    outputs. It has to return the value of its output, or a dict
+    holding a value for each of them if it provides more than one.
+    A failure is propagated to the items requiring its outputs and
+    raised again to whoever asks for them.
+    """
+
+    def __init__(self, max_workers=4):
+        self._max_workers = max_workers
+        self._cond = threading.Condition()
+        self._items = {}
+        self._providers = {}
+        self._values = {}
+        self._running = 0
+
+    def add(self, name, func, requires=(), provides=()):
+        with self._cond:
+            if name in self._items:
+                raise RuntimeError(
+                    _('Work item {name} already scheduled').format(name=name)
+                )
+            for output in provides:
+                if output in self._providers:
+                    raise RuntimeError(
+                        _('{output} is already provided by {name}').format(
+                            output=output,
+                            name=self._providers[output].name,
+                        )
+                    )
+            item = _WorkItem(
+                name=name,
+                func=func,
+                requires=requires,
+                provides=provides,
+                stage=stage_timing.timer().current_stage(),
+            )
+            self._items[name] = item
+            for output in provides:
+                self._providers[output] = item
+            self._dispatch()
+
+    def scheduled(self, output):
+        with self._cond:
+            return output in self._providers
+
+    def _failed_requirement(self, item):
+        for output in item.requires:
+            provider = self._providers.get(output)
+            if provider is not None and provider.state == FAILED:
+                return provider
+        return None
+
+    def _dispatch(self):
+        for item in self._items.values():
+            if item.state != PENDING:
+                continue
+            failed = self._failed_requirement(item)
+            if failed is not None:
+                item.state = FAILED
+                item.exc_info = failed.exc_info
+                return self._dispatch()
+            if self._running >= self._max_workers:
+                continue
+            if all(output in self._values for output in item.requires):
+                item.state = RUNNING
+                self._running += 1
+                t = threading.Thread(
+                    target=self._run,
+                    args=(item,),
+                    name='scheduler-{name}'.format(name=item.name),
+                )
+                t.daemon = True
+                t.start()
+        self._cond.notify_all()
+
+    def _run(self, item):
+        with self._cond:
+            inputs = dict(
+                (output, self._values[output]) for output in item.requires
+            )
+        exc_info = None
+        try:
+            with stage_timing.timer().measure(
+                stage=item.stage,
+                plugin='scheduler',
+                method=item.name,
+            ):
+                result = item.func(inputs)
+            if len(item.provides) == 1:
+                values = {item.provides[0]: result}
+            else:
+                values = dict(
+                    (output, result[output]) for output in item.provides
+                )
+        except Exception:
+            exc_info = sys.exc_info()
+        with self._cond:
+            self._running -= 1
+            if exc_info is None:
+                item.state = DONE
+                self._values.update(values)
+            else:
+                item.state = FAILED
+                item.exc_info = exc_info
+            self._dispatch()
+
+    def _raise(self, item):
+        raise item.exc_info[1].with_traceback(item.exc_info[2])
+
+    def result(self, output, timeout=None):
+        """Wait for output and return its value."""
+        with self._cond:
+            item = self._providers.get(output)
+            if item is None:
+                raise RuntimeError(
+                    _('Nothing provides {output}').format(output=output)
+                )
+            if not self._cond.wait_for(
+                lambda: item.state in (DONE, FAILED),
+                timeout,
+            ):
+                raise RuntimeError(
+                    _('Timeout waiting for {output}').format(output=output)
+                )
+            if item.state == FAILED:
+                self._raise(item)
+            return self._values[output]
+
+    def wait(self):
+        """
+        Wait for all the scheduled items, raise the first failure.
+        Items whose requirements will never be provided are reported.
+        """
+        with self._cond:
+            self._cond.wait_for(
+                lambda: self._running == 0 and not any(
+                    item.state == PENDING and
+                    all(o in self._values for o in item.requires)
+                    for item in self._items.values()
+                )
+            )
+            for item in self._items.values():
+                if item.state == FAILED:
+                    self._raise(item)
+            stuck = sorted(
+                item.name for item in self._items.values()
+                if item.state == PENDING
+            )
+            if stuck:
+                raise RuntimeError(
+                    _('Unsatisfied requirements for: {names}').format(
+                        names=', '.join(stuck),
+                    )
+                )
+
+
+_scheduler = Scheduler()
+
+
+def default():
+    """Return the process wide scheduler."""
+    return _scheduler
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
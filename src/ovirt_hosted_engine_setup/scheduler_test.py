@@ -0,0 +1,73 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import threading
+
+import pytest
+
+from . import scheduler
+
+
+def test_independent_items_overlap():
+    s = scheduler.Scheduler()
+    barrier = threading.Barrier(2, timeout=5)
+
+    def probe(value):
+        def f(inputs):
+            barrier.wait()
+            return value
+        return f
+
+    s.add('a', probe(1), provides=('a',))
+    s.add('b', probe(2), provides=('b',))
+    s.add(
+        'sum',
+        lambda inputs: inputs['a'] + inputs['b'],
+        requires=('a', 'b'),
+        provides=('sum',),
+    )
+    assert s.result('sum', timeout=5) == 3
+    s.wait()
+
+
+def test_failure_is_propagated():
+    s = scheduler.Scheduler()
+
+    def fail(inputs):
+        raise RuntimeError('clean failed')
+
+    s.add('clean', fail, provides=('clean',))
+    s.add(
+        'bootstrap',
+        lambda inputs: True,
+        requires=('clean',),
+        provides=('bootstrap',),
+    )
+    with pytest.raises(RuntimeError, match='clean failed'):
+        s.result('bootstrap', timeout=5)
+
+
+def test_unsatisfied_requirement():
+    s = scheduler.Scheduler()
+    s.add('orphan', lambda inputs: None, requires=('missing',))
+    with pytest.raises(RuntimeError, match='orphan'):
+        s.wait()
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
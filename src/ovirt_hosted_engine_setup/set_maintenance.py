@@ -24,6 +24,7 @@
 import gettext
 import socket
 import sys
+import time
 
 from vdsm.client import ServerError
 
@@ -37,36 +38,67 @@ def _(m):
     return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
 
 
+# VDSM error code for a VM not running on the host
+NO_VM_ERROR = 1
+MODES = ('local', 'global', 'none')
+
+
+def target_flags(mode):
+    """Return the (local, global) maintenance flags of mode."""
+    return mode == 'local', mode == 'global'
+
+
 class Maintenance(object):
 
+    WAIT_MIN_DELAY = 1
+    WAIT_MAX_DELAY = 10
+
     def __init__(self):
         super(Maintenance, self).__init__()
+        self._config = None
+
+    def _get_config(self, key):
+        if self._config is None:
+            self._config = config.Config()
+        return self._config.get(config.ENGINE, key)
+
+    def _engine_vm_running_here(self):
+        """
+        Return True if the engine VM runs on this host, None if VDSM
+        cannot be queried.
+        """
+        vm_id = self._get_config(const.HEVMID)
+        cli = ohautil.connect_vdsm_json_rpc()
+        try:
+            cli.VM.getStats(vmID=vm_id)
+        except ServerError as e:
+            if e.code == NO_VM_ERROR:
+                return False
+            sys.stderr.write(
+                _("Failed communicating with VDSM: {e}").format(e=e)
+            )
+            return None
+        return True
 
     def set_mode(self, mode):
+        """
+        Move to the maintenance mode, setting first the flags entering
+        the new mode and then clearing the ones of the old one, so that
+        the host is never out of maintenance between two modes.
+        """
         ha_cli = client.HAClient()
-        if mode not in (
-            'local',
-            'global',
-            'none',
-        ):
+        if mode not in MODES:
             sys.stderr.write(
                 _('Invalid maintenance mode: {0}\n').format(mode)
             )
             return False
-        m_local = (mode == 'local')
-        m_global = (mode == 'global')
+        m_local, m_global = target_flags(mode)
         if m_local:
             # Check that the engine VM is not running here
-            vm_id = config.Config().get(config.ENGINE, const.HEVMID)
-            cli = ohautil.connect_vdsm_json_rpc()
-            try:
-                vm_list = cli.Host.getVMList()
-            except ServerError as e:
-                sys.stderr.write(
-                    _("Failed communicating with VDSM: {e}").format(e=e)
-                )
+            running = self._engine_vm_running_here()
+            if running is None:
                 return False
-            if vm_id in [ item['vmId'] for item in vm_list ]:
+            if running:
                 sys.stderr.write(_(
                     "Unable to enter local maintenance mode: "
                     "the engine VM is running on the current host, "
@@ -74,19 +106,19 @@ class Maintenance(object):
                     "maintenance mode.\n"
                 ))
                 return False
+        flags = (
+            (ha_cli.MaintenanceMode.LOCAL, m_local),
+            (ha_cli.MaintenanceMode.GLOBAL, m_global),
+            (ha_cli.MaintenanceMode.LOCAL_MANUAL, m_local),
+        )
         try:
-            ha_cli.set_maintenance_mode(
-                mode=ha_cli.MaintenanceMode.LOCAL,
-                value=m_local,
-            )
-            ha_cli.set_maintenance_mode(
-                mode=ha_cli.MaintenanceMode.GLOBAL,
-                value=m_global,
-            )
-            ha_cli.set_maintenance_mode(
-                mode=ha_cli.MaintenanceMode.LOCAL_MANUAL,
-                value=m_local,
-            )
+            for value in (True, False):
+                for flag, flag_value in flags:
+                    if flag_value == value:
+                        ha_cli.set_maintenance_mode(
+                            mode=flag,
+                            value=value,
+                        )
         except socket.error:
             sys.stderr.write(
                 _('Cannot connect to the HA daemon, please check the logs.\n')
@@ -94,6 +126,54 @@ class Maintenance(object):
             return False
         return True
 
+    def confirmed(self, ha_cli, mode):
+        """Return True if the agents report mode."""
+        m_local, m_global = target_flags(mode)
+        host_id = int(self._get_config(const.HOST_ID))
+        try:
+            cluster_stats = ha_cli.get_all_stats(
+                client.HAClient.StatModes.GLOBAL
+            )[0]
+        except KeyError:
+            cluster_stats = {}
+        if cluster_stats.get(
+            client.HAClient.GlobalMdFlags.MAINTENANCE,
+            False
+        ) != m_global:
+            return False
+        host = ha_cli.get_all_host_stats().get(host_id, {})
+        return (
+            host.get('live-data', False) and
+            bool(host.get('maintenance')) == m_local
+        )
+
+    def wait(self, mode, timeout):
+        """
+        Wait up to timeout seconds for the agents to report mode. The
+        broker offers no change notification: the stats are read again
+        with an exponential backoff capped to the agent update interval.
+        """
+        ha_cli = client.HAClient()
+        deadline = time.monotonic() + timeout
+        delay = self.WAIT_MIN_DELAY
+        while True:
+            try:
+                if self.confirmed(ha_cli, mode):
+                    return True
+            except (socket.error, IndexError, AttributeError):
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                sys.stderr.write(
+                    _(
+                        'The agent did not confirm the {mode} maintenance '
+                        'mode within {t} seconds\n'
+                    ).format(mode=mode, t=timeout)
+                )
+                return False
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, self.WAIT_MAX_DELAY)
+
 
 if __name__ == "__main__":
     maintenance = Maintenance()
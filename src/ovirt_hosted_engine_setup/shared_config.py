@@ -0,0 +1,185 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Batch access to the shared configuration.
+All the keys are read or written through a single HA client, the
+catalog of the valid keys is fetched once and every key is validated
+before anything is written.
+"""
+
+
+import gettext
+import json
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+def _value(key, value):
+    """Return the string to set key to for the JSON scalar value."""
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float)):
+        return str(value)
+    if isinstance(value, str):
+        return value
+    raise ValueError(
+        _(
+            'Invalid value {value} for {key}, a string, number or '
+            'boolean is required'
+        ).format(
+            value=json.dumps(value),
+            key=key,
+        )
+    )
+
+
+def parse_items(content):
+    """
+    Return the (key, value, type) to set from content, JSON holding
+    either an object mapping keys to values or a list of objects with
+    key, value and optionally type.
+    """
+    data = json.loads(content)
+    if isinstance(data, dict):
+        return [(k, _value(k, v), None) for k, v in sorted(data.items())]
+    if not isinstance(data, list):
+        raise ValueError(_('Expected a JSON object or list'))
+    items = []
+    for entry in data:
+        if (
+            not isinstance(entry, dict) or
+            'key' not in entry or
+            'value' not in entry
+        ):
+            raise ValueError(
+                _('Invalid entry {entry}, key and value are required').format(
+                    entry=entry,
+                )
+            )
+        items.append(
+            (
+                entry['key'],
+                _value(entry['key'], entry['value']),
+                entry.get('type'),
+            )
+        )
+    return items
+
+
+class SharedConfigSession(object):
+
+    def __init__(self, ha_cli=None):
+        if ha_cli is None:
+            from ovirt_hosted_engine_ha.client import client
+            ha_cli = client.HAClient()
+        self._ha_cli = ha_cli
+        self._catalog = None
+
+    def catalog(self):
+        """Return the valid keys of every configuration type."""
+        if self._catalog is None:
+            self._catalog = dict(
+                (c_type, list(keys))
+                for c_type, keys in self._ha_cli.get_all_config_keys(
+                    None
+                ).items()
+            )
+        return self._catalog
+
+    def resolve(self, key, config_type=None):
+        """
+        Return the configuration type of key, raise KeyError if the key
+        is unknown or ambiguous.
+        """
+        catalog = self.catalog()
+        if config_type:
+            if key not in catalog.get(config_type, ()):
+                raise KeyError(
+                    _('Invalid configuration key {key} for {c_type}').format(
+                        key=key,
+                        c_type=config_type,
+                    )
+                )
+            return config_type
+        types = sorted(t for t, keys in catalog.items() if key in keys)
+        if not types:
+            raise KeyError(
+                _('Invalid configuration key {key}').format(key=key)
+            )
+        if len(types) > 1:
+            raise KeyError(
+                _(
+                    'Configuration key {key} is defined in {types}, '
+                    'a type must be provided'
+                ).format(key=key, types=', '.join(types))
+            )
+        return types[0]
+
+    def validate(self, items):
+        """
+        Return the items with their resolved type and the list of the
+        errors found; nothing should be written if there are any.
+        """
+        resolved = []
+        errors = []
+        for key, value, config_type in items:
+            try:
+                resolved.append((key, value, self.resolve(key, config_type)))
+            except KeyError as e:
+                errors.append(e.args[0])
+        return resolved, errors
+
+    def get_many(self, keys=None, config_type=None):
+        """
+        Return {type: {key: value}} for keys, all the keys of the catalog
+        (of config_type, if given) when keys is None.
+        """
+        if keys is None:
+            items = [
+                (k, None, t)
+                for t, type_keys in sorted(self.catalog().items())
+                if not config_type or t == config_type
+                for k in type_keys
+            ]
+        else:
+            items = [(k, None, config_type) for k in keys]
+        resolved, errors = self.validate(items)
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        values = {}
+        for key, unused, c_type in resolved:
+            value, value_type = self._ha_cli.get_shared_config(key, c_type)
+            values.setdefault(value_type, {})[key] = value
+        return values
+
+    def set_many(self, items):
+        """Validate all items, then set them."""
+        resolved, errors = self.validate(items)
+        if errors:
+            raise RuntimeError('\n'.join(errors))
+        for key, value, c_type in resolved:
+            self._ha_cli.set_shared_config(key, value, c_type)
+        return resolved
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,113 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+import pytest
+
+from . import shared_config
+
+
+class FakeHAClient(object):
+
+    def __init__(self):
+        self.calls = []
+        self.values = {
+            ('he_local', 'vm_disk_id'): 'a',
+            ('he_shared', 'vm_disk_id'): 'b',
+            ('ha', 'network_test'): 'dns',
+        }
+
+    def get_all_config_keys(self, config_type):
+        self.calls.append('get_all_config_keys')
+        return {
+            'he_local': ['vm_disk_id'],
+            'he_shared': ['vm_disk_id'],
+            'ha': ['network_test'],
+        }
+
+    def get_shared_config(self, key, config_type):
+        return self.values[(config_type, key)], config_type
+
+    def set_shared_config(self, key, value, config_type):
+        self.calls.append(('set', key, value, config_type))
+        self.values[(config_type, key)] = value
+
+
+def test_parse_items():
+    assert shared_config.parse_items('{"b": 1, "a": "x"}') == [
+        ('a', 'x', None),
+        ('b', '1', None),
+    ]
+    assert shared_config.parse_items(
+        '[{"key": "a", "value": "x", "type": "ha"}]'
+    ) == [('a', 'x', 'ha')]
+    with pytest.raises(ValueError):
+        shared_config.parse_items('[{"key": "a"}]')
+
+
+def test_parse_items_values():
+    assert shared_config.parse_items('{"a": true, "b": false}') == [
+        ('a', 'true', None),
+        ('b', 'false', None),
+    ]
+    for value in ('null', '[1]', '{"x": 1}'):
+        with pytest.raises(ValueError):
+            shared_config.parse_items('{"a": %s}' % value)
+
+
+def test_set_many_validates_everything_first():
+    ha_cli = FakeHAClient()
+    session = shared_config.SharedConfigSession(ha_cli)
+    with pytest.raises(RuntimeError) as e:
+        session.set_many([
+            ('network_test', 'tcp', None),
+            ('vm_disk_id', 'c', None),
+            ('unknown', 'x', None),
+        ])
+    assert 'vm_disk_id' in str(e.value)
+    assert 'unknown' in str(e.value)
+    assert ha_cli.calls == ['get_all_config_keys']
+
+    session.set_many([
+        ('network_test', 'tcp', None),
+        ('vm_disk_id', 'c', 'he_shared'),
+    ])
+    assert ha_cli.calls == [
+        'get_all_config_keys',
+        ('set', 'network_test', 'tcp', 'ha'),
+        ('set', 'vm_disk_id', 'c', 'he_shared'),
+    ]
+
+
+def test_get_many():
+    session = shared_config.SharedConfigSession(FakeHAClient())
+    assert session.get_many() == {
+        'ha': {'network_test': 'dns'},
+        'he_local': {'vm_disk_id': 'a'},
+        'he_shared': {'vm_disk_id': 'b'},
+    }
+    assert session.get_many(config_type='he_local') == {
+        'he_local': {'vm_disk_id': 'a'},
+    }
+    assert session.get_many(['network_test']) == {
+        'ha': {'network_test': 'dns'},
+    }
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
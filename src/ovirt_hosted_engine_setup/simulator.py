@@ -0,0 +1,710 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Stand-in HA broker and VDSM for load and latency testing.
+A server simulates a cluster of 1 to 256 hosts and answers the calls of
+the HA broker and of VDSM over a local socket, with configurable
+latencies and injected failures, counting connections and requests.
+The hosted-engine commands are run against it with the HA and vdsm
+client modules replaced by thin clients of that socket, so that their
+latency, connection count and retries can be measured without a lab
+cluster. It is not installed, run it from the source tree with src in
+PYTHONPATH:
+
+    python -m ovirt_hosted_engine_setup.simulator serve --socket=<path>
+        [--hosts=N] [--broker-latency=ms] [--vdsm-latency=ms]
+        [--jitter=ms] [--broker-failure-rate=R] [--vdsm-failure-rate=R]
+        [--engine-host=ID] [--agent-delay=s] [--seed=N]
+    python -m ovirt_hosted_engine_setup.simulator run --socket=<path>
+        -- <hosted-engine command>...
+"""
+
+
+import argparse
+import json
+import os
+import random
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+import types
+
+
+MAX_HOSTS = 256
+VM_ID = '5d8d3b0e-3a5f-4e3c-9d3c-6c0d6c1f3f5e'
+ENGINE_FQDN = 'engine.sim.example.com'
+LOCAL_HOST_ID = 1
+# VDSM error codes
+NO_VM_ERROR = 1
+GENERAL_ERROR = 100
+
+SHARED_CONFIG = {
+    'he_local': {
+        'vm_disk_id': 'f1f5b1b4-0f9e-4a1d-8d7b-9b1e5b3c2a10',
+        'metadata_volume_UUID': 'c3b8fe4d-3b4f-4e8a-9f6b-7c2a1d0e5f21',
+    },
+    'he_shared': {
+        'conf_volume_UUID': '8a3b3f43-5f3e-4b8d-a7a2-0e2b7d9c4e11',
+        'fqdn': ENGINE_FQDN,
+        'vm_disk_id': 'f1f5b1b4-0f9e-4a1d-8d7b-9b1e5b3c2a10',
+    },
+    'ha': {
+        'local_maintenance': 'False',
+    },
+    'broker': {
+        'notify.state_transition': (
+            'maintenance|start|stop|migrate|up|down'
+        ),
+        'smtp-server': 'localhost',
+    },
+}
+
+
+class Cluster(object):
+    """
+    State of the simulated hosts. Maintenance changes are reported by
+    the agents only agent_delay seconds after they have been requested.
+    """
+
+    def __init__(self, hosts=3, engine_host=1, agent_delay=0.0,
+                 clock=time.monotonic):
+        if not 1 <= hosts <= MAX_HOSTS:
+            raise ValueError(
+                'The number of hosts must be between 1 and {m}'.format(
+                    m=MAX_HOSTS,
+                )
+            )
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.hosts = hosts
+        self.engine_host = min(max(engine_host, 1), hosts)
+        self.agent_delay = agent_delay
+        self.vm_status = 'Up'
+        self._global = (False, 0.0)
+        self._local = dict((h, (False, 0.0)) for h in range(1, hosts + 1))
+        self.shared_config = dict(
+            (c_type, dict(values))
+            for c_type, values in SHARED_CONFIG.items()
+        )
+
+    def _reported(self, flag):
+        value, since = flag
+        if self._clock() < since:
+            return not value
+        return value
+
+    def set_maintenance(self, mode, value, host_id=LOCAL_HOST_ID):
+        with self._lock:
+            flag = (value, self._clock() + self.agent_delay)
+            if mode == HAClient.MaintenanceMode.GLOBAL:
+                if self._global[0] != value:
+                    self._global = flag
+            elif self._local[host_id][0] != value:
+                self._local[host_id] = flag
+
+    def host_stats(self):
+        now = time.time()
+        stats = {}
+        with self._lock:
+            for host_id in range(1, self.hosts + 1):
+                maintenance = self._reported(self._local[host_id])
+                engine_here = host_id == self.engine_host
+                stats[host_id] = {
+                    'conf_on_shared_storage': True,
+                    'live-data': True,
+                    'extra': (
+                        'metadata_parse_version=1\n'
+                        'metadata_feature_version=1\n'
+                        'timestamp={ts}\n'
+                        'host-id={id}\n'
+                        'score={score}\n'
+                        'maintenance={m}\n'
+                        'state={state}\n'
+                    ).format(
+                        ts=int(now),
+                        id=host_id,
+                        score=0 if maintenance else 3400,
+                        m=maintenance,
+                        state=(
+                            'LocalMaintenance' if maintenance
+                            else 'EngineUp' if engine_here
+                            else 'EngineDown'
+                        ),
+                    ),
+                    'hostname': 'host{id}.sim.example.com'.format(
+                        id=host_id,
+                    ),
+                    'host-id': host_id,
+                    'engine-status': json.dumps(
+                        {
+                            'vm': 'up', 'health': 'good', 'detail': 'Up',
+                        } if engine_here else {
+                            'vm': 'down', 'health': 'bad',
+                            'detail': 'unknown',
+                            'reason': 'vm not running on this host',
+                        }
+                    ),
+                    'score': 0 if maintenance else 3400,
+                    'stopped': False,
+                    'maintenance': maintenance,
+                    'crc32': '{c:08x}'.format(c=host_id),
+                    'local_conf_timestamp': int(now),
+                    'host-ts': int(now),
+                }
+        return stats
+
+    def global_stats(self):
+        with self._lock:
+            return {
+                HAClient.GlobalMdFlags.MAINTENANCE: self._reported(
+                    self._global
+                ),
+            }
+
+
+class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """
+    JSON-RPC server of the simulated broker and VDSM: one request per
+    line, {"method": "<service>.<name>", "params": {...}}, where service
+    is broker or vdsm; sim.* methods control the simulator and are not
+    counted.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path, cluster, broker_latency=0.0, vdsm_latency=0.0,
+                 jitter=0.0, broker_failure_rate=0.0, vdsm_failure_rate=0.0,
+                 seed=None):
+        self.cluster = cluster
+        self.latency = {'broker': broker_latency, 'vdsm': vdsm_latency}
+        self.failure_rate = {
+            'broker': broker_failure_rate,
+            'vdsm': vdsm_failure_rate,
+        }
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.reset_stats()
+        if os.path.exists(path):
+            os.unlink(path)
+        socketserver.UnixStreamServer.__init__(self, path, _Handler)
+
+    def reset_stats(self):
+        with self._lock:
+            self._stats = {
+                'connections': {'broker': 0, 'vdsm': 0},
+                'requests': {},
+                'failures': {},
+            }
+
+    def stats(self):
+        with self._lock:
+            return json.loads(json.dumps(self._stats))
+
+    def _count(self, kind, key):
+        with self._lock:
+            self._stats[kind][key] = self._stats[kind].get(key, 0) + 1
+
+    def handle_call(self, method, params):
+        service, name = method.split('.', 1)
+        if service == 'sim':
+            return getattr(self, '_sim_' + name)(**params)
+        if service not in self.latency:
+            raise AttributeError(method)
+        self._count('requests', method)
+        with self._lock:
+            delay = self.latency[service] + self._random.uniform(
+                0, self.jitter
+            )
+            fail = self._random.random() < self.failure_rate[service]
+        time.sleep(delay)
+        if fail:
+            self._count('failures', method)
+            raise _InjectedFailure(method)
+        return getattr(self, '_{s}_{n}'.format(
+            s=service,
+            n=name.replace('.', '_'),
+        ))(**params)
+
+    def _sim_connect(self, service):
+        if service != 'sim':
+            self._count('connections', service)
+
+    def _sim_config(self):
+        return {
+            'vmid': VM_ID,
+            'host_id': str(LOCAL_HOST_ID),
+            'fqdn': ENGINE_FQDN,
+        }
+
+    def _sim_stats(self):
+        return self.stats()
+
+    def _sim_reset(self):
+        self.reset_stats()
+
+    def _broker_get_all_host_stats(self):
+        return self.cluster.host_stats()
+
+    def _broker_get_all_stats(self, mode):
+        stats = {}
+        if mode in (HAClient.StatModes.ALL, HAClient.StatModes.GLOBAL):
+            stats[0] = self.cluster.global_stats()
+        if mode in (HAClient.StatModes.ALL, HAClient.StatModes.HOST):
+            stats.update(self.cluster.host_stats())
+        return stats
+
+    def _broker_set_maintenance_mode(self, mode, value):
+        self.cluster.set_maintenance(mode, value)
+
+    def _broker_get_all_config_keys(self, config_type):
+        return dict(
+            (c_type, sorted(values))
+            for c_type, values in self.cluster.shared_config.items()
+            if not config_type or c_type == config_type
+        )
+
+    def _find_config(self, key, config_type):
+        types = [
+            t for t, values in self.cluster.shared_config.items()
+            if key in values and (not config_type or t == config_type)
+        ]
+        if len(types) != 1:
+            raise KeyError(key)
+        return types[0]
+
+    def _broker_get_shared_config(self, key, config_type):
+        c_type = self._find_config(key, config_type)
+        return [self.cluster.shared_config[c_type][key], c_type]
+
+    def _broker_set_shared_config(self, key, value, config_type):
+        c_type = self._find_config(key, config_type)
+        self.cluster.shared_config[c_type][key] = value
+
+    def _broker_connect_storage_server(self, timeout):
+        pass
+
+    def _broker_disconnect_storage_server(self, timeout):
+        pass
+
+    def _broker_reset_lockspace(self, force):
+        pass
+
+    def _vdsm_VM_getStats(self, vmID):
+        if (
+            vmID != VM_ID or
+            self.cluster.engine_host != LOCAL_HOST_ID or
+            self.cluster.vm_status == 'Down'
+        ):
+            raise _VdsmError(NO_VM_ERROR, 'Virtual machine does not exist')
+        return [{
+            'vmId': vmID,
+            'status': self.cluster.vm_status,
+            'displayInfo': [{
+                'type': 'vnc',
+                'port': '5900',
+                'ipAddress': '127.0.0.1',
+            }],
+        }]
+
+    def _vdsm_VM_create(self, vmID, vmParams):
+        self.cluster.engine_host = LOCAL_HOST_ID
+        self.cluster.vm_status = 'WaitForLaunch'
+        return {'vmId': vmID, 'status': 'WaitForLaunch'}
+
+    def _vdsm_VM_destroy(self, vmID):
+        self._vdsm_VM_getStats(vmID)
+        self.cluster.vm_status = 'Down'
+
+    def _vdsm_VM_shutdown(self, vmID, delay=None, message=None):
+        self._vdsm_VM_getStats(vmID)
+        self.cluster.vm_status = 'Down'
+
+    def _vdsm_VM_updateDevice(self, vmID, params):
+        self._vdsm_VM_getStats(vmID)
+        return {'vmDevices': []}
+
+
+class _InjectedFailure(Exception):
+    pass
+
+
+class _VdsmError(Exception):
+
+    def __init__(self, code, message):
+        super(_VdsmError, self).__init__(message)
+        self.code = code
+
+
+class _Handler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        for line in self.rfile:
+            request = json.loads(line.decode('utf-8'))
+            method = request['method']
+            try:
+                response = {
+                    'result': self.server.handle_call(
+                        method,
+                        request.get('params') or {},
+                    ),
+                }
+            except _InjectedFailure:
+                response = {'error': {
+                    'type': 'disconnect',
+                    'code': GENERAL_ERROR,
+                    'message': 'Injected failure',
+                }}
+            except _VdsmError as e:
+                response = {'error': {
+                    'type': 'server',
+                    'code': e.code,
+                    'message': str(e),
+                }}
+            except KeyError as e:
+                response = {'error': {
+                    'type': 'key',
+                    'code': GENERAL_ERROR,
+                    'message': str(e),
+                }}
+            except Exception as e:
+                response = {'error': {
+                    'type': 'server',
+                    'code': GENERAL_ERROR,
+                    'message': str(e),
+                }}
+            self.wfile.write(
+                json.dumps(response, default=str).encode('utf-8') + b'\n'
+            )
+
+
+# Client side, replacing the HA and vdsm client modules in the process
+# running the commands
+
+_socket_path = None
+
+
+def use(path):
+    """Send the calls of the client classes to the server at path."""
+    global _socket_path
+    _socket_path = path
+
+
+class _Connection(object):
+
+    def __init__(self, service, path=None):
+        self._service = service
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._sock.connect(path or _socket_path)
+        self._file = self._sock.makefile('rwb')
+        self.call('sim.connect', service=service)
+
+    def call(self, method, **params):
+        self._file.write(
+            json.dumps({'method': method, 'params': params}).encode('utf-8')
+            + b'\n'
+        )
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionResetError('Connection closed by the server')
+        response = json.loads(line.decode('utf-8'))
+        error = response.get('error')
+        if error is None:
+            return response['result']
+        if error['type'] == 'disconnect':
+            self.close()
+            raise ConnectionResetError(error['message'])
+        if error['type'] == 'key':
+            raise KeyError(error['message'])
+        if self._service == 'vdsm':
+            raise ServerError(method, error['code'], error['message'])
+        raise RuntimeError(error['message'])
+
+    def close(self):
+        self._file.close()
+        self._sock.close()
+
+
+def call(method, path=None, **params):
+    """Call method on a connection of its own."""
+    service = method.split('.', 1)[0]
+    connection = _Connection(service, path)
+    try:
+        return connection.call(method, **params)
+    finally:
+        connection.close()
+
+
+class BrokerConnectionError(Exception):
+    pass
+
+
+class DisconnectionError(Exception):
+    pass
+
+
+class ServerError(Exception):
+
+    def __init__(self, method, code, message):
+        super(ServerError, self).__init__(
+            'Command {m} failed: (code={code}, message={message})'.format(
+                m=method,
+                code=code,
+                message=message,
+            )
+        )
+        self.code = code
+        self.message = message
+
+
+class HAClient(object):
+    """The HA client, one broker connection per call."""
+
+    class MaintenanceMode(object):
+        LOCAL = 'local'
+        GLOBAL = 'global'
+        LOCAL_MANUAL = 'local_manual'
+
+    class StatModes(object):
+        ALL = 'all'
+        HOST = 'host'
+        GLOBAL = 'global'
+
+    class GlobalMdFlags(object):
+        MAINTENANCE = 'maintenance'
+
+    def _call(self, name, **params):
+        return call('broker.' + name, **params)
+
+    def get_all_host_stats(self):
+        return dict(
+            (int(k), v) for k, v in self._call('get_all_host_stats').items()
+        )
+
+    def get_all_stats(self, mode=StatModes.ALL):
+        return dict(
+            (int(k), v)
+            for k, v in self._call('get_all_stats', mode=mode).items()
+        )
+
+    def set_maintenance_mode(self, mode, value):
+        self._call('set_maintenance_mode', mode=mode, value=value)
+
+    def get_all_config_keys(self, config_type):
+        return self._call('get_all_config_keys', config_type=config_type)
+
+    def get_shared_config(self, key, config_type):
+        return tuple(
+            self._call('get_shared_config', key=key, config_type=config_type)
+        )
+
+    def set_shared_config(self, key, value, config_type):
+        self._call(
+            'set_shared_config',
+            key=key,
+            value=value,
+            config_type=config_type,
+        )
+
+    def connect_storage_server(self, timeout=None):
+        self._call('connect_storage_server', timeout=timeout)
+
+    def disconnect_storage_server(self, timeout=None):
+        self._call('disconnect_storage_server', timeout=timeout)
+
+    def reset_lockspace(self, force=False):
+        self._call('reset_lockspace', force=force)
+
+
+class _VdsmNamespace(object):
+
+    def __init__(self, connection, name):
+        self._connection = connection
+        self._name = name
+
+    def __getattr__(self, verb):
+        method = 'vdsm.{ns}.{verb}'.format(ns=self._name, verb=verb)
+        return lambda **params: self._connection.call(method, **params)
+
+
+class _VdsmClient(object):
+    """The vdsm JSON-RPC client, a single connection per process."""
+
+    def __init__(self):
+        self._connection = _Connection('vdsm')
+
+    def __getattr__(self, name):
+        return _VdsmNamespace(self._connection, name)
+
+
+_vdsm_client = None
+
+
+def connect_vdsm_json_rpc():
+    global _vdsm_client
+    if _vdsm_client is None:
+        _vdsm_client = _VdsmClient()
+    return _vdsm_client
+
+
+class _Config(object):
+
+    values = {}
+
+    def get(self, section, key):
+        return self.values[key]
+
+
+def install(path):
+    """
+    Replace the HA and vdsm client modules with clients of the server at
+    path and return the hosted-engine configuration of the simulated
+    cluster.
+    """
+    use(path)
+    config = call('sim.config')
+    _Config.values = config
+
+    def _module(name, **attrs):
+        module = types.ModuleType(name)
+        module.__dict__.update(attrs)
+        sys.modules[name] = module
+        parent, __, child = name.rpartition('.')
+        if parent:
+            setattr(sys.modules[parent], child, module)
+        return module
+
+    _module('ovirt_hosted_engine_ha')
+    _module('ovirt_hosted_engine_ha.client')
+    _module('ovirt_hosted_engine_ha.client.client', HAClient=HAClient)
+    _module('ovirt_hosted_engine_ha.lib')
+    _module(
+        'ovirt_hosted_engine_ha.lib.exceptions',
+        BrokerConnectionError=BrokerConnectionError,
+        DisconnectionError=DisconnectionError,
+    )
+    _module(
+        'ovirt_hosted_engine_ha.lib.util',
+        connect_vdsm_json_rpc=connect_vdsm_json_rpc,
+    )
+    _module('ovirt_hosted_engine_ha.env')
+    _module(
+        'ovirt_hosted_engine_ha.env.config',
+        Config=_Config,
+        ENGINE='engine',
+    )
+    _module(
+        'ovirt_hosted_engine_ha.env.config_constants',
+        HEVMID='vmid',
+        HOST_ID='host_id',
+    )
+    _module('vdsm')
+    _module('vdsm.client', ServerError=ServerError)
+    return config
+
+
+def run(path, args):
+    """Run the hosted-engine command args against the server at path."""
+    config = install(path)
+    from ovirt_hosted_engine_setup import cli
+    with tempfile.NamedTemporaryFile(suffix='.conf') as vm_conf:
+        config['conf'] = vm_conf.name
+        return cli.Cli(prog='hosted-engine', config=config).dispatch(args)
+
+
+def serve(args):
+    server = Server(
+        args.socket,
+        Cluster(
+            hosts=args.hosts,
+            engine_host=args.engine_host,
+            agent_delay=args.agent_delay,
+        ),
+        broker_latency=args.broker_latency / 1000.0,
+        vdsm_latency=args.vdsm_latency / 1000.0,
+        jitter=args.jitter / 1000.0,
+        broker_failure_rate=args.broker_failure_rate,
+        vdsm_failure_rate=args.vdsm_failure_rate,
+        seed=args.seed,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.unlink(args.socket)
+    return 0
+
+
+def add_cluster_arguments(parser):
+    parser.add_argument('--hosts', type=int, default=3)
+    parser.add_argument('--engine-host', type=int, default=2)
+    parser.add_argument('--agent-delay', type=float, default=0.0)
+    parser.add_argument('--broker-latency', type=float, default=0.0)
+    parser.add_argument('--vdsm-latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--broker-failure-rate', type=float, default=0.0)
+    parser.add_argument('--vdsm-failure-rate', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=None)
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(
+        prog='python -m ovirt_hosted_engine_setup.simulator',
+        description='Simulated HA broker and VDSM',
+    )
+    subparsers = parser.add_subparsers(dest='action')
+    serve_parser = subparsers.add_parser('serve')
+    serve_parser.add_argument('--socket', required=True)
+    add_cluster_arguments(serve_parser)
+    run_parser = subparsers.add_parser('run')
+    run_parser.add_argument('--socket', required=True)
+    run_parser.add_argument('command', nargs=argparse.REMAINDER)
+    args = parser.parse_args(argv)
+    if args.action == 'serve':
+        if not 1 <= args.hosts <= MAX_HOSTS:
+            parser.error(
+                'the number of hosts must be between 1 and {m}'.format(
+                    m=MAX_HOSTS,
+                )
+            )
+        return serve(args)
+    if args.action == 'run':
+        command = args.command
+        if command[:1] == ['--']:
+            command = command[1:]
+        if not command:
+            parser.error('a hosted-engine command is required')
+        return run(args.socket, command)
+    parser.print_help()
+    return 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,94 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import os
+import threading
+
+import pytest
+
+from . import simulator
+
+
+@pytest.fixture
+def server(tmp_path):
+    now = [0.0]
+    servers = []
+
+    def _start(hosts=3, agent_delay=0.0, **kwargs):
+        cluster = simulator.Cluster(
+            hosts=hosts,
+            agent_delay=agent_delay,
+            clock=lambda: now[0],
+        )
+        s = simulator.Server(str(tmp_path / 'sim.socket'), cluster, **kwargs)
+        thread = threading.Thread(target=s.serve_forever)
+        thread.daemon = True
+        thread.start()
+        servers.append(s)
+        simulator.use(s.server_address)
+        return s
+
+    _start.now = now
+    yield _start
+    for s in servers:
+        s.shutdown()
+        s.server_close()
+    simulator.use(None)
+    simulator._vdsm_client = None
+
+
+def test_cluster_size():
+    for hosts in (0, simulator.MAX_HOSTS + 1):
+        with pytest.raises(ValueError):
+            simulator.Cluster(hosts=hosts)
+
+
+def test_broker_calls(server):
+    s = server(hosts=16, agent_delay=5)
+    ha_cli = simulator.HAClient()
+    stats = ha_cli.get_all_host_stats()
+    assert sorted(stats) == list(range(1, 17))
+    assert '"vm": "up"' in stats[1]['engine-status']
+    ha_cli.set_maintenance_mode(ha_cli.MaintenanceMode.GLOBAL, True)
+    global_stats = ha_cli.get_all_stats(ha_cli.StatModes.GLOBAL)[0]
+    assert not global_stats[ha_cli.GlobalMdFlags.MAINTENANCE]
+    server.now[0] += 5
+    global_stats = ha_cli.get_all_stats(ha_cli.StatModes.GLOBAL)[0]
+    assert global_stats[ha_cli.GlobalMdFlags.MAINTENANCE]
+    assert ha_cli.get_shared_config('fqdn', None) == (
+        simulator.ENGINE_FQDN,
+        'he_shared',
+    )
+    with pytest.raises(KeyError):
+        ha_cli.get_shared_config('vm_disk_id', None)
+    assert s.stats()['connections'] == {'broker': 6, 'vdsm': 0}
+
+
+def test_failures(server):
+    s = server(broker_failure_rate=1.0, seed=1)
+    with pytest.raises(OSError):
+        simulator.HAClient().get_all_host_stats()
+    vdsm = simulator.connect_vdsm_json_rpc()
+    with pytest.raises(simulator.ServerError) as e:
+        vdsm.VM.getStats(vmID='unknown')
+    assert e.value.code == simulator.NO_VM_ERROR
+    assert s.stats()['failures'] == {'broker.get_all_host_stats': 1}
+    assert os.path.exists(s.server_address)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
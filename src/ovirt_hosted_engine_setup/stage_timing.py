@@ -0,0 +1,197 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""Stage timing"""
+
+
+import contextlib
+import functools
+import json
+import os
+import resource
+import threading
+import time
+
+
+KIND_EVENT = 'event'
+KIND_ANSIBLE = 'ansible'
+KIND_EXECUTE = 'execute'
+
+
+def _children_cpu():
+    ru = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return ru.ru_utime + ru.ru_stime
+
+
+class StageTimer(object):
+    """
+    Record wall, CPU and wait time of the deploy steps.
+    Each entry is made of:
+        stage, plugin, method, kind: what has been measured, a missing
+            stage is inherited from the enclosing entry
+        parent: the index of the enclosing entry, if any
+        thread: the name of the thread running the step
+        start: epoch time of the beginning
+        wall: elapsed monotonic time
+        cpu: CPU time of this process
+        children_cpu: CPU time of the terminated child processes
+        wait: the remaining time, spent waiting for I/O, network,
+            the engine or the user
+    CPU time is accounted per process, entries measured concurrently
+    from different threads overlap.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._entries = []
+
+    def _stack(self):
+        if not hasattr(self._local, 'stack'):
+            self._local.stack = []
+        return self._local.stack
+
+    def current_stage(self):
+        """Return the stage being measured by the calling thread."""
+        stack = self._stack()
+        return stack[-1]['stage'] if stack else None
+
+    @contextlib.contextmanager
+    def measure(self, stage, plugin, method, kind=KIND_EVENT):
+        stack = self._stack()
+        if stage is None and stack:
+            stage = stack[-1]['stage']
+        entry = {
+            'stage': stage,
+            'plugin': plugin,
+            'method': method,
+            'kind': kind,
+            'parent': stack[-1]['index'] if stack else None,
+            'thread': threading.current_thread().name,
+            'start': time.time(),
+        }
+        with self._lock:
+            entry['index'] = len(self._entries)
+            self._entries.append(entry)
+        stack.append(entry)
+        wall = time.monotonic()
+        cpu = time.process_time()
+        children_cpu = _children_cpu()
+        try:
+            yield entry
+        finally:
+            stack.pop()
+            wall = time.monotonic() - wall
+            cpu = time.process_time() - cpu
+            children_cpu = _children_cpu() - children_cpu
+            with self._lock:
+                entry.update({
+                    'wall': wall,
+                    'cpu': cpu,
+                    'children_cpu': children_cpu,
+                    'wait': max(0.0, wall - cpu - children_cpu),
+                })
+
+    def wrap(self, f, stage, plugin, method, kind=KIND_EVENT):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            with self.measure(stage, plugin, method, kind):
+                return f(*args, **kwargs)
+        return wrapper
+
+    def instrument(self, obj, name='execute'):
+        """
+        Measure each call of obj.<name>(args, ...), the otopi way to run
+        a child process, naming the entry after the executable.
+        """
+        f = getattr(obj, name, None)
+        if f is None or getattr(f, '_stage_timed', False):
+            return
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            cmd = args[0] if args else kwargs.get('args')
+            with self.measure(
+                None,
+                type(obj).__module__,
+                os.path.basename(cmd[0]) if cmd else name,
+                KIND_EXECUTE,
+            ):
+                return f(*args, **kwargs)
+        wrapper._stage_timed = True
+        setattr(obj, name, wrapper)
+
+    def entries(self):
+        """Return the completed entries, in starting order."""
+        with self._lock:
+            return [dict(e) for e in self._entries if 'wall' in e]
+
+    def top(self, n=10, kind=None):
+        """Return the n slowest completed entries."""
+        return sorted(
+            [
+                e for e in self.entries()
+                if kind is None or e['kind'] == kind
+            ],
+            key=lambda e: e['wall'],
+            reverse=True,
+        )[:n]
+
+    def to_dict(self):
+        entries = self.entries()
+        totals = {}
+        for e in entries:
+            if e['parent'] is not None:
+                continue
+            total = totals.setdefault(
+                e['stage'],
+                {'wall': 0.0, 'cpu': 0.0, 'children_cpu': 0.0, 'wait': 0.0},
+            )
+            for k in total:
+                total[k] += e[k]
+        return {
+            'entries': entries,
+            'stages': totals,
+        }
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=4)
+
+    def reset(self):
+        with self._lock:
+            self._entries = []
+
+
+_timer = StageTimer()
+
+
+def timer():
+    """Return the process wide timer."""
+    return _timer
+
+
+def timing_file_name(log_file_name):
+    return '{base}-timing.json'.format(
+        base=os.path.splitext(log_file_name)[0],
+    )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
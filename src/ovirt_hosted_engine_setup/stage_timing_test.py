@@ -0,0 +1,61 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import time
+
+from . import stage_timing
+
+
+def test_nested_entries():
+    timer = stage_timing.StageTimer()
+    with timer.measure('STAGE_MISC', 'plugin', 'outer'):
+        with timer.measure(
+            None,
+            'playbook.yml',
+            'tag',
+            stage_timing.KIND_ANSIBLE,
+        ):
+            time.sleep(0.05)
+    outer, inner = timer.entries()
+    assert inner['parent'] == outer['index']
+    assert inner['stage'] == 'STAGE_MISC'
+    assert outer['wall'] >= inner['wall'] >= 0.05
+    assert inner['wait'] > 0.04
+    assert timer.top(1, kind=stage_timing.KIND_ANSIBLE) == [inner]
+    totals = timer.to_dict()['stages']
+    assert list(totals) == ['STAGE_MISC']
+    assert totals['STAGE_MISC']['wall'] == outer['wall']
+
+
+def test_wrap_records_failures():
+    timer = stage_timing.StageTimer()
+
+    def fail():
+        raise RuntimeError('failed')
+
+    try:
+        timer.wrap(fail, 'STAGE_CLOSEUP', 'plugin', 'fail')()
+    except RuntimeError:
+        pass
+    entries = timer.entries()
+    assert len(entries) == 1
+    assert entries[0]['method'] == 'fail'
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
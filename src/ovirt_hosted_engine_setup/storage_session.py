@@ -0,0 +1,112 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Storage session cache.
+While the storage domain is being created, the results of the sub-steps
+that succeeded (iSCSI discovery and login, the device listing) are kept
+for the following attempts, so that an attempt after a failure redoes
+only the failed sub-step. The time spent by each attempt on each
+sub-step is recorded as well.
+"""
+
+
+import gettext
+import json
+import time
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+class StorageSession(object):
+
+    def __init__(self, clock=time.monotonic):
+        self._clock = clock
+        self._results = {}
+        self.attempts = []
+
+    @staticmethod
+    def _key(name, inputs):
+        # Kept in memory only: passwords are part of the key on purpose,
+        # a corrected password must not hit a failed login
+        return name, json.dumps(inputs, sort_keys=True, default=str)
+
+    def start_attempt(self):
+        self.attempts.append([])
+        return len(self.attempts)
+
+    def _record(self, name, start, outcome):
+        if not self.attempts:
+            self.start_attempt()
+        self.attempts[-1].append(
+            (name, self._clock() - start, outcome)
+        )
+
+    def step(self, name, inputs, run, cache=False):
+        """
+        Return run(), recording its duration, or with cache its result
+        of a previous attempt with the same inputs, if it succeeded.
+        Failures are never cached.
+        """
+        key = self._key(name, inputs)
+        start = self._clock()
+        if cache and key in self._results:
+            self._record(name, start, 'cached')
+            return self._results[key]
+        try:
+            result = run()
+        except Exception:
+            self._record(name, start, 'failed')
+            raise
+        self._record(name, start, 'done')
+        if cache:
+            self._results[key] = result
+        return result
+
+    def invalidate(self, name=None):
+        for key in list(self._results):
+            if name is None or key[0] == name:
+                del self._results[key]
+
+    def report(self, attempt=None):
+        """Return a line per attempt, or only for attempt (1 based)."""
+        numbers = (
+            range(1, len(self.attempts) + 1) if attempt is None
+            else (attempt,)
+        )
+        return '\n'.join(
+            _('Attempt {n}: {steps}').format(
+                n=n,
+                steps=', '.join(
+                    '{name} {secs:.1f}s ({outcome})'.format(
+                        name=name,
+                        secs=secs,
+                        outcome=outcome,
+                    )
+                    for name, secs, outcome in self.attempts[n - 1]
+                ) or _('no storage sub-step'),
+            )
+            for n in numbers
+        )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,55 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import pytest
+
+from . import storage_session
+
+
+def test_retry_redoes_only_failed_steps():
+    now = [0.0]
+    calls = []
+
+    def _step(name, seconds, fail=False):
+        def _run():
+            calls.append(name)
+            now[0] += seconds
+            if fail:
+                raise RuntimeError(name)
+            return name
+        return _run
+
+    session = storage_session.StorageSession(clock=lambda: now[0])
+    session.start_attempt()
+    session.step('discover', {'portal': 'p'}, _step('discover', 2), cache=True)
+    with pytest.raises(RuntimeError):
+        session.step('create', {}, _step('create', 30, True))
+    session.start_attempt()
+    assert session.step(
+        'discover', {'portal': 'p'}, _step('discover', 2), cache=True
+    ) == 'discover'
+    session.step('create', {}, _step('create', 25))
+    assert calls == ['discover', 'create', 'create']
+    assert session.report(2) == (
+        'Attempt 2: discover 0.0s (cached), create 25.0s (done)'
+    )
+    session.step('discover', {'portal': 'q'}, _step('discover', 1), cache=True)
+    assert calls[-1] == 'discover'
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
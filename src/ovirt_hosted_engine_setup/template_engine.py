@@ -0,0 +1,88 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Template engine for the templates/*.in files.
+Templates are compiled once into literal and @PLACEHOLDER@ segments,
+cached by path and modification time, and rendered in a single pass.
+Substituted values are never substituted again.
+"""
+
+
+import os
+import re
+import threading
+
+
+_PLACEHOLDER_RE = re.compile('(@[A-Za-z0-9_]+@)')
+
+
+class Template(object):
+
+    def __init__(self, content):
+        self._content = content
+        # literals at even indexes, placeholders at odd ones
+        self._segments = _PLACEHOLDER_RE.split(content)
+
+    def render(self, subst):
+        subst = dict(
+            (str(k), str(v)) for k, v in subst.items() if str(k)
+        )
+        if not subst:
+            return self._content
+        if all(_PLACEHOLDER_RE.fullmatch(k) for k in subst):
+            parts = list(self._segments)
+            for i in range(1, len(parts), 2):
+                parts[i] = subst.get(parts[i], parts[i])
+            return ''.join(parts)
+        # Arbitrary keys: match all of them at once, longest first
+        pattern = re.compile(
+            '|'.join(
+                re.escape(k)
+                for k in sorted(subst, key=len, reverse=True)
+            )
+        )
+        return pattern.sub(lambda m: subst[m.group(0)], self._content)
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def load(path):
+    """Return the compiled template, reading path only if it changed."""
+    st = os.stat(path)
+    key = (st.st_mtime, st.st_size)
+    with _cache_lock:
+        cached = _cache.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+    with open(path, 'r') as f:
+        template = Template(f.read())
+    with _cache_lock:
+        _cache[path] = (key, template)
+    return template
+
+
+def render(path, subst):
+    return load(path).render(subst)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
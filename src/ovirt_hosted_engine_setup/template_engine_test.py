@@ -0,0 +1,77 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import os
+
+from . import template_engine
+
+TEMPLATE = (
+    'vmId=@VM_UUID@\n'
+    'memSize=@MEM_SIZE@\n'
+    'devices={index:2,iface:ide,address:{ controller:0, target:0,'
+    'unit:0, bus:1, type:drive},specParams:{},readonly:true,'
+    'deviceId:@CDROM_UUID@,path:@CDROM@,device:cdrom,shared:false,'
+    'type:disk}\n'
+    'vmName=@NAME@ # @NAME@\n'
+    'email=root@localhost\n'
+    'unknown=@UNKNOWN@\n'
+)
+
+
+def _replace(content, subst):
+    for k, v in subst.items():
+        content = content.replace(str(k), str(v))
+    return content
+
+
+def test_render_matches_replace(tmpdir):
+    path = os.path.join(str(tmpdir), 'vm.conf.in')
+    with open(path, 'w') as f:
+        f.write(TEMPLATE)
+    for subst in (
+        {
+            '@VM_UUID@': 'a7b4cc3c-2c3b-4b27-9d41-1c0a2d7b5a13',
+            '@MEM_SIZE@': 4096,
+            '@CDROM_UUID@': 'a2c87a6b-6a4d-46a4-b1c6-6e6b1a3f1c8e',
+            '@CDROM@': '/dev/null',
+            '@NAME@': 'HostedEngine',
+        },
+        {'@localhost': '@example.com', 'vmName': 'name'},
+        {},
+    ):
+        assert template_engine.render(path, subst) == _replace(
+            TEMPLATE,
+            subst,
+        )
+
+
+def test_cache_follows_changes(tmpdir):
+    path = os.path.join(str(tmpdir), 'hosted-engine.conf.in')
+    with open(path, 'w') as f:
+        f.write('fqdn=@FQDN@\n')
+    assert template_engine.load(path) is template_engine.load(path)
+    with open(path, 'w') as f:
+        f.write('fqdn=@FQDN@\nhost_id=@HOST_ID@\n')
+    assert template_engine.render(
+        path,
+        {'@FQDN@': 'engine.example.com', '@HOST_ID@': 1},
+    ) == 'fqdn=engine.example.com\nhost_id=1\n'
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,257 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Export a deploy as a trace-event JSON, loadable by chrome://tracing
+and Perfetto: otopi events, ansible runs, ansible tasks and child
+processes become nested spans, host I/O counters become counter tracks.
+"""
+
+
+import json
+import os
+import threading
+import time
+
+
+PROC_DISKSTATS = '/proc/diskstats'
+PROC_NET_DEV = '/proc/net/dev'
+SYS_BLOCK = '/sys/block'
+SECTOR_SIZE = 512
+MB = 1024 * 1024
+
+
+def _us(seconds):
+    return int(round(seconds * 1000000))
+
+
+def read_diskstats(path=PROC_DISKSTATS, devices=None):
+    """
+    Return the bytes read and written by the whole block devices,
+    partitions are skipped not to count them twice.
+    """
+    read = written = 0
+    with open(path) as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) < 10:
+                continue
+            if devices is not None and fields[2] not in devices:
+                continue
+            read += int(fields[5]) * SECTOR_SIZE
+            written += int(fields[9]) * SECTOR_SIZE
+    return read, written
+
+
+def read_net_dev(path=PROC_NET_DEV):
+    """Return the bytes received and sent by all the interfaces but lo."""
+    rx = tx = 0
+    with open(path) as f:
+        for line in f.readlines()[2:]:
+            name, sep, data = line.partition(':')
+            if not sep or name.strip() == 'lo':
+                continue
+            fields = data.split()
+            rx += int(fields[0])
+            tx += int(fields[8])
+    return rx, tx
+
+
+class IOSampler(threading.Thread):
+    """
+    Periodically sample the host disk and network counters.
+    Counters not available on this host are silently skipped.
+    """
+
+    def __init__(self, interval=1.0):
+        super(IOSampler, self).__init__(name='trace-io-sampler')
+        self.daemon = True
+        self._interval = interval
+        self._stop_event = threading.Event()
+        self._devices = None
+        if os.path.isdir(SYS_BLOCK):
+            self._devices = set(os.listdir(SYS_BLOCK))
+        self.samples = []
+
+    def sample(self):
+        sample = {'ts': time.time()}
+        try:
+            sample['disk'] = read_diskstats(devices=self._devices)
+        except (IOError, OSError, ValueError):
+            pass
+        try:
+            sample['net'] = read_net_dev()
+        except (IOError, OSError, ValueError, IndexError):
+            pass
+        self.samples.append(sample)
+
+    def run(self):
+        while not self._stop_event.is_set():
+            self.sample()
+            self._stop_event.wait(self._interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self.sample()
+
+
+def _span(name, cat, start, duration, pid, tid, args=None):
+    event = {
+        'name': name,
+        'cat': cat,
+        'ph': 'X',
+        'ts': _us(start),
+        'dur': max(_us(duration), 1),
+        'pid': pid,
+        'tid': tid,
+    }
+    if args:
+        event['args'] = args
+    return event
+
+
+def _metadata(name, pid, tid, value):
+    return {
+        'name': name,
+        'ph': 'M',
+        'pid': pid,
+        'tid': tid,
+        'args': {'name': value},
+    }
+
+
+def load_ansible_profile(log, suffix):
+    try:
+        with open(os.path.splitext(log)[0] + suffix) as f:
+            return json.load(f)
+    except (IOError, OSError, ValueError):
+        return None
+
+
+def timing_events(entries, pid, profile_suffix):
+    """
+    Convert the stage timing entries, and the ansible task profiles of
+    the ansible runs, to spans.
+    """
+    events = []
+    tids = {}
+    for e in entries:
+        tid = tids.setdefault(e['thread'], len(tids) + 1)
+        if e['kind'] == 'event':
+            name = '{p}.{m}'.format(p=e['plugin'], m=e['method'])
+        else:
+            name = e['method']
+        events.append(
+            _span(
+                name=name,
+                cat=e['kind'],
+                start=e['start'],
+                duration=e['wall'],
+                pid=pid,
+                tid=tid,
+                args={
+                    'stage': e['stage'],
+                    'plugin': e['plugin'],
+                    'cpu_s': round(e['cpu'], 3),
+                    'children_cpu_s': round(e['children_cpu'], 3),
+                    'wait_s': round(e['wait'], 3),
+                },
+            )
+        )
+        profile = None
+        if e.get('log'):
+            profile = load_ansible_profile(e['log'], profile_suffix)
+        for task in (profile or {}).get('tasks', []):
+            events.append(
+                _span(
+                    name=task['task'],
+                    cat='ansible_task',
+                    start=task['start_time'],
+                    duration=task['duration_ms'] / 1000.0,
+                    pid=pid,
+                    tid=tid,
+                    args={
+                        'action': task['action'],
+                        'host': task['host'],
+                        'status': task['status'],
+                        'children_cpu_ms': task['children_cpu_ms'],
+                    },
+                )
+            )
+    for thread, tid in tids.items():
+        events.append(_metadata('thread_name', pid, tid, thread))
+    return events
+
+
+def counter_events(samples, pid):
+    """Convert consecutive counter samples to MB/s counter events."""
+    events = []
+    for prev, cur in zip(samples, samples[1:]):
+        elapsed = cur['ts'] - prev['ts']
+        if elapsed <= 0:
+            continue
+        for counter, keys in (
+            ('disk', ('read', 'write')),
+            ('net', ('rx', 'tx')),
+        ):
+            if counter not in prev or counter not in cur:
+                continue
+            events.append({
+                'name': '{c} MB/s'.format(c=counter),
+                'ph': 'C',
+                'ts': _us(cur['ts']),
+                'pid': pid,
+                'args': dict(
+                    (
+                        key,
+                        round((cur[counter][i] - prev[counter][i]) /
+                              elapsed / MB, 3),
+                    )
+                    for i, key in enumerate(keys)
+                ),
+            })
+    return events
+
+
+def build_trace(entries, samples, profile_suffix, name):
+    pid = os.getpid()
+    events = [_metadata('process_name', pid, 0, name)]
+    events.extend(timing_events(entries, pid, profile_suffix))
+    events.extend(counter_events(samples, pid))
+    return {
+        'traceEvents': events,
+        'displayTimeUnit': 'ms',
+    }
+
+
+def trace_file_name(log_file_name):
+    return '{base}-trace.json'.format(
+        base=os.path.splitext(log_file_name)[0],
+    )
+
+
+def write_trace(path, entries, samples, profile_suffix, name):
+    with open(path, 'w') as f:
+        json.dump(build_trace(entries, samples, profile_suffix, name), f)
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,122 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+import json
+
+from . import stage_timing
+from . import trace_export
+
+
+def test_timing_events_nest_ansible_tasks(tmpdir):
+    log = tmpdir.join('ansible-initial_clean.log')
+    tmpdir.join('ansible-initial_clean.profile.json').write(json.dumps({
+        'tasks': [{
+            'task': 'Stop libvirt',
+            'action': 'service',
+            'host': 'localhost',
+            'status': 'OK',
+            'start_time': 100.5,
+            'duration_ms': 250,
+            'children_cpu_ms': 12,
+        }],
+    }))
+    timer = stage_timing.StageTimer()
+    with timer.measure('STAGE_MISC', 'plugin', 'outer'):
+        with timer.measure(
+            None,
+            'playbook.yml',
+            'initial_clean',
+            stage_timing.KIND_ANSIBLE,
+        ) as entry:
+            entry['log'] = str(log)
+    events = trace_export.timing_events(
+        timer.entries(),
+        pid=1,
+        profile_suffix='.profile.json',
+    )
+    spans = [e for e in events if e['ph'] == 'X']
+    assert [s['name'] for s in spans] == [
+        'plugin.outer',
+        'initial_clean',
+        'Stop libvirt',
+    ]
+    task = spans[2]
+    assert task['cat'] == 'ansible_task'
+    assert task['ts'] == 100500000
+    assert task['dur'] == 250000
+    assert task['tid'] == spans[1]['tid'] == spans[0]['tid']
+    assert all(s['dur'] >= 1 for s in spans)
+    assert [e['name'] for e in events if e['ph'] == 'M'] == ['thread_name']
+
+
+def test_counter_events():
+    mb = trace_export.MB
+    samples = [
+        {'ts': 10.0, 'disk': (0, 0), 'net': (0, 0)},
+        {'ts': 12.0, 'disk': (4 * mb, 2 * mb)},
+        {'ts': 12.0, 'disk': (8 * mb, 2 * mb)},
+    ]
+    events = trace_export.counter_events(samples, pid=1)
+    assert events == [{
+        'name': 'disk MB/s',
+        'ph': 'C',
+        'ts': 12000000,
+        'pid': 1,
+        'args': {'read': 2.0, 'write': 1.0},
+    }]
+
+
+def test_read_counters(tmpdir):
+    diskstats = tmpdir.join('diskstats')
+    diskstats.write(
+        '   8       0 sda 10 0 8 0 20 0 16 0 0 0 0\n'
+        '   8       1 sda1 10 0 8 0 20 0 16 0 0 0 0\n'
+    )
+    assert trace_export.read_diskstats(
+        str(diskstats),
+        devices={'sda'},
+    ) == (8 * 512, 16 * 512)
+    net_dev = tmpdir.join('net_dev')
+    net_dev.write(
+        'Inter-|   Receive\n'
+        ' face |bytes packets\n'
+        '    lo: 500 5 0 0 0 0 0 0 500 5 0 0 0 0 0 0\n'
+        '  eth0: 100 1 0 0 0 0 0 0 300 3 0 0 0 0 0 0\n'
+    )
+    assert trace_export.read_net_dev(str(net_dev)) == (100, 300)
+
+
+def test_write_trace(tmpdir):
+    path = tmpdir.join('setup-trace.json')
+    trace_export.write_trace(
+        path=str(path),
+        entries=[],
+        samples=[],
+        profile_suffix='.profile.json',
+        name='setup',
+    )
+    trace = json.loads(path.read())
+    assert trace['displayTimeUnit'] == 'ms'
+    assert trace['traceEvents'][0]['args'] == {'name': 'setup'}
+    assert trace_export.trace_file_name('/log/setup.log') == (
+        '/log/setup-trace.json'
+    )
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -28,7 +28,12 @@ import re
 
 from otopi import util
 
+from ovirt_setup_lib import hostname as osetuphostname
+
 from . import constants as ohostedcons
+from . import resolver
+from . import template_engine
+from . import validation
 
 UNICAST_MAC_ADDR = re.compile("^[a-fA-F0-9][02468aAcCeE](:[a-fA-F0-9]{2}){5}$")
 
@@ -39,12 +44,7 @@ def _(m):
 
 @util.export
 def processTemplate(template, subst):
-    content = ''
-    with open(template, 'r') as f:
-        content = f.read()
-    for k, v in subst.items():
-        content = content.replace(str(k), str(v))
-    return content
+    return template_engine.render(template, subst)
 
 
 def randomMAC():
@@ -75,16 +75,7 @@ def check_is_pingable(base, address):
     """
     Ensure that an address is pingable
     """
-    cmd = [
-        base.command.get('ping'),
-        '-c',
-        '1',
-    ]
-    if ':' in address:
-        cmd.append('-6')
-
-    cmd.append(str(address))
-
+    cmd = validation.ping_command(base.command.get('ping'), address)
     rc, stdout, stderr = base.execute(
         tuple(cmd),
         raiseOnError=False,
@@ -184,4 +175,11 @@ class VirtUserContext(object):
         os.umask(self._umask)
 
 
+class CachedHostname(osetuphostname.Hostname):
+    """Hostname validation resolving names through the shared cache."""
+
+    def getResolvedAddresses(self, name):
+        return resolver.default().addresses(name)
+
+
 # vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,112 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+
+
+"""
+Validation of the deploy settings.
+Shared by the plugins, which ask again or fail on an invalid value, and
+by the pre-flight checks. The check_* functions return an error message,
+None if the value is valid.
+"""
+
+
+import gettext
+import re
+
+
+def _(m):
+    return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
+
+
+NETWORK_TEST_TIMEOUT = 2
+_CONNECTION_PATH = re.compile(r'^(.+):/(.+)$')
+
+
+def parse_connection_path(connection):
+    """
+    Return (address, path) of a host:/path connection, raise ValueError
+    if it is invalid. IPv6 addresses must be enclosed in brackets.
+    """
+    pmatch = _CONNECTION_PATH.match(connection.strip())
+    if pmatch:
+        address = pmatch.group(1)
+        if ':' not in address or (address[0] == '[' and address[-1] == ']'):
+            return address, '/{p}'.format(p=pmatch.group(2))
+    raise ValueError(
+        _('Invalid connection path: {p}').format(p=connection)
+    )
+
+
+def check_vcpus(vcpus, maxvcpus):
+    try:
+        vcpus = int(vcpus)
+    except (TypeError, ValueError):
+        return _('Invalid number of cpu specified: {vcpu}').format(
+            vcpu=vcpus,
+        )
+    if vcpus > maxvcpus:
+        return _(
+            'Invalid number of cpu specified: {vcpu}, '
+            'while only {maxvcpus} are available on '
+            'the host'
+        ).format(
+            vcpu=vcpus,
+            maxvcpus=maxvcpus,
+        )
+    return None
+
+
+def check_memory_size(mem_size_mb, minimum_mb, maxmem):
+    try:
+        mem_size_mb = int(mem_size_mb)
+    except (TypeError, ValueError):
+        return _('Invalid memory size specified: {size}').format(
+            size=mem_size_mb,
+        )
+    if mem_size_mb < minimum_mb:
+        return _('Minimum requirements for memory size not met')
+    if mem_size_mb > maxmem:
+        return _(
+            'Invalid memory size specified: {memsize}, '
+            'while only {maxmem} are available on '
+            'the host'
+        ).format(
+            memsize=mem_size_mb,
+            maxmem=maxmem,
+        )
+    return None
+
+
+def ping_command(ping, address):
+    cmd = [ping, '-c', '1']
+    if ':' in str(address):
+        cmd.append('-6')
+    cmd.append(str(address))
+    return cmd
+
+
+def dns_command(dig, timeout=NETWORK_TEST_TIMEOUT):
+    return [dig, '+tries=1', '+time={t}'.format(t=timeout)]
+
+
+def tcp_command(nc, address, port, timeout=NETWORK_TEST_TIMEOUT):
+    return [nc, '-w', str(timeout), '-z', address, str(port)]
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
@@ -0,0 +1,50 @@
+#
+# ovirt-hosted-engine-setup -- ovirt hosted engine setup
+# Copyright (C) 2020 Red Hat, Inc.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA
+#
+import pytest
+
+from . import validation
+
+
+def test_parse_connection_path():
+    assert validation.parse_connection_path(' nfs.example.com:/he ') == (
+        'nfs.example.com',
+        '/he',
+    )
+    assert validation.parse_connection_path('[fd00::1]:/exports/he') == (
+        '[fd00::1]',
+        '/exports/he',
+    )
+    for invalid in ('nfs.example.com', 'fd00::1:/he', 'host:/'):
+        with pytest.raises(ValueError):
+            validation.parse_connection_path(invalid)
+
+
+def test_checks():
+    assert validation.check_vcpus('4', 8) is None
+    assert validation.check_vcpus('16', 8)
+    assert validation.check_vcpus('four', 8)
+    assert validation.check_memory_size(4096, 4096, 8192) is None
+    assert validation.check_memory_size(2048, 4096, 8192)
+    assert validation.check_memory_size(16384, 4096, 8192)
+    assert validation.ping_command('ping', 'fd00::1') == [
+        'ping', '-c', '1', '-6', 'fd00::1',
+    ]
+
+
+# vim: expandtab tabstop=4 shiftwidth=4
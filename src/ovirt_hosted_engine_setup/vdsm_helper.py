@@ -39,10 +39,10 @@ def handle_server_error(f):
     @functools.wraps(f)
     def func(*args, **kwargs):
         try:
-            f(*args, **kwargs)
+            return f(*args, **kwargs) or 0
         except ServerError as e:
             sys.stderr.write(str(e) + '\n')
-            sys.exit(1)
+            return 1
 
     return func
 
@@ -63,11 +63,11 @@ def create(args):
         )
         if response['status'] != "WaitForLaunch":
             sys.stderr.write('VM failed to launch in the create function\n')
-            sys.exit(1)
+            return 1
 
     except ServerError as e:
         sys.stderr.write(str(e) + '\n')
-        sys.exit(1)
+        return 1
 
 
 @handle_server_error
@@ -86,11 +86,15 @@ def shutdown(args):
     )
 
 
+def getVmStatus(vmid):
+    cli = ohautil.connect_vdsm_json_rpc()
+    vmstats = cli.VM.getStats(vmID=vmid)[0]
+    return vmstats['status']
+
+
 @handle_server_error
 def checkVmStatus(args):
-    cli = ohautil.connect_vdsm_json_rpc()
-    vmstats = cli.VM.getStats(vmID=args.vmid)[0]
-    print(vmstats['status'])
+    print(getVmStatus(args.vmid))
 
 
 @handle_server_error
@@ -140,7 +144,7 @@ def setVmTicket(args):
         )
     else:
         sys.stderr.write('Failed detecting VNC port\n')
-        sys.exit(1)
+        return 1
 
 
 def _add_vmid_argument(parser):
@@ -211,10 +215,11 @@ if __name__ == '__main__':
     )
 
     args = parser.parse_args()
-    args.command(args)
+    rc = args.command(args)
     # force module de-import to close the globally
     # shared json rpc client in the right order
     del sys.modules["ovirt_hosted_engine_ha.lib.util"]
+    sys.exit(rc)
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
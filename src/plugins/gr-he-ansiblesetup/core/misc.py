@@ -22,15 +22,23 @@
 
 
 import gettext
+import os
 import re
 import uuid
 
+from otopi import constants as otopicons
 from otopi import context as otopicontext
 from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import ansible_utils
+from ovirt_hosted_engine_setup import appliance_cache
+from ovirt_hosted_engine_setup import appliance_catalog
+from ovirt_hosted_engine_setup import bootstrap
+from ovirt_hosted_engine_setup import checkpoint
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_network
+from ovirt_hosted_engine_setup import scheduler
 
 
 def _(m):
@@ -80,6 +88,15 @@ class Plugin(plugin.PluginBase):
             ohostedcons.CoreEnv.PAUSE_ON_RESTORE,
             None
         )
+        self.environment.setdefault(
+            ohostedcons.CoreEnv.APPLIANCE_CACHE_SIZE_GB,
+            ohostedcons.Defaults.DEFAULT_APPLIANCE_CACHE_SIZE_GB
+        )
+        self.environment.setdefault(
+            ohostedcons.CoreEnv.RESUME,
+            False
+        )
+        self.environment[ohostedcons.CoreEnv.APPLIANCE_CHECKOUT] = None
 
     @plugin.event(
         stage=plugin.Stages.STAGE_SETUP,
@@ -399,7 +416,48 @@ class Plugin(plugin.PluginBase):
             ]
         )
 
-        self.initial_clean_up(bootstrap_vars, inventory_source)
+        store = checkpoint.CheckpointStore(
+            ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_CHECKPOINTS
+        ).load()
+        digest = checkpoint.fingerprint(
+            bootstrap_vars,
+            # These are generated again on each run
+            exclude=(
+                'he_vm_uuid',
+                'he_cdrom_uuid',
+                'he_nic_uuid',
+                'he_vm_mac_addr',
+            ),
+        )
+        if self.environment[ohostedcons.CoreEnv.RESUME]:
+            outputs = store.replay(
+                checkpoint.PHASE_BOOTSTRAP_LOCAL_VM,
+                digest,
+                valid=lambda o: os.path.isdir(o['local_vm_dir']),
+            )
+            if outputs is not None:
+                self.logger.info(_('Resuming with the running local VM'))
+                self.environment[
+                    ohostedcons.VMEnv.LOCAL_VM_UUID
+                ] = outputs['local_vm_uuid']
+                self.environment[
+                    ohostedcons.CoreEnv.LOCAL_VM_DIR
+                ] = outputs['local_vm_dir']
+                self.environment[
+                    ohostedcons.StorageEnv.OVF_SIZE_GB
+                ] = outputs['ovf_size_gb']
+                return
+        # The initial clean up destroys any previous local VM
+        store.invalidate(checkpoint.PHASE_BOOTSTRAP_LOCAL_VM)
+
+        ova_path = bootstrap_vars['he_appliance_ova']
+        bootstrap_vars['he_appliance_ova'] = bootstrap.prepare(
+            clean_up=lambda: self.initial_clean_up(
+                bootstrap_vars,
+                inventory_source,
+            ),
+            prepare_appliance=lambda: self._prepare_appliance(ova_path),
+        )
 
         ah = ansible_utils.AnsibleHelper(
             tags=ohostedcons.Const.HE_TAG_BOOTSTRAP_LOCAL_VM,
@@ -412,6 +470,8 @@ class Plugin(plugin.PluginBase):
         )
         self.logger.info(_('Starting local VM'))
         r = ah.run()
+        # Adding the host to the engine created the management bridge
+        host_network.invalidate()
         self.logger.debug(r)
 
         if (
@@ -441,6 +501,123 @@ class Plugin(plugin.PluginBase):
         if r['ansible-playbook_rc'] != 0:
             raise RuntimeError(_('Failed executing ansible-playbook'))
 
+        try:
+            store.record(
+                checkpoint.PHASE_BOOTSTRAP_LOCAL_VM,
+                digest,
+                {
+                    'local_vm_uuid': self.environment[
+                        ohostedcons.VMEnv.LOCAL_VM_UUID
+                    ],
+                    'local_vm_dir': self.environment[
+                        ohostedcons.CoreEnv.LOCAL_VM_DIR
+                    ],
+                    'ovf_size_gb': self.environment[
+                        ohostedcons.StorageEnv.OVF_SIZE_GB
+                    ],
+                },
+            )
+        except (IOError, OSError) as e:
+            self.logger.warning(
+                _('Cannot save the deploy checkpoint: {e}').format(e=e)
+            )
+
+    def _check_appliances(self, catalog):
+        """
+        Raise RuntimeError if the sha1sum of an appliance of catalog is
+        known not to match its descriptor.
+        """
+        rejected = catalog.rejected()
+        if rejected:
+            raise RuntimeError(
+                _('The sha1sum of {path} does not match {conf}').format(
+                    path=rejected[0]['appliance']['path'],
+                    conf=rejected[0]['conf'],
+                )
+            )
+
+    def _verify_appliance(self, catalog):
+        """
+        Verify the sha1sum of the appliance of catalog, reusing the
+        result of a previous run while the OVA does not change.
+        """
+        catalog.wait_verified(scheduler.Scheduler(max_workers=1))
+        try:
+            catalog.save()
+        except (IOError, OSError) as e:
+            self.logger.debug(
+                'Cannot save the appliance index: {e}'.format(e=e)
+            )
+        self._check_appliances(catalog)
+
+    def _prepare_appliance(self, ova_path):
+        """
+        Return the appliance to deploy: ova_path, or an uncompressed copy
+        of it from the cache, so that retries do not decompress it again.
+        The sha1sum of the appliance of the rpm is verified first.
+        """
+        size_gb = self.environment[
+            ohostedcons.CoreEnv.APPLIANCE_CACHE_SIZE_GB
+        ]
+        path = ova_path
+        expected_sha1 = None
+        if not path:
+            # The role picks the appliance from the installed rpm, it is
+            # known here only if exactly one is installed.
+            catalog = appliance_catalog.ApplianceCatalog(
+                desc_dir=ohostedcons.FileLocations.OVIRT_APPLIANCES_DESC_DIR,
+                pattern=(
+                    ohostedcons.FileLocations.
+                    OVIRT_APPLIANCES_DESC_FILENAME_TEMPLATE
+                ),
+            ).load()
+            self._check_appliances(catalog)
+            appliances = catalog.appliances()
+            if len(appliances) != 1:
+                return ova_path
+            if not size_gb:
+                # Adding it to the cache verifies it while decompressing
+                self._verify_appliance(catalog)
+            path = appliances[0]['path']
+            expected_sha1 = appliances[0]['sha1sum']
+        if not size_gb:
+            return ova_path
+        try:
+            if not appliance_cache.is_compressed(path):
+                return ova_path
+            cache = appliance_cache.ApplianceCache(
+                cache_dir=ohostedcons.FileLocations.APPLIANCE_CACHE_DIR,
+                max_size=int(size_gb) * 1024 * 1024 * 1024,
+            )
+            entry = cache.lookup(path)
+            if entry is None:
+                self.logger.info(_('Adding the appliance to the cache'))
+                entry = cache.add(path, expected_sha1)
+            else:
+                self.logger.info(_('Using the cached appliance'))
+            checkout = cache.checkout(
+                entry,
+                self.environment[ohostedcons.CoreEnv.TEMPDIR],
+            )
+        except (IOError, OSError, EOFError, RuntimeError) as e:
+            self.logger.debug('Appliance cache failure', exc_info=True)
+            self.logger.warning(
+                _('Cannot use the appliance cache: {e}').format(e=e)
+            )
+            return ova_path
+        if checkout != entry:
+            self.environment[
+                ohostedcons.CoreEnv.APPLIANCE_CHECKOUT
+            ] = checkout
+        self.logger.debug(
+            'Appliance {p} cached as {e}, using {c}'.format(
+                p=path,
+                e=entry,
+                c=checkout,
+            )
+        )
+        return checkout
+
     def initial_clean_up(self, bootstrap_vars, inventory_source):
         ah = ansible_utils.AnsibleHelper(
             tags=ohostedcons.Const.HE_TAG_INITIAL_CLEAN,
@@ -458,6 +635,25 @@ class Plugin(plugin.PluginBase):
         stage=plugin.Stages.STAGE_CLEANUP,
     )
     def _cleanup(self):
+        checkout = self.environment[ohostedcons.CoreEnv.APPLIANCE_CHECKOUT]
+        if checkout and os.path.exists(checkout):
+            os.unlink(checkout)
+            os.rmdir(os.path.dirname(checkout))
+        store = checkpoint.CheckpointStore(
+            ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_CHECKPOINTS
+        ).load()
+        if not self.environment[otopicons.BaseEnv.ERROR]:
+            store.clear()
+        elif checkpoint.PHASE_BOOTSTRAP_LOCAL_VM in store.phases():
+            # The local VM is kept for the next resumed attempt
+            self.logger.info(
+                _(
+                    'The local VM has been kept running, please fix the '
+                    'issue and run again with --resume to continue the '
+                    'deployment'
+                )
+            )
+            return
         ah = ansible_utils.AnsibleHelper(
             tags=ohostedcons.Const.HE_TAG_FINAL_CLEAN,
             extra_vars={
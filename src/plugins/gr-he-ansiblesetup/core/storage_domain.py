@@ -21,27 +21,57 @@
 """Storage domain plugin."""
 
 
+import functools
 import gettext
 import netaddr
-import re
 
 from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import ansible_utils
+from ovirt_hosted_engine_setup import checkpoint
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import iscsi_login
+from ovirt_hosted_engine_setup import lun_catalog
+from ovirt_hosted_engine_setup import storage_session
+from ovirt_hosted_engine_setup import validation
 
 
 def _(m):
     return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
 
 
+# Answers leaving the LUN selection where it was, as an invalid answer
+# or an answer file replaying a navigation one, before giving up.
+MAX_IDLE_LUN_ANSWERS = 5
+
+
 @util.export
 class Plugin(plugin.PluginBase):
     """Storage domain plugin."""
 
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
+        self._session = storage_session.StorageSession()
+        # The iSCSI paths logged in by each target, to log out
+        self._iscsi_paths = {}
+
+    def _run_ansible_step(self, tags, extra_vars, message, cache=False):
+        """
+        Run the ansible tags; with cache their results of a previous
+        attempt with the same variables are reused.
+        """
+        def _run():
+            ah = ansible_utils.AnsibleHelper(
+                tags=tags,
+                extra_vars=extra_vars,
+                user_extra_vars=self.environment.get(
+                    ohostedcons.CoreEnv.ANSIBLE_USER_EXTRA_VARS
+                ),
+            )
+            self.logger.info(message)
+            return ah.run()
+        return self._session.step(tags, extra_vars, _run, cache=cache)
 
     def _query_nfs_version(self):
         return self.dialog.queryString(
@@ -231,19 +261,17 @@ class Plugin(plugin.PluginBase):
             'he_iscsi_portal_addr': portal,
             'he_iscsi_portal_port': port,
         }
-        ah = ansible_utils.AnsibleHelper(
+        r = self._run_ansible_step(
             tags=ohostedcons.Const.HE_TAG_ISCSI_DISCOVER,
             extra_vars=iscsi_discover_vars,
-            user_extra_vars=self.environment.get(
-                ohostedcons.CoreEnv.ANSIBLE_USER_EXTRA_VARS
-            ),
+            message=_('Discovering iSCSI targets'),
+            cache=True,
         )
-        self.logger.info(_('Discovering iSCSI targets'))
-        r = ah.run()
         self.logger.debug(r)
         try:
             values = r['otopi_iscsi_targets']['iscsi_targets_struct']
         except KeyError:
+            self._session.invalidate(ohostedcons.Const.HE_TAG_ISCSI_DISCOVER)
             raise RuntimeError(_('Unable to find any target'))
         self.logger.debug(values)
         f_targets = []
@@ -318,6 +346,126 @@ class Plugin(plugin.PluginBase):
             ','.join([str(x['port']) for x in apl]),
         )
 
+    def _login_iscsi_paths(self, username, password, portal, port, target,
+                           tpgt):
+        """
+        Log in to all the paths of the target portal group concurrently
+        and return the addresses and ports of the ones that are up, if
+        they reach the quorum. The other paths are logged out, all of
+        them if the quorum is not reached.
+        With CHAP all the paths are returned and VDSM does the logins:
+        iscsiadm would expose the secret on its command line.
+        """
+        if username:
+            self.logger.debug(
+                'CHAP configured, leaving the iSCSI logins to VDSM'
+            )
+            return portal, port
+        paths = iscsi_login.paths(portal, port, tpgt)
+        quorum = self.environment[ohostedcons.StorageEnv.ISCSI_LOGIN_QUORUM]
+        quorum = len(paths) if not quorum else min(int(quorum), len(paths))
+        timeout = int(
+            self.environment[ohostedcons.StorageEnv.ISCSI_LOGIN_TIMEOUT]
+        )
+        login = functools.partial(
+            self._login_iscsi_path,
+            target=target,
+            timeout=timeout,
+        )
+
+        def _login():
+            self.logger.info(
+                _(
+                    'Logging in to {n} iSCSI paths, {quorum} required'
+                ).format(
+                    n=len(paths),
+                    quorum=quorum,
+                )
+            )
+            self._iscsi_paths.setdefault(target, []).extend(paths)
+            iscsi_login.login_all(paths, login, timeout)
+            self.logger.info(
+                _('iSCSI paths:\n{report}').format(
+                    report=iscsi_login.report(paths),
+                )
+            )
+            up = [p for p in paths if p.state == iscsi_login.UP]
+            self._logout_iscsi_paths(
+                target,
+                [p for p in paths if p.state != iscsi_login.UP],
+            )
+            if len(up) < quorum:
+                self._logout_iscsi_paths(target, up)
+                raise RuntimeError(
+                    _(
+                        'Only {up} of {n} iSCSI paths are up, '
+                        '{quorum} required'
+                    ).format(
+                        up=len(up),
+                        n=len(paths),
+                        quorum=quorum,
+                    )
+                )
+            if len(up) < len(paths):
+                self.logger.warning(
+                    _(
+                        'Going ahead without the iSCSI paths {paths}, '
+                        'they can be added to the storage domain later'
+                    ).format(
+                        paths=', '.join(
+                            p.portal for p in paths
+                            if p.state != iscsi_login.UP
+                        ),
+                    )
+                )
+            return (
+                ','.join(p.address for p in up),
+                ','.join(p.port for p in up),
+            )
+        return self._session.step(
+            'iscsi_login',
+            {
+                'portal': portal,
+                'port': port,
+                'tpgt': tpgt,
+                'target': target,
+                'quorum': quorum,
+            },
+            _login,
+            cache=True,
+        )
+
+    def _login_iscsi_path(self, path, target, timeout):
+        for command in iscsi_login.login_commands(
+            self.command.get('iscsiadm'),
+            target,
+            path,
+            timeout,
+        ):
+            rc, stdout, stderr = self.execute(
+                tuple(command),
+                raiseOnError=False,
+            )
+            if rc not in (0, iscsi_login.ISCSI_ERR_SESS_EXISTS):
+                raise RuntimeError(
+                    '\n'.join(stderr).strip() or
+                    _('Failed with rc={rc}').format(rc=rc)
+                )
+
+    def _logout_iscsi_paths(self, target, paths):
+        """Log out of paths and delete their nodes, ignoring errors."""
+        for path in paths:
+            for command in iscsi_login.logout_commands(
+                self.command.get('iscsiadm'),
+                target,
+                path,
+            ):
+                self.execute(tuple(command), raiseOnError=False)
+            path.logged_in = False
+            tracked = self._iscsi_paths.get(target, [])
+            if path in tracked:
+                tracked.remove(path)
+
     def _query_iscsi_lunid(self, username, password, portal, port, target):
         iscsi_getdevices_vars = {
             'he_fqdn': self.environment[
@@ -335,15 +483,11 @@ class Plugin(plugin.PluginBase):
             'he_iscsi_portal_port': port,
             'he_iscsi_target': target,
         }
-        ah = ansible_utils.AnsibleHelper(
+        r = self._run_ansible_step(
             tags=ohostedcons.Const.HE_TAG_ISCSI_GETDEVICES,
             extra_vars=iscsi_getdevices_vars,
-            user_extra_vars=self.environment.get(
-                ohostedcons.CoreEnv.ANSIBLE_USER_EXTRA_VARS
-            ),
+            message=_('Getting iSCSI LUNs list'),
         )
-        self.logger.info(_('Getting iSCSI LUNs list'))
-        r = ah.run()
         self.logger.debug(r)
         available_luns = []
         if (
@@ -384,15 +528,11 @@ class Plugin(plugin.PluginBase):
                 ohostedcons.EngineEnv.ADMIN_PASSWORD
             ]
         }
-        ansible_helper = ansible_utils.AnsibleHelper(
+        r = self._run_ansible_step(
             tags=ohostedcons.Const.HE_TAG_FC_GETDEVICES,
             extra_vars=fc_getdevices_vars,
-            user_extra_vars=self.environment.get(
-                ohostedcons.CoreEnv.ANSIBLE_USER_EXTRA_VARS
-            ),
+            message=_('Getting Fibre Channel LUNs list'),
         )
-        self.logger.info(_('Getting Fibre Channel LUNs list'))
-        r = ansible_helper.run()
         self.logger.debug(r)
         available_luns = []
         if (
@@ -411,6 +551,21 @@ class Plugin(plugin.PluginBase):
                 available_luns = r['otopi_fc_devices']['ovirt_host_storages']
         return self._select_lun(available_luns)
 
+    def _lun_min_size_gib(self):
+        image_size_gb = self.environment[ohostedcons.StorageEnv.IMAGE_SIZE_GB]
+        if not image_size_gb:
+            image_size_gb = max(
+                ohostedcons.Defaults.DEFAULT_IMAGE_SIZE_GB,
+                int(
+                    self.environment[ohostedcons.StorageEnv.OVF_SIZE_GB] or 0
+                ),
+            )
+        return (
+            int(image_size_gb) +
+            ohostedcons.Const.OVFSTORE_SIZE_GIB +
+            ohostedcons.Const.CRITICAL_SPACE_ACTION_BLOCKER
+        )
+
     def _select_lun(self, available_luns):
         self.logger.debug(available_luns)
         if len(available_luns) == 0:
@@ -418,63 +573,90 @@ class Plugin(plugin.PluginBase):
             self.logger.error(msg)
             raise RuntimeError(msg)
 
-        f_luns = []
-        lun_list = ''
-        available_luns = sorted(available_luns, key=lambda lun: lun['id'])
-        self.logger.debug(available_luns)
-        # TODO: enforce free and minimum free space
-        for entry in available_luns:
-            paths = entry['logical_units'][0]['paths']
-            f_luns.append(
-                {
-                    'index': str(len(f_luns)+1),
-                    'id': entry['id'],
-                    'capacityGiB': int(
-                        entry['logical_units'][0]['size']
-                    ) / pow(2, 30),
-                    'vendorID': entry['logical_units'][0]['vendor_id'],
-                    'productID': entry['logical_units'][0]['product_id'],
-                    'status': entry['logical_units'][0]['status'],
-                    'paths': paths,
-                    'discard_max_size': int(entry['logical_units'][0]
-                                            ['discard_max_size'])
-                }
+        catalog = lun_catalog.LunCatalog.from_storages(
+            available_luns,
+            min_size_gib=self._lun_min_size_gib(),
+        )
+        if catalog.too_small:
+            self.logger.info(
+                _(
+                    '{n} LUNs smaller than {size} GiB are not usable for '
+                    'the engine VM disk and the OVF_STORE disks'
+                ).format(
+                    n=catalog.too_small,
+                    size=catalog.min_size_gib,
+                )
             )
-        for entry in f_luns:
-            lun_list += _(
-                '\t[{i}]\t{id}\t{capacityGiB}GiB\t{vendorID}\t{productID}\n'
-                '\t\tstatus: {status}, paths: {ap} active'
+        if len(catalog) == 0:
+            msg = _(
+                'Cannot find any LUN of at least {size} GiB on the '
+                'selected target'
             ).format(
-                i=entry['index'],
-                id=entry['id'],
-                capacityGiB=entry['capacityGiB'],
-                vendorID=entry['vendorID'],
-                productID=entry['productID'],
-                status=entry['status'],
-                ap=entry['paths'],
+                size=catalog.min_size_gib,
             )
-            lun_list += '\n\n'
+            self.logger.error(msg)
+            raise RuntimeError(msg)
 
-        self.dialog.note(
-            _(
-                'The following luns have been found on the requested target:\n'
-                '{lun_list}'
-            ).format(
-                lun_list=lun_list,
+        shown = catalog.luns
+        number = 0
+        idle = 0
+        while True:
+            first, luns, pages = lun_catalog.page(shown, number)
+            self.dialog.note(
+                _(
+                    'The following luns have been found on the requested '
+                    'target (page {page} of {pages}):\n'
+                    '{lun_list}'
+                ).format(
+                    page=number + 1,
+                    pages=pages,
+                    lun_list=lun_catalog.format_luns(first, luns),
+                )
             )
-        )
-        slun = self.dialog.queryString(
-            name='OVEHOSTED_STORAGE_BLOCKD_LUN',
-            note=_(
-                'Please select the destination LUN '
-                '(@VALUES@) [@DEFAULT@]: '
-            ),
-            prompt=True,
-            caseSensitive=True,
-            default='1',
-            validValues=[i['index'] for i in f_luns],
-        )
-        return f_luns[int(slun)-1]
+            slun = self.dialog.queryString(
+                name='OVEHOSTED_STORAGE_BLOCKD_LUN',
+                note=_(
+                    'Please select the destination LUN by number or id, '
+                    'n/p for the next/previous page or /text to search '
+                    '[@DEFAULT@]: '
+                ),
+                prompt=True,
+                caseSensitive=True,
+                default=str(first + 1),
+            ).strip()
+            lun = catalog.get(slun)
+            if lun is not None:
+                return lun
+            if slun.isdigit() and 0 < int(slun) <= len(shown):
+                return shown[int(slun) - 1]
+            previous = (shown, number)
+            if slun in ('n', 'p'):
+                number = min(
+                    max(number + (1 if slun == 'n' else -1), 0),
+                    pages - 1,
+                )
+            elif slun.startswith('/'):
+                shown = catalog.search(slun[1:])
+                number = 0
+                if not shown:
+                    self.logger.error(
+                        _('No LUN matches {text}').format(text=slun[1:])
+                    )
+                    shown = catalog.luns
+            else:
+                self.logger.error(
+                    _('Invalid LUN selection: {s}').format(s=slun)
+                )
+            if (shown, number) != previous:
+                idle = 0
+                continue
+            idle += 1
+            if idle >= MAX_IDLE_LUN_ANSWERS:
+                raise RuntimeError(
+                    _('No LUN selected after {n} attempts').format(
+                        n=MAX_IDLE_LUN_ANSWERS,
+                    )
+                )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_INIT,
@@ -544,6 +726,27 @@ class Plugin(plugin.PluginBase):
             ohostedcons.StorageEnv.DISCARD_SUPPORT,
             False
         )
+        self.environment.setdefault(
+            ohostedcons.StorageEnv.ISCSI_LOGIN_QUORUM,
+            None
+        )
+        self.environment.setdefault(
+            ohostedcons.StorageEnv.ISCSI_LOGIN_TIMEOUT,
+            ohostedcons.Defaults.DEFAULT_ISCSI_LOGIN_TIMEOUT
+        )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_SETUP,
+    )
+    def _setup(self):
+        self.command.detect('iscsiadm')
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CLEANUP,
+    )
+    def _cleanup(self):
+        for target, paths in list(self._iscsi_paths.items()):
+            self._logout_iscsi_paths(target, list(paths))
 
     @plugin.event(
         stage=plugin.Stages.STAGE_CLOSEUP,
@@ -554,7 +757,11 @@ class Plugin(plugin.PluginBase):
     )
     def _closeup(self):
         created = False
+        replayed = False
         interactive = True
+        store = checkpoint.CheckpointStore(
+            ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_CHECKPOINTS
+        ).load()
         if (
             self.environment[ohostedcons.StorageEnv.DOMAIN_TYPE] is not None or
             self.environment[
@@ -583,6 +790,11 @@ class Plugin(plugin.PluginBase):
         ):
             interactive = False
         while not created:
+            if self._session.attempts:
+                self.logger.info(
+                    self._session.report(len(self._session.attempts))
+                )
+            self._session.start_attempt()
             domain_type = self.environment[ohostedcons.StorageEnv.DOMAIN_TYPE]
             storage_domain_connection = self.environment[
                 ohostedcons.StorageEnv.STORAGE_DOMAIN_CONNECTION
@@ -619,6 +831,9 @@ class Plugin(plugin.PluginBase):
             iscsi_target = self.environment[
                 ohostedcons.StorageEnv.ISCSI_TARGET
             ]
+            iscsi_tpgt = self.environment[
+                ohostedcons.StorageEnv.ISCSI_PORTAL
+            ]
             lunid = self.environment[
                 ohostedcons.StorageEnv.LUN_ID
             ]
@@ -667,36 +882,18 @@ class Plugin(plugin.PluginBase):
                 domain_type == ohostedcons.DomainTypes.NFS or
                 domain_type == ohostedcons.DomainTypes.GLUSTERFS
             ):
-                path_test = '^(.+):/(.+)$'
                 if storage_domain_connection is None:
                     storage_domain_connection = self._query_connection_path()
-                pmatch = re.match(path_test, storage_domain_connection.strip())
-                valid = False
-                if pmatch and len(pmatch.groups()) == 2:
-                    t_storage_domain_address = pmatch.group(1)
-                    t_storage_domain_path = pmatch.group(2)
-                    valid = True
-                    if (
-                        ':' in t_storage_domain_address and
-                        (
-                            t_storage_domain_address[0] != '[' or
-                            t_storage_domain_address[-1] != ']'
+                try:
+                    storage_domain_address, storage_domain_path = \
+                        validation.parse_connection_path(
+                            storage_domain_connection
                         )
-                    ):
-                        valid = False
-
-                if not valid:
-                    msg = _(
-                        'Invalid connection path: {p}'
-                    ).format(
-                        p=storage_domain_connection,
-                    )
-                    self.logger.error(msg)
+                except ValueError as e:
+                    self.logger.error(str(e))
                     if not interactive:
-                        raise RuntimeError(msg)
+                        raise RuntimeError(str(e))
                     continue
-                storage_domain_address = t_storage_domain_address
-                storage_domain_path = '/{p}'.format(p=t_storage_domain_path)
 
                 if mnt_options is None:
                     mnt_options = self._query_mnt_options(mnt_options)
@@ -743,6 +940,24 @@ class Plugin(plugin.PluginBase):
                         if not interactive:
                             raise e
                         continue
+                try:
+                    iscsi_portal, iscsi_port = self._login_iscsi_paths(
+                        username=iscsi_username,
+                        password=iscsi_password,
+                        portal=iscsi_portal,
+                        port=iscsi_port,
+                        target=iscsi_target,
+                        tpgt=iscsi_tpgt,
+                    )
+                except RuntimeError as e:
+                    self.logger.error(
+                        _('Unable to log in to the iSCSI target: {e}').format(
+                            e=e,
+                        )
+                    )
+                    if not interactive:
+                        raise e
+                    continue
                 if lunid is None:
                     try:
                         lun = self._query_iscsi_lunid(
@@ -752,8 +967,8 @@ class Plugin(plugin.PluginBase):
                             port=iscsi_port,
                             target=iscsi_target
                         )
-                        lunid = lun['id']
-                        discard = lun['discard_max_size'] > 0
+                        lunid = lun.id
+                        discard = lun.discard_max_size > 0
                         self.logger.info(
                             _("iSCSI discard after delete is {v}").format(
                                 v=_("enabled") if discard else _("disabled")
@@ -771,8 +986,8 @@ class Plugin(plugin.PluginBase):
                 if lunid is None:
                     try:
                         lun = self._query_fc_lunid()
-                        lunid = lun['id']
-                        discard = lun['discard_max_size'] > 0
+                        lunid = lun.id
+                        discard = lun.discard_max_size > 0
                         self.logger.info(
                             _("FC discard after delete is {v}").format(
                                 v=_("enabled") if discard else _("disabled")
@@ -819,20 +1034,30 @@ class Plugin(plugin.PluginBase):
                 'he_iscsi_password': iscsi_password,
                 'he_discard': discard,
             }
-            ah = ansible_utils.AnsibleHelper(
-                tags=ohostedcons.Const.HE_TAG_CREATE_SD,
-                extra_vars=storage_domain_vars,
-                user_extra_vars=self.environment.get(
-                    ohostedcons.CoreEnv.ANSIBLE_USER_EXTRA_VARS
-                ),
-            )
-            self.logger.info(_('Creating Storage Domain'))
-            try:
-                r = ah.run()
-            except RuntimeError as e:
-                if not interactive:
-                    raise e
-                continue
+            digest = checkpoint.fingerprint(storage_domain_vars)
+            details = None
+            if self.environment[ohostedcons.CoreEnv.RESUME]:
+                details = store.replay(
+                    checkpoint.PHASE_CREATE_STORAGE_DOMAIN,
+                    digest,
+                )
+            if details is not None:
+                self.logger.info(
+                    _('Resuming with the storage domain already created')
+                )
+                replayed = True
+                r = {'otopi_storage_domain_details': details}
+            else:
+                try:
+                    r = self._run_ansible_step(
+                        tags=ohostedcons.Const.HE_TAG_CREATE_SD,
+                        extra_vars=storage_domain_vars,
+                        message=_('Creating Storage Domain'),
+                    )
+                except RuntimeError as e:
+                    if not interactive:
+                        raise e
+                    continue
             self.logger.debug(
                 'Create storage domain results {r}'.format(r=r)
             )
@@ -950,6 +1175,8 @@ class Plugin(plugin.PluginBase):
                         self.environment[
                             ohostedcons.StorageEnv.ISCSI_TARGET
                         ] = lun0['target']
+                        # VDSM now uses the sessions of this target
+                        self._iscsi_paths.pop(lun0['target'], None)
                         self.environment[
                             ohostedcons.StorageEnv.LUN_ID
                         ] = lun0['id']
@@ -972,6 +1199,22 @@ class Plugin(plugin.PluginBase):
                         'please try again'
                     )
                 )
+        self.logger.debug(
+            'Storage domain creation sub-steps:\n{report}'.format(
+                report=self._session.report(),
+            )
+        )
+        if not replayed:
+            try:
+                store.record(
+                    checkpoint.PHASE_CREATE_STORAGE_DOMAIN,
+                    digest,
+                    r['otopi_storage_domain_details'],
+                )
+            except (IOError, OSError) as e:
+                self.logger.warning(
+                    _('Cannot save the deploy checkpoint: {e}').format(e=e)
+                )
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
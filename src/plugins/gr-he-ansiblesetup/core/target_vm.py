@@ -28,6 +28,7 @@ from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import ansible_utils
+from ovirt_hosted_engine_setup import checkpoint
 from ovirt_hosted_engine_setup import constants as ohostedcons
 
 
@@ -243,6 +244,16 @@ class Plugin(plugin.PluginBase):
                 ohostedcons.NetworkEnv.OVIRT_HOSTED_ENGINE_FQDN
             ]
         )
+        store = checkpoint.CheckpointStore(
+            ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP_CHECKPOINTS
+        ).load()
+        digest = checkpoint.fingerprint(target_vm_vars)
+        if (
+            self.environment[ohostedcons.CoreEnv.RESUME] and
+            store.replay(checkpoint.PHASE_CREATE_TARGET_VM, digest) is not None
+        ):
+            self.logger.info(_('Resuming with the target VM already created'))
+            return
         ah = ansible_utils.AnsibleHelper(
             tags=ohostedcons.Const.HE_TAG_CREATE_VM,
             extra_vars=target_vm_vars,
@@ -254,6 +265,12 @@ class Plugin(plugin.PluginBase):
         self.logger.info(_('Creating Target VM'))
         r = ah.run()
         self.logger.debug(r)
+        try:
+            store.record(checkpoint.PHASE_CREATE_TARGET_VM, digest, {})
+        except (IOError, OSError) as e:
+            self.logger.warning(
+                _('Cannot save the deploy checkpoint: {e}').format(e=e)
+            )
 
 
 # vim: expandtab tabstop=4 shiftwidth=4
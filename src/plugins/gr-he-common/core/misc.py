@@ -29,6 +29,9 @@ from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_capabilities
+from ovirt_hosted_engine_setup import stage_timing
+from ovirt_hosted_engine_setup import trace_export
 from ovirt_hosted_engine_setup import util as ohostedutil
 
 
@@ -42,6 +45,39 @@ class Plugin(plugin.PluginBase):
 
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
+        self._io_sampler = None
+
+    def _timed(self, execute_method):
+        timer = stage_timing.timer()
+
+        def _executeMethod(stage, method, *args, **kwargs):
+            f = method['method']
+            if getattr(f, '__self__', None) is not None:
+                timer.instrument(f.__self__)
+            with timer.measure(
+                stage=plugin.Stages.stage_id(stage),
+                plugin=f.__module__,
+                method=f.__name__,
+            ):
+                return execute_method(stage, method, *args, **kwargs)
+        return _executeMethod
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_BOOT,
+        priority=plugin.Stages.PRIORITY_FIRST,
+    )
+    def _boot_timing(self):
+        # Wrap the otopi method dispatcher so that every event handler of
+        # every plugin, and the commands they execute, get timed from here
+        # till the end of the sequence.
+        if hasattr(self.context, '_executeMethod'):
+            self.context._executeMethod = self._timed(
+                self.context._executeMethod
+            )
+        else:
+            self.logger.debug('Stage timing not available')
+        self._io_sampler = trace_export.IOSampler()
+        self._io_sampler.start()
 
     @plugin.event(
         stage=plugin.Stages.STAGE_BOOT,
@@ -91,8 +127,24 @@ class Plugin(plugin.PluginBase):
             ohostedcons.CoreEnv.RESTORE_FROM_FILE,
             None
         )
+        self.environment.setdefault(
+            ohostedcons.CoreEnv.STAGE_TIMING_TOP,
+            ohostedcons.Defaults.DEFAULT_STAGE_TIMING_TOP
+        )
+        self.environment[ohostedcons.CoreEnv.STAGE_TIMELINE] = None
         self.environment[ohostedcons.CoreEnv.NODE_SETUP] = False
         self.environment[ohostedcons.CoreEnv.MISC_REACHED] = False
+        # Probed once, the VM sizing plugins take their limits from here
+        self.environment[
+            ohostedcons.CoreEnv.HOST_CAPABILITIES
+        ] = host_capabilities.probe(
+            paths=(ohostedcons.FileLocations.LOCAL_VM_DIR_PATH,),
+        )
+        self.logger.debug(
+            'Host capabilities: {caps}'.format(
+                caps=self.environment[ohostedcons.CoreEnv.HOST_CAPABILITIES],
+            )
+        )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_MISC,
@@ -149,11 +201,97 @@ class Plugin(plugin.PluginBase):
         # transactions
         self.logger.debug('Finished persisting file configuration')
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CLEANUP,
+        priority=plugin.Stages.PRIORITY_LAST,
+    )
+    def _save_timeline(self):
+        timeline = stage_timing.timer().to_dict()
+        self.environment[ohostedcons.CoreEnv.STAGE_TIMELINE] = timeline
+        log_file_name = self.environment[otopicons.CoreEnv.LOG_FILE_NAME]
+        if not log_file_name:
+            return
+        path = stage_timing.timing_file_name(log_file_name)
+        try:
+            stage_timing.timer().dump(path)
+            self.logger.debug(
+                'Stage timeline saved to {path}'.format(path=path)
+            )
+        except (IOError, OSError) as e:
+            self.logger.debug(
+                'Error saving the stage timeline',
+                exc_info=True,
+            )
+            self.logger.warning(
+                _('Cannot save the stage timeline to {path}: {e}').format(
+                    path=path,
+                    e=e,
+                )
+            )
+
+    @plugin.event(
+        stage=plugin.Stages.STAGE_CLEANUP,
+        priority=plugin.Stages.PRIORITY_LAST,
+    )
+    def _save_trace(self):
+        samples = []
+        if self._io_sampler is not None:
+            self._io_sampler.stop()
+            samples = self._io_sampler.samples
+        log_file_name = self.environment[otopicons.CoreEnv.LOG_FILE_NAME]
+        if not log_file_name:
+            return
+        path = trace_export.trace_file_name(log_file_name)
+        try:
+            trace_export.write_trace(
+                path=path,
+                entries=stage_timing.timer().entries(),
+                samples=samples,
+                profile_suffix=ohostedcons.AnsibleCallback.PROFILE_SUFFIX,
+                name=ohostedcons.FileLocations.OVIRT_HOSTED_ENGINE_SETUP,
+            )
+            self.logger.debug('Deploy trace saved to {path}'.format(path=path))
+        except (IOError, OSError) as e:
+            self.logger.debug(
+                'Error saving the deploy trace',
+                exc_info=True,
+            )
+            self.logger.warning(
+                _('Cannot save the deploy trace to {path}: {e}').format(
+                    path=path,
+                    e=e,
+                )
+            )
+
+    def _print_top_offenders(self):
+        top = stage_timing.timer().top(
+            self.environment[ohostedcons.CoreEnv.STAGE_TIMING_TOP]
+        )
+        if not top:
+            return
+        self.dialog.note(text=_('Slowest deployment steps:'))
+        for e in top:
+            self.dialog.note(
+                text=_(
+                    '{wall:8.1f}s (cpu {cpu:.1f}s, children {children:.1f}s, '
+                    'wait {wait:.1f}s) {stage} {plugin}.{method}'
+                ).format(
+                    wall=e['wall'],
+                    cpu=e['cpu'],
+                    children=e['children_cpu'],
+                    wait=e['wait'],
+                    stage=e['stage'],
+                    plugin=e['plugin'],
+                    method=e['method'],
+                ),
+            )
+
     @plugin.event(
         stage=plugin.Stages.STAGE_TERMINATE,
         priority=plugin.Stages.PRIORITY_LAST,
     )
     def _terminate(self):
+        self._print_top_offenders()
         successfully = _('Hosted Engine successfully deployed')
         failed_early = _('Hosted Engine deployment failed')
         failed_hard = failed_early + _(
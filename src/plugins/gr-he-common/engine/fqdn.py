@@ -26,9 +26,8 @@ import gettext
 from otopi import plugin
 from otopi import util
 
-from ovirt_setup_lib import hostname as osetuphostname
-
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import util as ohostedutil
 
 
 def _(m):
@@ -55,7 +54,7 @@ class Plugin(plugin.PluginBase):
         stage=plugin.Stages.STAGE_SETUP,
     )
     def _setup(self):
-        self._hostname_helper = osetuphostname.Hostname(plugin=self)
+        self._hostname_helper = ohostedutil.CachedHostname(plugin=self)
 
     @plugin.event(
         stage=plugin.Stages.STAGE_CUSTOMIZATION,
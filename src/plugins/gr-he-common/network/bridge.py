@@ -23,17 +23,17 @@ bridge configuration plugin.
 """
 
 
-import ethtool
 import gettext
 import socket
 
 from otopi import plugin
 from otopi import util
 
-from ovirt_setup_lib import hostname as osetuphostname
-
 from ovirt_hosted_engine_setup import ansible_utils
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_network
+from ovirt_hosted_engine_setup import resolver
+from ovirt_hosted_engine_setup import util as ohostedutil
 
 
 def _(m):
@@ -86,7 +86,7 @@ class Plugin(plugin.PluginBase):
         stage=plugin.Stages.STAGE_SETUP,
     )
     def _setup(self):
-        self._hostname_helper = osetuphostname.Hostname(plugin=self)
+        self._hostname_helper = ohostedutil.CachedHostname(plugin=self)
 
     @plugin.event(
         stage=plugin.Stages.STAGE_PROGRAMS,
@@ -117,9 +117,8 @@ class Plugin(plugin.PluginBase):
         ),
     )
     def _detect_bridges(self):
-        if (
-            self.environment[ohostedcons.NetworkEnv.BRIDGE_NAME] in
-            ethtool.get_devices()
+        if host_network.snapshot().has_link(
+            self.environment[ohostedcons.NetworkEnv.BRIDGE_NAME]
         ):
             self.logger.info(
                 _(
@@ -185,16 +184,24 @@ class Plugin(plugin.PluginBase):
             )
 
     def _get_active_interface(self, valid_interfaces):
-        for iface in valid_interfaces:
-            try:
-                if (
-                    socket.getfqdn(ethtool.get_ipaddr(iface)) ==
-                    socket.gethostname()
-                ):
-                    return iface
-            except IOError:
-                pass
-        return valid_interfaces[0]
+        network = host_network.snapshot()
+        hostname = socket.gethostname()
+
+        def _reverse(iface):
+            addresses = network.get_addresses(
+                ifname=iface,
+                family=socket.AF_INET,
+                global_only=False,
+            )
+            if addresses:
+                return resolver.default().reverse(addresses[0].address)
+            return None
+
+        return resolver.default().first_match(
+            candidates=valid_interfaces,
+            lookup=_reverse,
+            predicate=lambda name: name == hostname,
+        ) or valid_interfaces[0]
 
     @plugin.event(
         stage=plugin.Stages.STAGE_VALIDATION,
@@ -26,12 +26,12 @@ gateway configuration plugin.
 import gettext
 import os
 import socket
-import struct
 
 from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_network
 
 
 def _(m):
@@ -43,28 +43,24 @@ class Plugin(plugin.PluginBase):
     """
     gateway configuration plugin.
     """
-    ROUTE_DESTINATION = 1
-    ROUTE_GW = 2
 
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
         self._enabled = True
 
     def _get_default_gw(self):
-        gateway = ''
-        with open('/proc/net/route', 'r') as f:
-            lines = f.read().splitlines()
-            for line in lines:
-                data = line.split()
-                if data[self.ROUTE_DESTINATION] == '00000000':
-                    gateway = socket.inet_ntoa(
-                        struct.pack(
-                            'I',
-                            int(data[self.ROUTE_GW], 16)
-                        )
-                    )
-                    break
-        return gateway
+        if self.environment[ohostedcons.NetworkEnv.FORCE_IPV6]:
+            families = (socket.AF_INET6,)
+        elif self.environment[ohostedcons.NetworkEnv.FORCE_IPV4]:
+            families = (socket.AF_INET,)
+        else:
+            families = (socket.AF_INET, socket.AF_INET6)
+        network = host_network.snapshot()
+        for family in families:
+            gateway = network.default_gateway(family)
+            if gateway:
+                return gateway
+        return ''
 
     @plugin.event(
         stage=plugin.Stages.STAGE_INIT,
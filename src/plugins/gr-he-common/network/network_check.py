@@ -30,6 +30,7 @@ from otopi import util
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
 from ovirt_hosted_engine_setup import util as ohostedutil
+from ovirt_hosted_engine_setup import validation
 
 
 def _(m):
@@ -41,7 +42,6 @@ class Plugin(plugin.PluginBase):
     """
     network_test configuration plugin.
     """
-    _TIMEOUT = 2
 
     def __init__(self, context):
         super(Plugin, self).__init__(context=context)
@@ -194,25 +194,18 @@ class Plugin(plugin.PluginBase):
             self.logger.error(error_msg)
 
     def _check_dns(self):
-        cmd = [
-            'dig',
-            '+tries=1',
-            '+time={t}'.format(t=self._TIMEOUT)
-        ]
-
-        return self._executes_successful(cmd)
+        return self._executes_successful(
+            validation.dns_command(self.command.get('dig'))
+        )
 
     def _check_tcp(self, tcp_t_address, tcp_t_port):
-        cmd = [
-            'nc',
-            '-w',
-            str(self._TIMEOUT),
-            '-z',
-            tcp_t_address,
-            tcp_t_port,
-        ]
-
-        return self._executes_successful(cmd)
+        return self._executes_successful(
+            validation.tcp_command(
+                self.command.get('nc'),
+                tcp_t_address,
+                tcp_t_port,
+            )
+        )
 
     def _executes_successful(self, cmd):
         rc, stdout, stderr = self.execute(
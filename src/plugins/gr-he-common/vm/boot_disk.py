@@ -23,10 +23,7 @@ VM disk import plugin.
 """
 
 
-import configparser
 import gettext
-import glob
-import hashlib
 import math
 import os
 import shutil
@@ -38,14 +35,11 @@ from otopi import util
 
 from vdsm.client import ServerError
 
+from ovirt_hosted_engine_setup import appliance_catalog
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import scheduler
 from ovirt_hosted_engine_setup.ovf import ovfenvelope
 
-try:
-    from StringIO import StringIO
-except ImportError:
-    from io import StringIO
-
 
 def _(m):
     return gettext.dgettext(message=m, domain='ovirt-hosted-engine-setup')
@@ -63,53 +57,30 @@ class Plugin(plugin.PluginBase):
         self._image_path = None
         self._ovf_mem_size_mb = None
         self._appliances = []
+        self._catalog = None
         self._install_appliance = False
         self._appliance_rpm_name = ohostedcons.Const.APPLIANCE_RPM_NAME
 
     def _detect_appliances(self):
-        self._appliances = []
-        config = configparser.ConfigParser()
-        config.optionxform = str
-        confdir = os.path.join(
-            ohostedcons.FileLocations.OVIRT_APPLIANCES_DESC_DIR,
-            ohostedcons.FileLocations.OVIRT_APPLIANCES_DESC_FILENAME_TEMPLATE,
-        )
-        conffiles = glob.glob(confdir)
-        fakesection = 'appliance'
-        keys = ['description', 'version', 'path', 'sha1sum']
-        for cf in conffiles:
-            self.logger.debug('parsing: ' + cf)
-            with open(cf) as stream:
-                fakefile = StringIO(
-                    '[{s}]\n'.format(s=fakesection) + stream.read()
+        self._catalog = appliance_catalog.ApplianceCatalog(
+            desc_dir=ohostedcons.FileLocations.OVIRT_APPLIANCES_DESC_DIR,
+            pattern=(
+                ohostedcons.FileLocations.
+                OVIRT_APPLIANCES_DESC_FILENAME_TEMPLATE
+            ),
+        ).load()
+        for conf, reason in self._catalog.errors():
+            self.logger.error(
+                'error parsing: {conf}: {reason}'.format(
+                    conf=conf,
+                    reason=reason,
                 )
-                config.readfp(fakefile)
-            if set(
-                [config.has_option(fakesection, k) for k in keys]
-            ) == set([True]):
-                app = {k: config.get(fakesection, k) for k in keys}
-                app.update(
-                    {'index': str(len(self._appliances) + 1)}
-                )
-                self._appliances.append(app)
-            else:
-                self.logger.error('error parsing: ' + cf)
-        self.logger.debug('available appliances: ' + str(self._appliances))
-
-    def _file_hash(self, filename):
-        h = hashlib.sha1()
-        with open(filename, 'rb') as file:
-            chunk = 0
-            while chunk != b'':
-                chunk = file.read(1024)
-                h.update(chunk)
-        self.logger.debug(
-            "calculated sha1sum for '{f}': {h}".format(
-                f=filename,
-                h=h.hexdigest(),
             )
-        )
-        return h.hexdigest()
+        self._appliances = self._catalog.appliances()
+        self.logger.debug('available appliances: ' + str(self._appliances))
+        # The checksums are only needed at validation, verify all the
+        # candidates in the background meanwhile.
+        self._catalog.verify(scheduler.default())
 
     def _parse_ovf(self, tar, ovf_xml):
         valid = True
@@ -342,6 +313,34 @@ class Plugin(plugin.PluginBase):
                 _('Cannot deploy without oVirt engine appliance')
             )
 
+    @plugin.event(
+        stage=plugin.Stages.STAGE_VALIDATION,
+        condition=lambda self: self._catalog is not None,
+    )
+    def _validate_appliances(self):
+        mismatches = self._catalog.wait_verified(scheduler.default())
+        for entry in mismatches:
+            self.logger.warning(
+                _(
+                    'The sha1sum of {path} does not match {conf}, '
+                    'ignoring it'
+                ).format(
+                    path=entry['appliance']['path'],
+                    conf=entry['conf'],
+                )
+            )
+        self._appliances = self._catalog.appliances()
+        try:
+            self._catalog.save()
+        except (IOError, OSError) as e:
+            self.logger.debug(
+                'Cannot save the appliance index: {e}'.format(e=e)
+            )
+        if mismatches and not self._appliances:
+            raise RuntimeError(
+                _('Cannot deploy without oVirt engine appliance')
+            )
+
     @plugin.event(
         stage=plugin.Stages.STAGE_CUSTOMIZATION,
         after=(
@@ -23,13 +23,11 @@ VM cloud-init configuration plugin.
 """
 
 
-import ethtool
 import gettext
-import io
 import netaddr
 import os
 import re
-import tarfile
+import socket
 import tempfile
 
 from otopi import constants as otopicons
@@ -37,9 +35,10 @@ from otopi import plugin
 from otopi import util
 
 from ovirt_setup_lib import dialog
-from ovirt_setup_lib import hostname as osetuphostname
 
+from ovirt_hosted_engine_setup import backup_inspector
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import host_network
 from ovirt_hosted_engine_setup import util as ohostedutil
 
 
@@ -58,16 +57,6 @@ class Plugin(plugin.PluginBase):
         self._enable = False
         self._directory_name = None
 
-    IPv4RE = re.compile(
-        pattern=r'^\s+inet\s+(?P<addr>[\d.]*)/(?P<len>\d+)\s',
-        flags=re.M,
-    )
-
-    IPv6RE = re.compile(
-        pattern=r'^\s+inet6\s+(?P<addr>[\d:A-F]*)/(?P<len>\d+)\s',
-        flags=re.M | re.I,
-    )
-
     def _validate_ip_cidr(self, ipcidr):
         try:
             ip = netaddr.IPNetwork(ipcidr)
@@ -99,10 +88,12 @@ class Plugin(plugin.PluginBase):
         )
 
     def _getMyIPAddrList(self):
+        network = host_network.snapshot()
         device = (
             self.environment[ohostedcons.NetworkEnv.BRIDGE_NAME]
-            if self.environment[ohostedcons.NetworkEnv.BRIDGE_NAME]
-            in ethtool.get_devices()
+            if network.has_link(
+                self.environment[ohostedcons.NetworkEnv.BRIDGE_NAME]
+            )
             else self.environment[ohostedcons.NetworkEnv.BRIDGE_IF]
         )
         self.logger.debug(
@@ -110,46 +101,24 @@ class Plugin(plugin.PluginBase):
                 device=device,
             )
         )
-        rc, stdout, stderr = self.execute(
-            args=(
-                self.command.get('ip'),
-                'addr',
-                'show',
-                device,
-                'scope',
-                'global'
-            ),
-        )
+        families = []
+        if not self.environment[ohostedcons.NetworkEnv.FORCE_IPV6]:
+            families.append(socket.AF_INET)
+        if not self.environment[ohostedcons.NetworkEnv.FORCE_IPV4]:
+            families.append(socket.AF_INET6)
         alist = []
-
-        addressmatchs4list = (
-            re.findall(self.IPv4RE, '\n'.join(stdout))
-            if not self.environment[
-                ohostedcons.NetworkEnv.FORCE_IPV6
-                ]
-            else []
-        )
-
-        addressmatchs6list = (
-            re.findall(self.IPv6RE, '\n'.join(stdout))
-            if not self.environment[
-                ohostedcons.NetworkEnv.FORCE_IPV4
-                ]
-            else []
-        )
-
-        for amatch in (addressmatchs4list + addressmatchs6list):
-            addr = '{a}/{pl}'.format(
-                a=amatch[0],
-                pl=amatch[1],
-            )
-            self.logger.debug('address: {a}'.format(a=addr))
+        for address in network.get_addresses(ifname=device):
+            if address.family not in families:
+                continue
+            self.logger.debug('address: {a}'.format(a=address.cidr))
             try:
-                ipna = netaddr.IPNetwork(addr)
+                ipna = netaddr.IPNetwork(address.cidr)
                 alist.append(ipna)
             except netaddr.AddrFormatError:
                 self.logger.error(
-                    _('Invalid nic/bridge address: {a}').format(a=addr)
+                    _('Invalid nic/bridge address: {a}').format(
+                        a=address.cidr,
+                    )
                 )
         if not alist:
             raise RuntimeError(
@@ -446,41 +415,22 @@ class Plugin(plugin.PluginBase):
 
     def _get_fqdn_from_backup_file(self):
         try:
-            with tarfile.open(
+            fqdn = backup_inspector.engine_fqdn(
                 self.environment[
                     ohostedcons.CoreEnv.RESTORE_FROM_FILE
-                ],
-                'r'
-            ) as tar:
-                buf = tar.extractfile('./files').read()
-                filesio = io.BytesIO(buf)
-                with tarfile.open(
-                    None,
-                    'r',
-                    fileobj=filesio
-                ) as files:
-                    conffiles_re = re.compile(
-                        '^etc/ovirt-engine/engine.conf.d/.*conf$'
-                    )
-                    fqdn_re = re.compile('^ENGINE_FQDN=(?P<fqdn>\\S*).*')
-                    for file in sorted(files, key=lambda f: f.name):
-                        if conffiles_re.search(file.name):
-                            f = files.extractfile(file.name)
-                            content = f.read().decode('utf-8')
-                            lines = content.splitlines()
-                            for l in lines:
-                                # This is only a partial parsing,
-                                # the full implementation is in
-                                # the engine pythonlib.
-                                match = fqdn_re.match(l)
-                                if match:
-                                    engine_fqdn = match.group('fqdn')
+                ]
+            )
         except Exception as e:
             raise RuntimeError(
                 _('Unable to fech FQDN from backup file: {err}')
                 .format(err=str(e))
             )
-        return engine_fqdn
+        if fqdn is None:
+            raise RuntimeError(
+                _('Unable to fech FQDN from backup file: {err}')
+                .format(err=_('ENGINE_FQDN not found'))
+            )
+        return fqdn
 
     @plugin.event(
         stage=plugin.Stages.STAGE_BOOT,
@@ -580,7 +530,7 @@ class Plugin(plugin.PluginBase):
     def _setup(self):
         self.command.detect('genisoimage')
         self.command.detect('ssh-keygen')
-        self._hostname_helper = osetuphostname.Hostname(plugin=self)
+        self._hostname_helper = ohostedutil.CachedHostname(plugin=self)
         self.command.detect('ping')
 
     @plugin.event(
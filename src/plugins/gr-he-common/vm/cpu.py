@@ -24,12 +24,12 @@ VM cpu configuration plugin.
 
 
 import gettext
-import multiprocessing
 
 from otopi import plugin
 from otopi import util
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import validation
 
 
 def _(m):
@@ -46,7 +46,9 @@ class Plugin(plugin.PluginBase):
         super(Plugin, self).__init__(context=context)
 
     def _getMaxVCpus(self):
-        return str(multiprocessing.cpu_count())
+        return str(
+            self.environment[ohostedcons.CoreEnv.HOST_CAPABILITIES].cpus
+        )
 
     @plugin.event(
         stage=plugin.Stages.STAGE_INIT,
@@ -97,6 +99,14 @@ class Plugin(plugin.PluginBase):
         ] is not None:
             default = self.environment[ohostedcons.VMEnv.APPLIANCEVCPUS]
             default_msg = _('appliance OVF value')
+        caps = self.environment[ohostedcons.CoreEnv.HOST_CAPABILITIES]
+        recommended = caps.recommended_vcpus(
+            default,
+            minimum=ohostedcons.Defaults.DEFAULT_VM_VCPUS,
+        )
+        if recommended < int(default):
+            default = str(recommended)
+            default_msg = _('maximum fitting a NUMA node of the host')
 
         while not valid:
             if interactive:
@@ -137,24 +147,27 @@ class Plugin(plugin.PluginBase):
                         ) == _('Yes').lower()
                     ):
                         valid = False
-                if int(
-                    self.environment[ohostedcons.VMEnv.VCPUS]
-                ) > maxvcpus:
-                    message = _(
-                        'Invalid number of cpu specified: {vcpu}, '
-                        'while only {maxvcpus} are available on '
-                        'the host'
-                    ).format(
-                        vcpu=self.environment[
-                            ohostedcons.VMEnv.VCPUS
-                        ],
-                        maxvcpus=maxvcpus
-                    )
+                message = validation.check_vcpus(
+                    self.environment[ohostedcons.VMEnv.VCPUS],
+                    maxvcpus,
+                )
+                if message:
                     if interactive:
                         self.logger.warning(message)
                         valid = False
                     else:
                         raise RuntimeError(message)
+                if valid and not caps.fits_numa_node(
+                    self.environment[ohostedcons.VMEnv.VCPUS],
+                    self.environment[ohostedcons.VMEnv.MEM_SIZE_MB] or 0,
+                ):
+                    self.logger.warning(
+                        _(
+                            'The engine VM does not fit in a single NUMA '
+                            'node of this host and will span several, '
+                            'with slower memory accesses'
+                        )
+                    )
             except ValueError:
                 valid = False
                 if not interactive:
@@ -31,6 +31,7 @@ from otopi import util
 from ovirt_setup_lib import dialog
 
 from ovirt_hosted_engine_setup import constants as ohostedcons
+from ovirt_hosted_engine_setup import validation
 
 
 def _(m):
@@ -47,13 +48,9 @@ class Plugin(plugin.PluginBase):
         super(Plugin, self).__init__(context=context)
 
     def _getMaxMemorySize(self):
-        with open('/proc/meminfo', 'r') as mem:
-            memAvailable = 0
-            for i in mem:
-                sline = i.split()
-                if str(sline[0]) in ('MemFree:', 'Buffers:', 'Cached:'):
-                    memAvailable += int(sline[1])
-        return memAvailable/1024
+        return self.environment[
+            ohostedcons.CoreEnv.HOST_CAPABILITIES
+        ].mem_available_mb
 
     @plugin.event(
         stage=plugin.Stages.STAGE_INIT,
@@ -116,6 +113,16 @@ class Plugin(plugin.PluginBase):
         if default > maxmem:
             default = maxmem
             default_msg = _('maximum available')
+        recommended = self.environment[
+            ohostedcons.CoreEnv.HOST_CAPABILITIES
+        ].recommended_memory_mb(
+            default,
+            minimum=ohostedcons.Defaults.MINIMAL_MEM_SIZE_MB,
+            reserved_mb=ohostedcons.Const.HOST_RESERVED_MEMORY_MB,
+        )
+        if recommended < default:
+            default = recommended
+            default_msg = _('maximum fitting a NUMA node of the host')
 
         def _check_min_memory(mem_size_mb):
             if not self.environment[
@@ -153,23 +160,11 @@ class Plugin(plugin.PluginBase):
                 ohostedcons.CoreEnv.MEM_REQUIREMENTS_CHECK_ENABLED
             ]:
                 return None
-            if int(
-                mem_size_mb
-            ) < ohostedcons.Defaults.MINIMAL_MEM_SIZE_MB:
-                return _(
-                    'Minimum requirements for memory size not met'
-                )
-            if int(
-                mem_size_mb
-            ) > maxmem:
-                return _(
-                    'Invalid memory size specified: {memsize}, '
-                    'while only {maxmem} are available on '
-                    'the host'
-                ).format(
-                    memsize=mem_size_mb,
-                    maxmem=maxmem,
-                )
+            return validation.check_memory_size(
+                mem_size_mb,
+                ohostedcons.Defaults.MINIMAL_MEM_SIZE_MB,
+                maxmem,
+            )
         mem_size_mb_was_set = self.environment[
             ohostedcons.VMEnv.MEM_SIZE_MB
         ]